@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,23 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def sync_thumbnails(settings):
+    # Фоновые потоки не должны трогать тестовую базу после теста.
+    settings.POSTS_THUMBNAIL_ASYNC = False
+
+
+@pytest.fixture(autouse=True)
+def temp_media(settings, tmp_path):
+    # Картинки, миниатюры и их метаданные пишутся во временный каталог,
+    # а не в проект.
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.THUMBNAIL_SQLITE_PATH = str(tmp_path / 'thumbnails.sqlite3')
@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .sqlite import apply_pragmas
+        connection_created.connect(apply_pragmas,
+                                   dispatch_uid='core.sqlite.apply_pragmas')
+        if settings.METRICS_ENABLED:
+            from . import metrics
+            metrics.install()
+        if settings.TEMPLATE_PROFILING:
+            from . import profiling
+            profiling.install()
+            request_finished.connect(profiling.dump_profile,
+                                     dispatch_uid='core.profiling.dump')
@@ -0,0 +1,147 @@
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Типы, которые имеет смысл сжимать: картинки и архивы уже сжаты.
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/(json|javascript|xml|manifest\+json)|image/svg)')
+ACCEPT_ENCODING = re.compile(r'\s*([\w*]+)\s*(?:;\s*q\s*=\s*([\d.]+))?')
+
+
+def accepted_encodings(header: str) -> dict:
+    """Разбирает Accept-Encoding в словарь кодировка: q."""
+    encodings = {}
+    for part in header.split(','):
+        match = ACCEPT_ENCODING.match(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2) or 1)
+        except ValueError:
+            continue
+        encodings[match.group(1).lower()] = quality
+    return encodings
+
+
+def choose_encoding(header: str):
+    """Выбирает лучшую кодировку, которую принимает клиент.
+
+    При равном q brotli предпочтительнее gzip: он сжимает HTML сильнее.
+    """
+    encodings = accepted_encodings(header)
+    available = ['gzip']
+    if brotli is not None:
+        available.insert(0, 'br')
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = encodings.get(encoding, encodings.get('*', 0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class StreamCompressor:
+    """Сжимает тело ответа кусками в brotli или gzip."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.stream = brotli.Compressor(
+                quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits=31 — формат gzip с заголовком и контрольной суммой.
+            self.stream = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL,
+                                           zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush=False) -> bytes:
+        """Сжимает кусок; с flush клиент сможет сразу его распаковать."""
+        if self.encoding == 'br':
+            data = self.stream.process(data)
+            return data + self.stream.flush() if flush else data
+        data = self.stream.compress(data)
+        return data + self.stream.flush(zlib.Z_SYNC_FLUSH) if flush else data
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self.stream.finish()
+        return self.stream.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Сжимает поток, отдавая каждый кусок сразу после получения."""
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk, flush=True)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def compress_content(content: bytes, encoding) -> bytes:
+    compressor = StreamCompressor(encoding)
+    return compressor.compress(content) + compressor.finish()
+
+
+def has_secrets(request, response) -> bool:
+    """Может ли в ответе быть секрет, который выдаст размер сжатия."""
+    if request.META.get('CSRF_COOKIE_USED'):
+        return True
+    user = getattr(request, 'user', None)
+    return (user is not None and user.is_authenticated
+            and response.get('Content-Type', '').startswith('text/html'))
+
+
+class CompressionMiddleware:
+    """Сжимает ответы в brotli или gzip по заголовку Accept-Encoding.
+
+    Ответы меньше COMPRESSION_MIN_SIZE и уже сжатые типы не трогает.
+    Потоковые ответы сжимаются по кускам, без буферизации целиком.
+    Без пакета brotli работает только gzip.
+
+    Страницы с CSRF-токеном и HTML залогиненных не сжимаются: Django 2.2
+    не маскирует токен в каждом ответе, и по размеру сжатой страницы
+    его можно подобрать (атака BREACH).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.has_header('Content-Encoding')
+                or not COMPRESSIBLE_TYPES.match(
+                    response.get('Content-Type', ''))
+                or has_secrets(request, response)):
+            return response
+        if (not response.streaming
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING',
+                                                    ''))
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            content = compress_content(response.content, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        # Сжатое тело уже не побайтово то же, что и исходное: ETag
+        # становится слабым, но по-прежнему совпадает в If-None-Match.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,132 @@
+import os
+import re
+
+from django.apps import apps
+from django.conf import settings
+
+# Комментарий с лицензией (/*! ... */) остаётся в начале файла.
+LICENSE_COMMENT = re.compile(r'^\s*/\*!.*?\*/', re.DOTALL)
+COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+CLASS_SELECTOR = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+TOKEN = re.compile(r'[A-Za-z_][\w-]*')
+# Внутри этих at-правил лежат обычные правила, их тоже можно чистить.
+NESTED_AT_RULES = ('@media', '@supports')
+SOURCE_EXTENSIONS = ('.html', '.js', '.py')
+
+
+def skip_string(css: str, pos: int) -> int:
+    """Возвращает позицию сразу за строкой в кавычках, начатой в pos."""
+    quote = css[pos]
+    pos += 1
+    while pos < len(css) and css[pos] != quote:
+        pos += 2 if css[pos] == '\\' else 1
+    return pos + 1
+
+
+def find(css: str, pos: int, chars: str) -> int:
+    """Ищет первый из символов chars вне строк, -1 если его нет."""
+    while pos < len(css):
+        char = css[pos]
+        if char in '"\'':
+            pos = skip_string(css, pos)
+            continue
+        if char in chars:
+            return pos
+        pos += 1
+    return -1
+
+
+def blocks(css: str):
+    """Делит CSS на пары (заголовок, тело); у инструкций тело None."""
+    pos = 0
+    while pos < len(css):
+        start = find(css, pos, '{;')
+        if start == -1:
+            return
+        prelude = css[pos:start].strip()
+        if css[start] == ';':
+            yield prelude, None
+            pos = start + 1
+            continue
+        depth, end = 1, start
+        while depth:
+            end = find(css, end + 1, '{}')
+            if end == -1:
+                raise ValueError(f'Незакрытый блок CSS: {prelude}')
+            depth += 1 if css[end] == '{' else -1
+        yield prelude, css[start + 1:end]
+        pos = end + 1
+
+
+def split_selectors(prelude: str):
+    """Делит список селекторов по запятым вне скобок."""
+    selectors, depth, start = [], 0, 0
+    for pos, char in enumerate(prelude):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and not depth:
+            selectors.append(prelude[start:pos].strip())
+            start = pos + 1
+    selectors.append(prelude[start:].strip())
+    return selectors
+
+
+def prune_rules(css: str, used) -> str:
+    rules = []
+    for prelude, body in blocks(css):
+        if body is None:
+            rules.append(f'{prelude};')
+        elif prelude.startswith(NESTED_AT_RULES):
+            inner = prune_rules(body, used)
+            if inner:
+                rules.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            rules.append(f'{prelude}{{{body}}}')
+        else:
+            selectors = [
+                selector for selector in split_selectors(prelude)
+                if used.issuperset(CLASS_SELECTOR.findall(selector))]
+            if selectors:
+                rules.append(f'{",".join(selectors)}{{{body}}}')
+    return ''.join(rules)
+
+
+def prune_css(css: str, used) -> str:
+    """Удаляет из CSS селекторы с классами, которых нет в used.
+
+    Селекторы без классов (теги, атрибуты, :root) остаются. Правила
+    внутри @media и @supports чистятся так же, пустые блоки удаляются.
+    """
+    license = LICENSE_COMMENT.match(css)
+    css = COMMENT.sub('', css)
+    pruned = prune_rules(css, set(used))
+    return (license.group(0).strip() + '\n' if license else '') + pruned
+
+
+def source_dirs():
+    """Каталоги шаблонов, скриптов и кода, где могут встретиться классы."""
+    dirs = list(settings.TEMPLATES[0]['DIRS'])
+    dirs.extend(settings.STATICFILES_DIRS)
+    dirs.extend(config.path for config in apps.get_app_configs()
+                if config.path.startswith(settings.BASE_DIR))
+    return dirs
+
+
+def used_tokens(dirs=None) -> set:
+    """Собирает все слова из шаблонов, скриптов и кода проекта.
+
+    Лишнее слово лишь оставит ненужное правило, зато класс, собранный
+    в шаблоне из частей или заданный в виджете формы, не потеряется.
+    """
+    tokens = set(settings.STATIC_PRUNE_SAFELIST)
+    for directory in dirs or source_dirs():
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if not name.endswith(SOURCE_EXTENSIONS):
+                    continue
+                with open(os.path.join(root, name), encoding='utf-8',
+                          errors='ignore') as file:
+                    tokens.update(TOKEN.findall(file.read()))
+    return tokens
@@ -0,0 +1,97 @@
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.template import Origin, TemplateSyntaxError, engines
+from django.template.loaders.base import Loader
+from django.template.utils import get_app_template_dirs
+
+logger = logging.getLogger(__name__)
+
+# Внутри этих тегов пробелы и переводы строк значимы.
+PRESERVED_BLOCKS = re.compile(r'(<(pre|textarea|script)\b.*?</\2>)',
+                              re.IGNORECASE | re.DOTALL)
+INDENTED_NEWLINE = re.compile(r'[ \t\r\f\v]*\n\s*')
+# Тег или комментарий шаблона, занимающий целую строку.
+TAG_LINE = re.compile(r'(?<=\n)(\{%.*?%\}|\{#.*?#\})\n')
+
+
+def collapse_whitespace(source: str) -> str:
+    """Убирает отступы и пустые строки из исходника шаблона.
+
+    Перевод строки остаётся, так что пробел между строчными
+    элементами по-прежнему есть и страница выглядит так же.
+    """
+    parts = PRESERVED_BLOCKS.split(source)
+    # split с двумя группами: текст, блок, имя тега, текст, ...
+    for index in range(0, len(parts), 3):
+        parts[index] = TAG_LINE.sub(
+            r'\1', INDENTED_NEWLINE.sub('\n', parts[index]))
+    return ''.join(part for index, part in enumerate(parts)
+                   if index % 3 != 2)
+
+
+class WhitespaceLoader(Loader):
+    """Загрузчик-обёртка, сжимающий пробелы в HTML-шаблонах.
+
+    Пробелы убираются один раз при компиляции шаблона, поэтому вместе
+    с кешированным загрузчиком отрисовка ничего не теряет.
+    """
+
+    def __init__(self, engine, loaders):
+        super().__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+
+    def get_template_sources(self, template_name):
+        # Кешированный загрузчик читает шаблон через origin.loader,
+        # поэтому источники подменяются на свои.
+        for loader in self.loaders:
+            for source in loader.get_template_sources(template_name):
+                origin = Origin(name=source.name,
+                                template_name=source.template_name,
+                                loader=self)
+                origin.source = source
+                yield origin
+
+    def get_contents(self, origin):
+        contents = origin.source.loader.get_contents(origin.source)
+        # *_email.html — текст письма, в нём переводы строк значимы.
+        if (origin.template_name.endswith('.html')
+                and not origin.template_name.endswith('_email.html')):
+            return collapse_whitespace(contents)
+        return contents
+
+
+def project_templates():
+    """Имена HTML-шаблонов из каталогов проекта и его приложений."""
+    dirs = [*settings.TEMPLATES[0]['DIRS'], *get_app_template_dirs(
+        'templates')]
+    names = set()
+    for directory in dirs:
+        if not str(directory).startswith(settings.BASE_DIR):
+            continue
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith('.html'):
+                    names.add(os.path.relpath(os.path.join(root, name),
+                                              directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def prewarm_templates() -> int:
+    """Компилирует шаблоны проекта в кеш загрузчика заранее.
+
+    Вызывается при запуске воркера, чтобы первый запрос не тратил время
+    на разбор шаблонов. Возвращает число скомпилированных шаблонов.
+    """
+    engine = engines['django']
+    warmed = 0
+    for name in project_templates():
+        try:
+            engine.get_template(name)
+        except TemplateSyntaxError:
+            logger.exception('Не удалось скомпилировать шаблон %s', name)
+            continue
+        warmed += 1
+    return warmed
@@ -0,0 +1,82 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from core.compression import brotli, compress_content
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает размер главной страницы и затраты CPU на её '
+            'отрисовку и сжатие с убранными пробелами и без них.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/')
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=0,
+                            help='Сначала добавить столько постов.')
+
+    def prepare(self, count):
+        author, _ = User.objects.get_or_create(username='bench-compression')
+        group, _ = Group.objects.get_or_create(
+            slug='bench-compression',
+            defaults={'title': 'Замер сжатия', 'description': ''})
+        Post.objects.bulk_create(
+            Post(text=f'Пост для замера сжатия номер {num}. ' * 5,
+                 author=author, group=group)
+            for num in range(count))
+
+    def render(self, url, repeat):
+        """Возвращает страницу и время CPU на одну отрисовку в мс."""
+        client = Client()
+        client.get(url)
+        started = time.process_time()
+        for _ in range(repeat):
+            # Без кеша страниц: меряем именно отрисовку шаблонов.
+            cache.clear()
+            content = client.get(url).content
+        return content, (time.process_time() - started) / repeat * 1000
+
+    def compress(self, content, encoding, repeat):
+        started = time.process_time()
+        for _ in range(repeat):
+            compressed = compress_content(content, encoding)
+        elapsed = (time.process_time() - started) / repeat * 1000
+        return len(compressed), elapsed
+
+    def handle(self, *args, **options):
+        if options['posts']:
+            self.prepare(options['posts'])
+        encodings = ['gzip'] + (['br'] if brotli is not None else [])
+        loaders = [
+            ('django.template.loaders.cached.Loader',
+             ['django.template.loaders.filesystem.Loader',
+              'django.template.loaders.app_directories.Loader'])]
+        templates = [{**settings.TEMPLATES[0],
+                      'OPTIONS': {**settings.TEMPLATES[0]['OPTIONS']}}]
+        self.stdout.write(f'{"шаблоны":<14}{"сжатие":<10}{"байт":>10}'
+                          f'{"CPU, мс":>10}')
+        for mode, collapse in (('как есть', False), ('без пробелов', True)):
+            templates[0]['OPTIONS']['loaders'] = (
+                [(loaders[0][0], [('core.loaders.WhitespaceLoader',
+                                   loaders[0][1])])]
+                if collapse else loaders)
+            with override_settings(TEMPLATES=templates,
+                                   MIDDLEWARE=[
+                                       item for item in settings.MIDDLEWARE
+                                       if 'compression' not in item]):
+                content, render_ms = self.render(options['url'],
+                                                 options['repeat'])
+            self.stdout.write(f'{mode:<14}{"нет":<10}{len(content):>10}'
+                              f'{render_ms:>10.2f}')
+            for encoding in encodings:
+                size, cpu_ms = self.compress(content, encoding,
+                                             options['repeat'])
+                self.stdout.write(f'{mode:<14}{encoding:<10}{size:>10}'
+                                  f'{cpu_ms:>10.2f}')
@@ -0,0 +1,372 @@
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.utils.encoding import force_bytes
+from django.utils.http import urlencode, urlsafe_base64_encode
+from django.urls import reverse
+
+from posts.models import Follow, Group, GroupFollow, Post
+from posts.thumbnails import generate_card_thumbnail
+
+User = get_user_model()
+# Модули маршрутов, которые гоняет замер; новые маршруты в них попадают
+# в замер сами.
+ROUTE_MODULES = ('posts.urls', 'users.urls', 'about.urls')
+# Выход завершил бы сессию потока, поэтому его гоняют только гости.
+GUEST_ONLY = {'users:logout'}
+SCENARIOS = ('guest', 'user')
+# Сколько постов дают слова для запросов к поиску.
+SEARCH_SAMPLE = 100
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def discover_routes():
+    """Имена маршрутов и их параметры из ROUTE_MODULES."""
+    routes = []
+    for module in ROUTE_MODULES:
+        urlconf = import_module(module)
+        for pattern in urlconf.urlpatterns:
+            routes.append((f'{urlconf.app_name}:{pattern.name}',
+                           sorted(pattern.pattern.converters)))
+    return routes
+
+
+def call_wsgi(application, path, query='', cookie=''):
+    """Выполняет GET через WSGI-приложение, возвращает статус и размер."""
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'localhost',
+        'HTTP_ACCEPT_ENCODING': 'br, gzip',
+        'HTTP_COOKIE': cookie,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split()[0]))
+
+    body = application(environ, start_response)
+    try:
+        size = sum(len(chunk) for chunk in body)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return statuses[0], size
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет временную базу синтетическими данными и гоняет '
+            'все маршруты posts, users и about параллельно через '
+            'WSGI-приложение. Печатает пропускную способность, p50/p95/p99 '
+            'и запросы к базе, сохраняет итог в JSON и сравнивает его '
+            'с сохранённым прогоном.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--image-share', type=float, default=0.1,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Запросов на маршрут в каждом сценарии.')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Потоков, отправляющих запросы.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--sqlite-tuning', action='store_true',
+                            help='Замер с SQLITE_TUNING: без него '
+                                 'параллельные записи ловят database is '
+                                 'locked.')
+        parser.add_argument('--output', help='Сохранить итог в JSON.')
+        parser.add_argument('--baseline',
+                            help='Сравнить с итогом прошлого прогона.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимый рост задержки и числа '
+                                 'запросов.')
+        parser.add_argument('--percentile', type=int, default=50,
+                            choices=(50, 95, 99),
+                            help='Какой перцентиль сравнивать: хвосты '
+                                 'шумят сильнее медианы.')
+        parser.add_argument('--min-delta', type=float, default=5,
+                            help='Рост задержки меньше стольких мс — шум, '
+                                 'а не регрессия.')
+        parser.add_argument('--run', metavar='DIRECTORY',
+                            help='Замер в текущем процессе на базе из '
+                                 'YATUBE_DB_PATH.')
+
+    def seed(self, options, rng):
+        """Заполняет базу через generate_dataset и добавляет подписки."""
+        call_command('migrate', verbosity=0)
+        call_command(
+            'generate_dataset', users=options['users'],
+            groups=options['groups'], posts=options['posts'],
+            image_share=options['image_share'],
+            images=max(1, round(options['posts'] * options['image_share'])),
+            seed=options['seed'], prefix='bench', stdout=io.StringIO())
+        users = list(User.objects.order_by('pk').values_list('pk', flat=True))
+        groups = list(Group.objects.values_list('pk', flat=True))
+        Follow.objects.bulk_create(
+            Follow(user_id=user, author_id=author)
+            for user in users[:options['concurrency']]
+            for author in set(rng.sample(users, 10)) - {user})
+        GroupFollow.objects.bulk_create(
+            GroupFollow(user_id=user, group_id=group)
+            for user in users[:options['concurrency']]
+            for group in rng.sample(groups, min(2, len(groups))))
+        # Счётчики подписчиков после подписок.
+        call_command('rebuild_author_stats', stdout=io.StringIO())
+        # Замеряется установившийся режим: миниатюры и варианты готовы.
+        for name in Post.objects.exclude(image='').order_by().values_list(
+                'image', flat=True).distinct():
+            generate_card_thumbnail(name)
+        call_command('build_image_variants', stdout=io.StringIO())
+
+    def parameters(self):
+        """Значения параметров маршрутов из заполненной базы."""
+        user = User.objects.order_by('pk').first()
+        return {
+            'slug': list(Group.objects.values_list('slug', flat=True)),
+            'username': list(User.objects.filter(
+                stats__post_count__gt=0).values_list('username', flat=True)),
+            'post_id': list(Post.objects.values_list('pk', flat=True)),
+            'uidb64': [urlsafe_base64_encode(force_bytes(user.pk))],
+            'token': [default_token_generator.make_token(user)],
+            'q': [word.strip('.').lower() for text in Post.objects.values_list(
+                'text', flat=True)[:SEARCH_SAMPLE] for word in text.split()],
+        }
+
+    def plan(self, options, rng):
+        """Список запросов (маршрут, сценарий, путь, строка запроса)."""
+        values = self.parameters()
+        jobs = []
+        for name, converters in discover_routes():
+            for scenario in SCENARIOS:
+                if scenario == 'user' and name in GUEST_ONLY:
+                    continue
+                for _ in range(options['requests']):
+                    path = reverse(name, kwargs={
+                        key: rng.choice(values[key]) for key in converters})
+                    query = ''
+                    if name == 'posts:search':
+                        query = urlencode({'q': rng.choice(values['q'])})
+                    jobs.append((f'{name} {scenario}', scenario, path, query))
+        rng.shuffle(jobs)
+        return jobs
+
+    def worker(self, application, jobs, lock, cookie, results):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            while True:
+                with lock:
+                    if not jobs:
+                        break
+                    key, scenario, path, query = jobs.pop()
+                counter.count = 0
+                started = time.perf_counter()
+                try:
+                    status, _ = call_wsgi(application, path, query,
+                                          cookie if scenario == 'user'
+                                          else '')
+                except Exception as error:
+                    # Исключение прошло мимо обработчика 500.
+                    self.stderr.write(f'{path}: {error!r}')
+                    status = 599
+                results.append((key, status, time.perf_counter() - started,
+                                counter.count))
+        connections.close_all()
+
+    def session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+        return f'{cookie.key}={cookie.value}'
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        self.seed(options, rng)
+        jobs = self.plan(options, rng)
+        from yatube.wsgi import application
+        users = User.objects.order_by('pk')[:options['concurrency']]
+        cookies = [self.session_cookie(user) for user in users]
+        # Прогрев: по запросу на маршрут, в замер не входит.
+        seen = {}
+        for job in jobs:
+            seen.setdefault(job[0], job)
+        warmup = list(seen.values())
+        self.worker(application, warmup, threading.Lock(), cookies[0], [])
+        results = []
+        lock = threading.Lock()
+        threads = [threading.Thread(target=self.worker,
+                                    args=(application, jobs, lock, cookie,
+                                          results))
+                   for cookie in cookies]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(results, time.perf_counter() - started, options)
+
+    def measure(self, options):
+        """Запускает замер в отдельном процессе на временной базе."""
+        arguments = [
+            '--users', str(options['users']),
+            '--groups', str(options['groups']),
+            '--posts', str(options['posts']),
+            '--image-share', str(options['image_share']),
+            '--requests', str(options['requests']),
+            '--concurrency', str(options['concurrency']),
+            '--seed', str(options['seed'])]
+        if options['sqlite_tuning']:
+            arguments.append('--sqlite-tuning')
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(
+                os.environ,
+                YATUBE_DB_PATH=os.path.join(directory, 'db.sqlite3'),
+                YATUBE_MEDIA_ROOT=os.path.join(directory, 'media'),
+                YATUBE_THUMBNAIL_DB=os.path.join(directory,
+                                                 'thumbnails.sqlite3'),
+                YATUBE_STATIC_ROOT=os.path.join(directory, 'static'),
+                YATUBE_SLOW_REQUEST='inf',
+                YATUBE_SQLITE_TUNING=str(int(options['sqlite_tuning'])))
+            output = subprocess.run(
+                [sys.executable, '-m', 'django', 'bench_routes', *arguments,
+                 '--run', directory],
+                cwd=settings.BASE_DIR, env=env, check=True,
+                stdout=subprocess.PIPE, text=True).stdout
+        return json.loads(output.splitlines()[-1])
+
+    def report(self, result):
+        self.stdout.write(f'{"маршрут":<44}{"запр.":>7}{"ошиб.":>7}'
+                          f'{"p50":>9}{"p95":>9}{"p99":>9}{"SQL":>7}')
+        rows = sorted(result['routes'].items()) + [('всего', result['total'])]
+        for key, row in rows:
+            self.stdout.write(
+                f'{key:<44}{row["requests"]:>7}{row["errors"]:>7}'
+                f'{row["p50_ms"]:>9.1f}{row["p95_ms"]:>9.1f}'
+                f'{row["p99_ms"]:>9.1f}{row["queries"]:>7.1f}')
+        self.stdout.write(
+            f'Пропускная способность: {result["total"]["per_second"]:.1f} '
+            f'запр./с за {result["total"]["seconds"]:.1f} с')
+
+    def handle(self, *args, **options):
+        if options['run']:
+            self.stdout.write(json.dumps(self.run(options)))
+            return
+        result = self.measure(options)
+        self.report(result)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            regressions = compare(baseline, result,
+                                  f'p{options["percentile"]}_ms',
+                                  options['tolerance'], options['min_delta'])
+            for line in regressions:
+                self.stderr.write(line)
+            if regressions:
+                raise CommandError(
+                    f'Регрессий относительно {options["baseline"]}: '
+                    f'{len(regressions)}')
+            self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
+
+
+def route_stats(rows):
+    latencies = [latency for _, latency, _ in rows]
+    return {
+        'requests': len(rows),
+        'errors': sum(1 for status, _, _ in rows if status >= 400),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'queries': sum(queries for _, _, queries in rows) / len(rows),
+    }
+
+
+def summarize(results, seconds, options):
+    """Сводит замеры в словарь, который сохраняется в JSON."""
+    routes = {}
+    for key, status, latency, queries in results:
+        routes.setdefault(key, []).append((status, latency, queries))
+    total = route_stats([row for rows in routes.values() for row in rows])
+    total.update(seconds=seconds, per_second=len(results) / seconds)
+    return {
+        'options': {key: options[key] for key in (
+            'users', 'groups', 'posts', 'image_share', 'requests',
+            'concurrency', 'seed', 'sqlite_tuning')},
+        'routes': {key: route_stats(rows) for key, rows in routes.items()},
+        'total': total,
+    }
+
+
+def compare(baseline, result, latency, tolerance, min_delta):
+    """Строки о маршрутах, ставших медленнее или сделавших больше SQL.
+
+    latency — ключ сравниваемого перцентиля. Быстрые маршруты шумят
+    сильнее, поэтому рост меньше min_delta мс не считается. Число
+    запросов к базе почти не шумит: для него допуск не меньше половины
+    запроса, а не доля от нуля.
+    """
+    regressions = []
+    for key, row in sorted(result['routes'].items()):
+        base = baseline['routes'].get(key)
+        if base is None:
+            continue
+        if row[latency] > max(base[latency] * (1 + tolerance),
+                              base[latency] + min_delta):
+            regressions.append(
+                f'{key}: {latency[:-3]} {base[latency]:.1f} → '
+                f'{row[latency]:.1f} мс')
+        if row['queries'] > base['queries'] + max(
+                0.5, base['queries'] * tolerance):
+            regressions.append(
+                f'{key}: SQL {base["queries"]:.1f} → {row["queries"]:.1f}')
+        if row['errors'] > base['errors']:
+            regressions.append(
+                f'{key}: ошибок {base["errors"]} → {row["errors"]}')
+    return regressions
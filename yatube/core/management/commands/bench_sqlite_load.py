@@ -0,0 +1,137 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from posts.models import Post
+
+User = get_user_model()
+MODES = {'default': '0', 'tuned': '1'}
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = ('Нагружает SQLite смешанным чтением и записью постов в '
+            'обычном режиме и с SQLITE_TUNING и сравнивает пропускную '
+            'способность.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4,
+                            help='Процессов, как воркеров WSGI-сервера.')
+        parser.add_argument('--threads', type=int, default=2,
+                            help='Потоков в каждом процессе.')
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--write-share', type=float, default=0.2,
+                            help='Доля запросов на создание поста.')
+        parser.add_argument('--posts', type=int, default=2000,
+                            help='Постов в базе перед замером.')
+        parser.add_argument('--prepare', action='store_true',
+                            help='Создать и заполнить текущую базу.')
+        parser.add_argument('--run', type=int, metavar='PROCESS',
+                            help='Замер в текущем процессе.')
+
+    def prepare(self, options):
+        call_command('migrate', verbosity=0)
+        users = [
+            User.objects.create_user(username=f'load{num}')
+            for num in range(options['processes'] * options['threads'])]
+        Post.objects.bulk_create(
+            Post(text=f'Пост для нагрузки {num}',
+                 author=users[num % len(users)])
+            for num in range(options['posts']))
+
+    def worker(self, user, options, deadline, results):
+        client = Client()
+        client.force_login(user)
+        rng = random.Random(user.pk)
+        reads = ('/', f'/profile/{user.username}/', '/search/?q=пост')
+        while time.monotonic() < deadline:
+            write = rng.random() < options['write_share']
+            started = time.perf_counter()
+            try:
+                if write:
+                    response = client.post('/create/',
+                                           {'text': 'Нагрузочный пост'})
+                else:
+                    response = client.get(rng.choice(reads))
+                ok = response.status_code in (200, 302)
+            except Exception:
+                ok = False
+            results.append((write, ok, time.perf_counter() - started))
+
+    def run(self, process, options):
+        threads = options['threads']
+        users = User.objects.filter(username__in=[
+            f'load{num}'
+            for num in range(process * threads, (process + 1) * threads)])
+        results = []
+        deadline = time.monotonic() + options['seconds']
+        threads = [threading.Thread(target=self.worker,
+                                    args=(user, options, deadline, results))
+                   for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def measure(self, tuning, arguments, options):
+        """Запускает процессы нагрузки на общей базе и сводит итог."""
+        command = [sys.executable, '-m', 'django', 'bench_sqlite_load',
+                   *arguments]
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ,
+                       YATUBE_DB_PATH=os.path.join(directory, 'db.sqlite3'),
+                       YATUBE_SQLITE_TUNING=tuning)
+            subprocess.run([*command, '--prepare'], cwd=settings.BASE_DIR,
+                           env=env, check=True)
+            processes = [
+                subprocess.Popen([*command, '--run', str(process)],
+                                 cwd=settings.BASE_DIR, env=env,
+                                 stdout=subprocess.PIPE, text=True)
+                for process in range(options['processes'])]
+            results = []
+            for process in processes:
+                output, _ = process.communicate()
+                results += json.loads(output.splitlines()[-1])
+        latencies = [latency for _, ok, latency in results if ok]
+        return {
+            'per_second': len(latencies) / options['seconds'],
+            'writes': sum(1 for write, ok, _ in results if write and ok),
+            'errors': sum(1 for _, ok, _ in results if not ok),
+            'p95_ms': percentile(latencies, 0.95) * 1000 if latencies else 0,
+        }
+
+    def handle(self, *args, **options):
+        if options['prepare']:
+            self.prepare(options)
+            return
+        if options['run'] is not None:
+            self.stdout.write(json.dumps(self.run(options['run'], options)))
+            return
+        arguments = ['--processes', str(options['processes']),
+                     '--threads', str(options['threads']),
+                     '--seconds', str(options['seconds']),
+                     '--write-share', str(options['write_share']),
+                     '--posts', str(options['posts'])]
+        for mode, tuning in MODES.items():
+            result = self.measure(tuning, arguments, options)
+            self.stdout.write(
+                f'{mode:<8} {result["per_second"]:8.1f} запр./с  '
+                f'записей {result["writes"]:6d}  '
+                f'ошибок {result["errors"]:5d}  '
+                f'p95 {result["p95_ms"]:8.1f} мс')
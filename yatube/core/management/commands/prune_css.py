@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+
+from core.css import prune_css, used_tokens
+
+
+class Command(BaseCommand):
+    help = ('Показывает, сколько останется от CSS-файлов STATIC_PRUNE_CSS '
+            'после удаления классов, которых нет в шаблонах. Сами файлы '
+            'урезаются при collectstatic.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*',
+                            help='Пути в статике, по умолчанию '
+                                 'STATIC_PRUNE_CSS.')
+        parser.add_argument('--output', help='Записать урезанный CSS.')
+
+    def handle(self, *args, **options):
+        names = options['names'] or settings.STATIC_PRUNE_CSS
+        tokens = used_tokens()
+        for name in names:
+            path = finders.find(name)
+            if path is None:
+                raise CommandError(f'Файл {name} не найден в статике.')
+            with open(path, encoding='utf-8') as file:
+                css = file.read()
+            pruned = prune_css(css, tokens)
+            self.stdout.write(
+                f'{name}: {len(css)} -> {len(pruned)} байт '
+                f'({100 - len(pruned) * 100 // len(css)}% меньше)')
+            if options['output']:
+                with open(options['output'], 'w', encoding='utf-8') as file:
+                    file.write(pruned)
@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from core import profiling
+
+SORT_COLUMNS = {'count': 0, 'total': 1, 'self': 2}
+
+
+class Command(BaseCommand):
+    help = ('Показывает, на что уходит время отрисовки: по шаблонам, '
+            'include и тегам. С --url сам отрисовывает страницы, без него '
+            'читает замеры воркеров с TEMPLATE_PROFILING.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', default=[],
+                            help='Страница для замера, можно несколько.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--sort', choices=SORT_COLUMNS, default='self')
+        parser.add_argument('--limit', type=int, default=30)
+
+    def collect(self, urls, repeat):
+        profiling.install()
+        client = Client()
+        for url in urls:
+            # Первый запрос компилирует шаблоны, его не считаем.
+            client.get(url)
+        profiling.profile.reset()
+        for _ in range(repeat):
+            for url in urls:
+                # Кеш страниц иначе отдал бы ответ без отрисовки.
+                cache.clear()
+                client.get(url)
+        return profiling.profile.snapshot(), repeat * len(urls)
+
+    def handle(self, *args, **options):
+        if options['url']:
+            stats, pages = self.collect(options['url'], options['repeat'])
+        else:
+            stats, pages = profiling.load_profiles(), None
+        if not stats:
+            self.stderr.write('Замеров нет: включите TEMPLATE_PROFILING или '
+                              'передайте --url.')
+            return
+        # Полное время отрисовки — сумма собственного времени всех ключей.
+        render_total = sum(stat[2] for stat in stats.values()) or 1e-9
+        column = SORT_COLUMNS[options['sort']]
+        rows = sorted(stats.items(), key=lambda item: item[1][column],
+                      reverse=True)[:options['limit']]
+        self.stdout.write(f'{"ключ":<48}{"вызовов":>9}{"всего, мс":>11}'
+                          f'{"своё, мс":>10}{"доля":>7}')
+        for key, (count, total, own) in rows:
+            self.stdout.write(
+                f'{key[:47]:<48}{count:>9}{total * 1000:>11.1f}'
+                f'{own * 1000:>10.1f}{own / render_total:>7.1%}')
+        if pages:
+            self.stdout.write(f'Страниц: {pages}, отрисовка в среднем '
+                              f'{render_total / pages * 1000:.2f} мс')
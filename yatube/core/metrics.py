@@ -0,0 +1,301 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('core.metrics.slow')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Границы корзин гистограмм: время ответа в секундах, число запросов
+# к базе и размер ответа в байтах.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                    10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+# Запрос, не попавший ни в один маршрут.
+UNRESOLVED = '<unresolved>'
+
+_local = threading.local()
+_originals = {}
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами, как у Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        return (list(zip(self.buckets + (float('inf'),), self.counts)),
+                self.sum)
+
+
+class ViewMetrics:
+    """Счётчики запросов к одному view."""
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.responses = defaultdict(int)
+
+
+class MetricsRegistry:
+    """Метрики запросов текущего процесса по именам view.
+
+    Каждый воркер считает свои запросы и отдаёт их на своём /metrics;
+    Prometheus складывает воркеры сам.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewMetrics)
+
+    def record(self, view, status, trace, size):
+        with self.lock:
+            stats = self.views[view]
+            stats.duration.observe(trace.duration)
+            stats.queries.observe(len(trace.queries))
+            if size is not None:
+                stats.size.observe(size)
+            stats.sql_seconds += trace.sql_seconds
+            stats.template_seconds += trace.template_seconds
+            stats.responses[f'{status // 100}xx'] += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {view: {
+                'duration': stats.duration.snapshot(),
+                'queries': stats.queries.snapshot(),
+                'size': stats.size.snapshot(),
+                'sql_seconds': stats.sql_seconds,
+                'template_seconds': stats.template_seconds,
+                'responses': dict(stats.responses),
+            } for view, stats in self.views.items()}
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+
+
+registry = MetricsRegistry()
+
+
+class RequestTrace:
+    """SQL-запросы и время отрисовки шаблонов одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        # (начало от старта запроса, длительность, SQL)
+        self.queries = []
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+    @property
+    def sql_seconds(self):
+        return sum(duration for _, duration, _ in self.queries)
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((started - self.started,
+                                 time.perf_counter() - started, sql))
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+def timed_render(self, context=None, request=None):
+    # Вложенные render_to_string уже учтены во внешней отрисовке.
+    trace = current_trace()
+    if trace is None or trace.template_depth:
+        return _originals['render'](self, context, request)
+    trace.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _originals['render'](self, context, request)
+    finally:
+        trace.template_seconds += time.perf_counter() - started
+        trace.template_depth -= 1
+
+
+def install():
+    """Включает замер отрисовки шаблонов для метрик запросов."""
+    if _originals:
+        return
+    _originals['render'] = Template.render
+    Template.render = timed_render
+
+
+def uninstall():
+    if not _originals:
+        return
+    Template.render = _originals.pop('render')
+
+
+def view_name(request) -> str:
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED
+    return match.view_name
+
+
+def log_slow_request(request, view, trace):
+    """Пишет в лог медленный запрос со всеми его SQL-запросами по времени."""
+    lines = [
+        f'{request.method} {request.get_full_path()} ({view}): '
+        f'{trace.duration * 1000:.1f} мс, {len(trace.queries)} SQL за '
+        f'{trace.sql_seconds * 1000:.1f} мс, шаблоны '
+        f'{trace.template_seconds * 1000:.1f} мс']
+    limit = settings.METRICS_SLOW_REQUEST_MAX_QUERIES
+    for offset, duration, sql in trace.queries[:limit]:
+        lines.append(f'  +{offset * 1000:8.1f} мс {duration * 1000:7.1f} мс '
+                     f'{sql}')
+    if len(trace.queries) > limit:
+        lines.append(f'  ... ещё {len(trace.queries) - limit} SQL')
+    slow_logger.warning('\n'.join(lines))
+
+
+class MetricsMiddleware:
+    """Считает время, SQL, отрисовку шаблонов и размер ответа каждого
+    запроса по имени view.
+
+    Стоит первой в MIDDLEWARE: время и размер ответа учитывают всю
+    цепочку, включая сжатие. Запросы дольше METRICS_SLOW_REQUEST секунд
+    попадают в лог core.metrics.slow вместе с SQL-запросами.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace = RequestTrace()
+        _local.trace = trace
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(trace.execute))
+                response = self.get_response(request)
+        finally:
+            _local.trace = None
+        trace.finish()
+        view = view_name(request)
+        size = None if response.streaming else len(response.content)
+        registry.record(view, response.status_code, trace, size)
+        if trace.duration >= settings.METRICS_SLOW_REQUEST:
+            log_slow_request(request, view, trace)
+        return response
+
+
+def escape_label(value) -> str:
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsWriter:
+    """Собирает ответ /metrics в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text):
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {kind}')
+
+    def sample(self, name, labels, value):
+        if labels:
+            pairs = ','.join(f'{key}="{escape_label(label)}"'
+                             for key, label in labels.items())
+            name = f'{name}{{{pairs}}}'
+        self.lines.append(f'{name} {format_value(value)}')
+
+    def histogram(self, name, labels, buckets, total):
+        """Корзины buckets — пары (граница, число) без накопления."""
+        count = 0
+        for bound, bucket_count in buckets:
+            count += bucket_count
+            self.sample(f'{name}_bucket',
+                        {**labels, 'le': format_value(bound)}, count)
+        self.sample(f'{name}_sum', labels, total)
+        self.sample(f'{name}_count', labels, count)
+
+    def render(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+
+
+def write_request_metrics(writer):
+    views = sorted(registry.snapshot().items())
+    histograms = (
+        ('yatube_request_duration_seconds', 'duration',
+         'Время ответа по view, секунды.'),
+        ('yatube_request_queries', 'queries',
+         'Число SQL-запросов на один ответ.'),
+        ('yatube_response_size_bytes', 'size',
+         'Размер тела ответа после сжатия, байты.'),
+    )
+    for name, key, help_text in histograms:
+        writer.family(name, 'histogram', help_text)
+        for view, stats in views:
+            buckets, total = stats[key]
+            writer.histogram(name, {'view': view}, buckets, total)
+    counters = (
+        ('yatube_sql_seconds_total', 'sql_seconds',
+         'Время SQL-запросов по view, секунды.'),
+        ('yatube_template_render_seconds_total', 'template_seconds',
+         'Время отрисовки шаблонов по view, секунды.'),
+    )
+    for name, key, help_text in counters:
+        writer.family(name, 'counter', help_text)
+        for view, stats in views:
+            writer.sample(name, {'view': view}, stats[key])
+    writer.family('yatube_responses_total', 'counter',
+                  'Ответы по view и классу статуса.')
+    for view, stats in views:
+        for status, count in sorted(stats['responses'].items()):
+            writer.sample('yatube_responses_total',
+                          {'view': view, 'status': status}, count)
+
+
+def render_metrics() -> str:
+    """Метрики запросов и всех METRICS_COLLECTORS в формате Prometheus."""
+    writer = MetricsWriter()
+    write_request_metrics(writer)
+    for path in settings.METRICS_COLLECTORS:
+        try:
+            import_string(path)(writer)
+        except Exception:
+            logger.exception('Сборщик метрик %s упал', path)
+    return writer.render()
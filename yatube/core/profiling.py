@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.template.base import Node, Template, TextNode, VariableNode
+from django.template.loader_tags import IncludeNode
+
+_local = threading.local()
+_originals = {}
+
+
+class RenderProfile:
+    """Счётчики отрисовки шаблонов процесса.
+
+    По каждому ключу хранит число вызовов, полное время и собственное
+    время без вложенных шаблонов и тегов.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = defaultdict(lambda: [0, 0.0, 0.0])
+        self.flushed = 0.0
+
+    def record(self, key, total, own):
+        with self.lock:
+            stat = self.stats[key]
+            stat[0] += 1
+            stat[1] += total
+            stat[2] += own
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {key: list(stat) for key, stat in self.stats.items()}
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+
+
+profile = RenderProfile()
+
+
+@contextmanager
+def measure(key):
+    """Замеряет блок; время вложенных замеров вычитается из своего."""
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(0.0)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        profile.record(key, elapsed, elapsed - children)
+
+
+def node_key(node):
+    if isinstance(node, IncludeNode):
+        return 'include:' + node.template.token.strip('\'"')
+    if isinstance(node, VariableNode):
+        return 'variable'
+    token = getattr(node, 'token', None)
+    if token is None:
+        return None
+    return 'tag:' + token.contents.split()[0]
+
+
+def profiled_render(self, context):
+    with measure('template:' + (self.origin.template_name or self.name)):
+        return _originals['template'](self, context)
+
+
+def profiled_node(self, context):
+    if isinstance(self, TextNode):
+        return _originals['node'](self, context)
+    key = node_key(self)
+    if key is None:
+        return _originals['node'](self, context)
+    with measure(key):
+        return _originals['node'](self, context)
+
+
+def install():
+    """Включает замеры: подменяет отрисовку шаблонов и узлов."""
+    if _originals:
+        return
+    _originals['template'] = Template._render
+    _originals['node'] = Node.render_annotated
+    Template._render = profiled_render
+    Node.render_annotated = profiled_node
+
+
+def uninstall():
+    if not _originals:
+        return
+    Template._render = _originals.pop('template')
+    Node.render_annotated = _originals.pop('node')
+
+
+def profile_path(pid=None) -> str:
+    return os.path.join(settings.TEMPLATE_PROFILE_DIR,
+                        f'templates.{pid or os.getpid()}.json')
+
+
+def dump_profile(sender=None, **kwargs):
+    """Сохраняет счётчики процесса в файл не чаще раза в секунду.
+
+    Подключается к request_finished при включённом TEMPLATE_PROFILING.
+    """
+    now = time.monotonic()
+    if now - profile.flushed < 1:
+        return
+    profile.flushed = now
+    os.makedirs(settings.TEMPLATE_PROFILE_DIR, exist_ok=True)
+    path = profile_path()
+    with open(path + '.tmp', 'w') as file:
+        json.dump(profile.snapshot(), file)
+    os.replace(path + '.tmp', path)
+
+
+def load_profiles() -> dict:
+    """Складывает счётчики, сохранённые всеми процессами."""
+    stats = defaultdict(lambda: [0, 0.0, 0.0])
+    directory = settings.TEMPLATE_PROFILE_DIR
+    if not os.path.isdir(directory):
+        return {}
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, name)) as file:
+            for key, values in json.load(file).items():
+                stats[key] = [a + b for a, b in zip(stats[key], values)]
+    return dict(stats)
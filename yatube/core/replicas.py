@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+
+PRIMARY = 'default'
+STICKY_COOKIE = 'primary_until'
+# Приложения, которые всегда читают с основной базы: сессия и вход
+# должны видеть только что записанное.
+PRIMARY_APPS = {'sessions'}
+
+_state = threading.local()
+
+
+def reset_state():
+    _state.replica_reads = False
+    _state.wrote = False
+
+
+def use_replicas() -> bool:
+    return getattr(_state, 'replica_reads', False)
+
+
+def mark_write():
+    """Отмечает, что текущий запрос что-то записал."""
+    _state.wrote = True
+
+
+def replica_reads(view):
+    """Разрешает view читать данные с реплик.
+
+    Только для страниц, которые ничего не пишут: остальные запросы
+    читают и пишут в основную базу.
+    """
+    view.replica_reads = True
+    return view
+
+
+class PrimaryReplicaRouter:
+    """Направляет запись в основную базу, а чтение отмеченных view —
+    на случайную реплику из DATABASE_REPLICAS."""
+
+    def db_for_read(self, model, **hints):
+        if (not use_replicas() or not settings.DATABASE_REPLICAS
+                or model._meta.app_label in PRIMARY_APPS):
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        mark_write()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплики вместе с данными.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """Включает чтение с реплик для отмеченных view.
+
+    После запроса с записью браузер получает cookie, и до её истечения
+    все его запросы читают с основной базы: автор сразу видит свой
+    пост, даже если реплика отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset_state()
+        try:
+            response = self.get_response(request)
+            if _state.wrote:
+                sticky = settings.REPLICA_STICKY_SECONDS
+                response.set_cookie(STICKY_COOKIE,
+                                    str(int(time.time()) + sticky),
+                                    max_age=sticky, httponly=True,
+                                    samesite='Lax')
+            return response
+        finally:
+            reset_state()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _state.replica_reads = (
+            getattr(view_func, 'replica_reads', False)
+            and request.method in ('GET', 'HEAD')
+            and not self.is_sticky(request))
+
+    @staticmethod
+    def is_sticky(request) -> bool:
+        try:
+            return int(request.COOKIES[STICKY_COOKIE]) > time.time()
+        except (KeyError, ValueError):
+            return False
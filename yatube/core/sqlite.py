@@ -0,0 +1,105 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+
+from .replicas import mark_write
+
+logger = logging.getLogger(__name__)
+
+# Ошибки SQLite, после которых запись имеет смысл повторить.
+BUSY_MESSAGES = ('database is locked', 'database is busy')
+
+_executor = None
+_executor_lock = threading.Lock()
+_writer = threading.local()
+
+
+def tuning_enabled(connection=None) -> bool:
+    if not settings.SQLITE_TUNING:
+        return False
+    return connection is None or connection.vendor == 'sqlite'
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Настраивает каждое новое соединение с SQLite.
+
+    Подключается к сигналу connection_created, когда включена
+    настройка SQLITE_TUNING.
+    """
+    if not tuning_enabled(connection):
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_busy(error) -> bool:
+    return any(message in str(error) for message in BUSY_MESSAGES)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1,
+                                           thread_name_prefix='sqlite-writer')
+    return _executor
+
+
+def _run_with_retries(func, args, kwargs):
+    """Выполняет func в транзакции, повторяя её при занятой базе."""
+    _writer.active = True
+    close_old_connections()
+    try:
+        for attempt in range(settings.SQLITE_WRITE_RETRIES + 1):
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if (not is_busy(error)
+                        or attempt == settings.SQLITE_WRITE_RETRIES):
+                    raise
+                # Экспоненциальная пауза со случайной добавкой, чтобы
+                # процессы не просыпались одновременно.
+                delay = settings.SQLITE_WRITE_BACKOFF * 2 ** attempt
+                logger.warning('База занята, повтор записи через %.3f с',
+                               delay)
+                time.sleep(delay * random.uniform(1, 1.5))
+    finally:
+        _writer.active = False
+
+
+def serialized_write(func):
+    """Выполняет запись через единственный поток-писатель процесса.
+
+    Очередь общая только для потоков одного процесса. Записи других
+    воркеров, а также сессий, входа и админки идут мимо неё, и с ними
+    запись разводят лишь WAL и busy_timeout с повторами.
+
+    Без SQLITE_TUNING функция просто выполняется в транзакции. Вызовы
+    внутри писателя не ставятся в очередь повторно. Внутри уже открытой
+    транзакции запись тоже выполняется на месте: её соединение может
+    держать блокировку записи, и писатель ждал бы её до busy_timeout.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not tuning_enabled():
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        if getattr(_writer, 'active', False):
+            return func(*args, **kwargs)
+        # Запрос пишет чужими руками, но липкость к основной базе нужна
+        # именно ему.
+        mark_write()
+        if transaction.get_connection().in_atomic_block:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        return get_executor().submit(
+            _run_with_retries, func, args, kwargs).result()
+    return wrapper
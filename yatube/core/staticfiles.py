@@ -0,0 +1,177 @@
+import gzip
+import mimetypes
+import os
+from email.utils import formatdate
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.utils.http import parse_etags
+
+from .compression import accepted_encodings, brotli
+from .css import prune_css, used_tokens
+
+# Уже сжатые форматы (картинки, шрифты woff2) повторно не сжимаются.
+PRECOMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.html', '.json',
+                            '.xml', '.map', '.ico', '.ttf', '.eot')
+# Сжатая копия сохраняется, только если она заметно меньше оригинала.
+MIN_SAVING = 0.95
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+CHUNK_SIZE = 64 * 1024
+
+
+def compress_file(path: str):
+    """Создаёт рядом с файлом .gz и .br копии, возвращает их имена."""
+    with open(path, 'rb') as file:
+        content = file.read()
+    variants = {'.gz': gzip.compress(content, 9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(
+            content, quality=settings.STATIC_BROTLI_QUALITY)
+    created = []
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(content) * MIN_SAVING:
+            with open(path + suffix, 'wb') as file:
+                file.write(compressed)
+            created.append(suffix)
+    return created
+
+
+class PrecompressedManifestStorage(ManifestStaticFilesStorage):
+    """Хранилище статики для collectstatic.
+
+    Вдобавок к именам с хешем содержимого убирает из CSS-файлов
+    STATIC_PRUNE_CSS неиспользуемые правила и кладёт рядом с файлами
+    сжатые .gz и .br копии, которые отдаёт StaticFilesApp.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tokens = None
+
+    def stored_name(self, name):
+        # Пока collectstatic не запускался (разработка, тесты), ссылки
+        # ведут на исходные файлы.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def _save(self, name, content):
+        if name in settings.STATIC_PRUNE_CSS:
+            if self.tokens is None:
+                self.tokens = used_tokens()
+            css = prune_css(content.read().decode('utf-8'), self.tokens)
+            content = ContentFile(css.encode('utf-8'))
+        return super()._save(name, content)
+
+    def post_process(self, paths, dry_run=False, **options):
+        # Хеш и копия с хешем строятся из уже урезанного CSS, а не из
+        # исходника.
+        paths = {path: (self, path) if path in settings.STATIC_PRUNE_CSS
+                 else source for path, source in paths.items()}
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not name.endswith(PRECOMPRESSED_EXTENSIONS):
+                continue
+            for suffix in compress_file(self.path(name)):
+                yield name, name + suffix, True
+
+
+class StaticFile:
+    """Файл статики и его сжатые копии с готовыми заголовками."""
+
+    def __init__(self, path, immutable):
+        self.path = path
+        stat = os.stat(path)
+        content_type, _ = mimetypes.guess_type(path)
+        self.headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+            ('Cache-Control', IMMUTABLE if immutable else
+             f'public, max-age={settings.STATIC_MAX_AGE}'),
+        ]
+        self.etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+        self.variants = {None: (path, stat.st_size)}
+        for encoding, suffix in ENCODING_SUFFIXES:
+            if os.path.exists(path + suffix):
+                self.variants[encoding] = (path + suffix,
+                                           os.path.getsize(path + suffix))
+        if len(self.variants) > 1:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+    def choose(self, accept_encoding: str):
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, _ in ENCODING_SUFFIXES:
+            if encoding in self.variants and accepted.get(
+                    encoding, accepted.get('*', 0)) > 0:
+                return encoding
+        return None
+
+
+class StaticFilesApp:
+    """WSGI-обёртка, отдающая собранную статику из STATIC_ROOT.
+
+    Список файлов читается один раз при запуске воркера, поэтому запрос
+    статики не трогает Django и не проверяет диск. Файлы с хешем в имени
+    кешируются навсегда, остальные — на STATIC_MAX_AGE секунд.
+    """
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = root or settings.STATIC_ROOT
+        self.prefix = prefix or settings.STATIC_URL
+        self.files = self.scan()
+
+    def scan(self) -> dict:
+        if not self.root or not os.path.isdir(self.root):
+            return {}
+        storage = PrecompressedManifestStorage(location=self.root)
+        hashed = set(storage.load_manifest().values())
+        files = {}
+        for root, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.root).replace(
+                    os.sep, '/')
+                files[self.prefix + relative] = StaticFile(
+                    path, relative in hashed)
+        return files
+
+    def __call__(self, environ, start_response):
+        static = self.files.get(environ.get('PATH_INFO', ''))
+        if static is None:
+            return self.application(environ, start_response)
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD')])
+            return []
+        encoding = static.choose(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        etag = static.etag
+        if encoding is not None:
+            etag = f'{etag[:-1]}-{encoding}"'
+        headers = static.headers + [('ETag', etag)]
+        if etag in parse_etags(environ.get('HTTP_IF_NONE_MATCH', '')):
+            start_response('304 Not Modified', headers)
+            return []
+        path, size = static.variants[encoding]
+        headers.append(('Content-Length', str(size)))
+        if encoding is not None:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file = open(path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            return file_wrapper(file, CHUNK_SIZE)
+        return read_chunks(file)
+
+
+def read_chunks(file):
+    with file:
+        yield from iter(lambda: file.read(CHUNK_SIZE), b'')
@@ -0,0 +1,135 @@
+import gzip
+import unittest
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from core.compression import CompressionMiddleware, brotli, choose_encoding
+from core.loaders import collapse_whitespace
+from posts.models import Group, Post
+
+User = get_user_model()
+INDEX_URL = reverse('posts:index')
+GROUP_LIST_URL = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+
+
+class CollapseWhitespaceTests(SimpleTestCase):
+    def test_indentation_removed(self):
+        """Отступы и строки с одними тегами шаблона исчезают."""
+        source = ('<ul>\n    {% for item in items %}\n'
+                  '    <li>{{ item }}</li>\n\n    {% endfor %}\n</ul>\n')
+        self.assertEqual(collapse_whitespace(source),
+                         '<ul>\n{% for item in items %}<li>{{ item }}</li>'
+                         '\n{% endfor %}</ul>\n')
+
+    def test_preformatted_blocks_kept(self):
+        """Содержимое pre, textarea и script не меняется."""
+        source = ('<div>\n  <pre>\n  a\n    b\n</pre>\n'
+                  '  <textarea>\n  x</textarea>')
+        self.assertEqual(collapse_whitespace(source),
+                         '<div>\n<pre>\n  a\n    b\n</pre>\n'
+                         '<textarea>\n  x</textarea>')
+
+    def test_reset_email_keeps_line_breaks(self):
+        """Текстовое письмо сброса пароля не теряет переводы строк."""
+        body = render_to_string('registration/password_reset_email.html', {
+            'protocol': 'http', 'domain': 'testserver',
+            'site_name': 'testserver', 'uid': 'MQ', 'token': 'token',
+            'user': User(username='auth'), 'email': 'auth@example.com'})
+        self.assertIn('\n\n', body)
+        self.assertIn('\nhttp://testserver/auth/reset/MQ/token/\n', body)
+
+
+class ChooseEncodingTests(SimpleTestCase):
+    def test_negotiation(self):
+        best = 'br' if brotli is not None else 'gzip'
+        cases = {
+            'gzip, deflate, br': best,
+            'gzip;q=1.0, br;q=0.5': 'gzip',
+            'gzip;q=0': None,
+            'identity': None,
+            '*': best,
+            '': None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(choose_encoding(header), expected)
+
+
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='auth')
+        group = Group.objects.create(title='Тестовая группа',
+                                     slug='test-slug',
+                                     description='Тестовое описание')
+        for num in range(10):
+            Post.objects.create(text=f'Тестовая запись {num}',
+                                author=author, group=group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_gzip_page(self):
+        """Страница сжимается в gzip и распаковывается в тот же HTML."""
+        plain = self.client.get(INDEX_URL)
+        response = self.client.get(INDEX_URL, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+
+    @unittest.skipIf(brotli is None, 'пакет brotli не установлен')
+    def test_brotli_page(self):
+        plain = self.client.get(INDEX_URL)
+        response = self.client.get(INDEX_URL,
+                                   HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+
+    def test_small_response_not_compressed(self):
+        """Ответы меньше COMPRESSION_MIN_SIZE отдаются как есть."""
+        with self.settings(COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.client.get(INDEX_URL,
+                                       HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_weak_etag_still_matches(self):
+        """После сжатия ETag слабый, но 304 по нему работает."""
+        etag = self.client.get(GROUP_LIST_URL,
+                               HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        self.assertTrue(etag.startswith('W/'))
+        response = self.client.get(GROUP_LIST_URL,
+                                   HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_pages_with_secrets_not_compressed(self):
+        """Страницы с CSRF-токеном и HTML залогиненных не сжимаются."""
+        response = self.client.get(reverse('users:login'),
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotIn('Content-Encoding', response)
+        self.client.force_login(User.objects.get(username='auth'))
+        response = self.client.get(INDEX_URL, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_streaming_compressed_by_chunks(self):
+        """Каждый кусок потока можно распаковать сразу после получения."""
+        chunks = [b'<p>%d</p>' % num * 100 for num in range(3)]
+        middleware = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(chunks)))
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = middleware(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        decompressor = zlib.decompressobj(31)
+        received = [decompressor.decompress(part)
+                    for part in response.streaming_content]
+        self.assertEqual(received[:3], chunks)
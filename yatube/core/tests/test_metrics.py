@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import Histogram, MetricsWriter, registry
+from posts.models import Group, Post
+
+User = get_user_model()
+INDEX_URL = reverse('posts:index')
+METRICS_URL = reverse('metrics')
+
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='auth')
+        group = Group.objects.create(title='Тестовая группа',
+                                     slug='test-slug',
+                                     description='Тестовое описание')
+        Post.objects.bulk_create(
+            Post(text=f'Тестовая запись {num}', author=author, group=group)
+            for num in range(3))
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.guest_client = Client()
+
+    def test_histogram_buckets(self):
+        """Значение на границе попадает в корзину этой границы."""
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 5, 7):
+            histogram.observe(value)
+        self.assertEqual(histogram.snapshot(),
+                         ([(1, 2), (5, 2), (float('inf'), 1)], 16))
+
+    def test_request_recorded_by_view(self):
+        """Запрос учитывается по имени view вместе с SQL и шаблонами."""
+        response = self.guest_client.get(INDEX_URL)
+        stats = registry.snapshot()['posts:index']
+        buckets, _ = stats['duration']
+        self.assertEqual(sum(count for _, count in buckets), 1)
+        queries, query_total = stats['queries']
+        self.assertGreaterEqual(query_total, 1)
+        self.assertGreater(stats['sql_seconds'], 0)
+        self.assertGreater(stats['template_seconds'], 0)
+        self.assertEqual(stats['size'][1], len(response.content))
+        self.assertEqual(stats['responses'], {'2xx': 1})
+
+    def test_unresolved_request(self):
+        self.guest_client.get('/no/such/page/')
+        self.assertEqual(
+            registry.snapshot()['<unresolved>']['responses'], {'4xx': 1})
+
+    def test_metrics_endpoint(self):
+        """/metrics отдаёт накопленные гистограммы в формате Prometheus."""
+        self.guest_client.get(INDEX_URL)
+        response = self.guest_client.get(METRICS_URL)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        content = response.content.decode()
+        for line in (
+                '# TYPE yatube_request_duration_seconds histogram',
+                'yatube_request_duration_seconds_bucket'
+                '{view="posts:index",le="+Inf"} 1',
+                'yatube_request_duration_seconds_count{view="posts:index"} 1',
+                'yatube_responses_total{view="posts:index",status="2xx"} 1',
+                '# TYPE yatube_thumbnail_queue_depth gauge'):
+            with self.subTest(line=line):
+                self.assertIn(line + '\n', content)
+
+    def test_metrics_endpoint_forbidden(self):
+        response = self.guest_client.get(METRICS_URL,
+                                         REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, 403)
+
+    def test_metrics_endpoint_forbidden_through_proxy(self):
+        """Запрос через прокси приходит с локального адреса, но без
+        токена его не пускают."""
+        response = self.guest_client.get(
+            METRICS_URL, REMOTE_ADDR='127.0.0.1',
+            HTTP_X_FORWARDED_FOR='203.0.113.5')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_token(self):
+        """С METRICS_TOKEN метрики отдаются только по токену, с любого
+        адреса."""
+        cases = {'Bearer secret': 200, 'Bearer wrong': 403, 'secret': 403,
+                 '': 403}
+        for header, status in cases.items():
+            with self.subTest(header=header):
+                response = self.guest_client.get(
+                    METRICS_URL, REMOTE_ADDR='127.0.0.1',
+                    HTTP_X_FORWARDED_FOR='203.0.113.5',
+                    HTTP_AUTHORIZATION=header)
+                self.assertEqual(response.status_code, status)
+
+    @override_settings(METRICS_SLOW_REQUEST=0)
+    def test_slow_request_log(self):
+        """Медленный запрос пишется в лог со своими SQL-запросами."""
+        with self.assertLogs('core.metrics.slow', 'WARNING') as logs:
+            self.guest_client.get(INDEX_URL)
+        self.assertIn(f'GET {INDEX_URL} (posts:index)', logs.output[0])
+        self.assertIn('FROM "posts_post"', logs.output[0])
+
+    def test_writer_escapes_labels(self):
+        writer = MetricsWriter()
+        writer.sample('metric', {'view': 'a"b\\c'}, 1.5)
+        self.assertEqual(writer.render(), 'metric{view="a\\"b\\\\c"} 1.5\n')
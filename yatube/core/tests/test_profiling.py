@@ -0,0 +1,89 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import engines
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling
+from core.loaders import prewarm_templates
+from posts.models import Group, Post
+
+User = get_user_model()
+INDEX_URL = reverse('posts:index')
+PROFILE_DIR = tempfile.mkdtemp()
+
+
+class PrewarmTests(TestCase):
+    def test_templates_compiled_in_advance(self):
+        """После прогрева шаблоны страниц уже в кеше загрузчика."""
+        loader = engines['django'].engine.template_loaders[0]
+        loader.reset()
+        self.assertGreater(prewarm_templates(), 0)
+        cached = set(loader.get_template_cache)
+        for name in ('base.html', 'posts/index.html',
+                     'posts/includes/paginator.html'):
+            with self.subTest(name=name):
+                self.assertIn(name, cached)
+
+
+@override_settings(TEMPLATE_PROFILE_DIR=PROFILE_DIR)
+class RenderProfileTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='auth')
+        group = Group.objects.create(title='Тестовая группа',
+                                     slug='test-slug',
+                                     description='Тестовое описание')
+        for num in range(10):
+            Post.objects.create(text=f'Тестовая запись {num}',
+                                author=author, group=group)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        profiling.install()
+        self.addCleanup(profiling.uninstall)
+        profiling.profile.reset()
+
+    def test_time_attributed(self):
+        """Время раскладывается по шаблонам, include и тегам."""
+        Client().get(INDEX_URL)
+        stats = profiling.profile.snapshot()
+        for key in ('template:base.html', 'template:posts/index.html',
+                    'include:posts/includes/paginator.html',
+                    'include:includes/header.html', 'tag:url'):
+            with self.subTest(key=key):
+                self.assertIn(key, stats)
+        count, total, own = stats['include:posts/includes/post_card.html']
+        self.assertEqual(count, 10)
+        self.assertLessEqual(own, total)
+
+    def test_uninstall_restores_rendering(self):
+        profiling.uninstall()
+        Client().get(INDEX_URL)
+        self.assertEqual(profiling.profile.snapshot(), {})
+
+    def test_report_from_worker_files(self):
+        """Команда складывает замеры, сохранённые процессами."""
+        Client().get(INDEX_URL)
+        profiling.profile.flushed = 0
+        profiling.dump_profile()
+        out = StringIO()
+        call_command('template_profile', stdout=out)
+        self.assertIn('include:posts/includes/paginator.html',
+                      out.getvalue())
+
+    def test_report_for_urls(self):
+        out = StringIO()
+        call_command('template_profile', url=[INDEX_URL], repeat=2,
+                     stdout=out)
+        self.assertIn('Страниц: 2', out.getvalue())
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core.replicas import (STICKY_COOKIE, PrimaryReplicaRouter,
+                           ReplicaRoutingMiddleware, replica_reads)
+from posts.models import Post
+
+User = get_user_model()
+router = PrimaryReplicaRouter()
+
+
+@replica_reads
+def read_view(request):
+    return HttpResponse(router.db_for_read(Post))
+
+
+def write_view(request):
+    router.db_for_write(Post)
+    return HttpResponse(router.db_for_read(Post))
+
+
+def session_view(request):
+    return HttpResponse(router.db_for_read(Session))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def run_view(self, view, request):
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        return middleware(request)
+
+    def test_marked_view_reads_from_replica(self):
+        """Отмеченная страница читает с реплики."""
+        response = self.run_view(read_view, self.factory.get('/'))
+        self.assertEqual(response.content, b'replica')
+
+    def test_unmarked_view_uses_primary(self):
+        """Неотмеченная страница и запись работают с основной базой."""
+        response = self.run_view(write_view, self.factory.get('/'))
+        self.assertEqual(response.content, b'default')
+
+    def test_post_request_uses_primary(self):
+        """POST-запрос к отмеченной странице читает с основной базы."""
+        response = self.run_view(read_view, self.factory.post('/'))
+        self.assertEqual(response.content, b'default')
+
+    def test_write_makes_browser_sticky(self):
+        """После записи браузер читает с основной базы."""
+        response = self.run_view(write_view, self.factory.post('/'))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+        self.assertEqual(self.run_view(read_view, request).content,
+                         b'default')
+
+    def test_expired_stickiness(self):
+        """Истёкшая cookie возвращает чтение на реплику."""
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = str(int(time.time()) - 1)
+        self.assertEqual(self.run_view(read_view, request).content,
+                         b'replica')
+
+    def test_sessions_always_primary(self):
+        """Сессии читаются с основной базы даже на отмеченных страницах."""
+        response = self.run_view(replica_reads(session_view),
+                                 self.factory.get('/'))
+        self.assertEqual(response.content, b'default')
+
+    def test_outside_request_uses_primary(self):
+        """Вне запроса (команды, фоновые задачи) чтение идёт с основной."""
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_no_migrations_on_replicas(self):
+        """Миграции применяются только к основной базе."""
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=10)
+class ReplicaDatabaseTests(TransactionTestCase):
+    """Чтение с настоящей репликой: копией тестовой базы в SQLite-файле."""
+
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+        delattr(connections._connections, 'replica')
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(username='author')
+        Post.objects.create(text='Запись на реплике', author=author)
+        call_command('sync_sqlite_replica', stdout=StringIO())
+        # Эта запись есть только в основной базе: реплика отстала.
+        Post.objects.create(text='Свежая запись', author=author)
+        self.url = reverse('posts:profile', args=['author'])
+
+    def test_marked_view_reads_replica(self):
+        """Отмеченная страница читает с реплики и не видит свежую
+        запись."""
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Запись на реплике')
+        self.assertNotContains(response, 'Свежая запись')
+
+    def test_sticky_browser_reads_primary(self):
+        """Браузер после записи читает с основной базы и видит свою
+        запись."""
+        self.client.cookies[STICKY_COOKIE] = str(int(time.time()) + 10)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Свежая запись')
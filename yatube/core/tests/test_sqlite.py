@@ -0,0 +1,91 @@
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.db import OperationalError, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.sqlite import serialized_write
+
+
+@override_settings(SQLITE_TUNING=True, SQLITE_WRITE_RETRIES=3,
+                   SQLITE_WRITE_BACKOFF=0.001)
+class SQLiteTuningTests(SimpleTestCase):
+    def test_pragmas_applied_to_new_connections(self):
+        """Новое соединение получает WAL и остальные настройки."""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper({
+                'NAME': os.path.join(directory, 'db.sqlite3'),
+                'CONN_MAX_AGE': 0, 'OPTIONS': {}, 'TIME_ZONE': None,
+                'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False,
+                'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '',
+            }, 'tuning_test')
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA synchronous')
+                    # 1 — NORMAL.
+                    self.assertEqual(cursor.fetchone()[0], 1)
+            finally:
+                wrapper.close()
+
+    def test_writes_run_in_single_writer_thread(self):
+        """Все записи выполняются одним потоком-писателем."""
+        names = set()
+
+        def write():
+            names.add(threading.current_thread().name)
+
+        threads = [threading.Thread(target=serialized_write(write))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(names), 1)
+        self.assertTrue(names.pop().startswith('sqlite-writer'))
+
+    def test_busy_database_retried(self):
+        """Запись при занятой базе повторяется с паузой."""
+        write = mock.Mock(side_effect=[
+            OperationalError('database is locked'),
+            OperationalError('database is locked'),
+            'готово'])
+        with mock.patch('core.sqlite.time.sleep') as sleep:
+            self.assertEqual(serialized_write(write)(), 'готово')
+        self.assertEqual(write.call_count, 3)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertLess(delays[0], delays[1])
+
+    def test_other_errors_not_retried(self):
+        """Прочие ошибки базы не повторяются."""
+        write = mock.Mock(side_effect=OperationalError('no such table'))
+        with self.assertRaises(OperationalError):
+            serialized_write(write)()
+        self.assertEqual(write.call_count, 1)
+
+    def test_gives_up_after_retries(self):
+        """После всех повторов ошибка пробрасывается."""
+        write = mock.Mock(side_effect=OperationalError('database is locked'))
+        with mock.patch('core.sqlite.time.sleep'):
+            with self.assertRaises(OperationalError):
+                serialized_write(write)()
+        self.assertEqual(write.call_count, 4)
+
+
+@override_settings(SQLITE_TUNING=True)
+class SerializedWriteInTransactionTests(TestCase):
+    def test_write_inside_transaction_runs_in_place(self):
+        """Внутри открытой транзакции запись не уходит к писателю:
+        он ждал бы блокировку этой же транзакции."""
+        names = []
+
+        def write():
+            names.append(threading.current_thread().name)
+
+        with transaction.atomic():
+            serialized_write(write)()
+        self.assertEqual(names, [threading.current_thread().name])
@@ -0,0 +1,91 @@
+import gzip
+import os
+import shutil
+import tempfile
+from wsgiref.util import setup_testing_defaults
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from core.css import prune_css
+from core.staticfiles import StaticFilesApp
+
+STATIC_ROOT = tempfile.mkdtemp()
+CSS = ('/*! лицензия */.used{color:red}.unused{color:blue}'
+       '.used,.unused>a{margin:0}a:not(.unused){color:green}'
+       '@media (min-width:576px){.unused{padding:0}.used .used{padding:1px}}'
+       '@font-face{font-family:x;src:url("a{b}.woff")}'
+       '.x[data-c="}"]{top:0}')
+
+
+class PruneCssTests(SimpleTestCase):
+    def test_unused_selectors_removed(self):
+        """Селекторы с незнакомыми классами исчезают, остальное цело."""
+        self.assertEqual(
+            prune_css(CSS, {'used'}),
+            '/*! лицензия */\n.used{color:red}.used{margin:0}'
+            '@media (min-width:576px){.used .used{padding:1px}}'
+            '@font-face{font-family:x;src:url("a{b}.woff")}')
+
+
+@override_settings(STATIC_ROOT=STATIC_ROOT, STATIC_BROTLI_QUALITY=1)
+class StaticPipelineTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, verbosity=0,
+                     ignore_patterns=['admin'])
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, app, path, **headers):
+        environ = {'PATH_INFO': path, **headers}
+        setup_testing_defaults(environ)
+        result = {}
+
+        def start_response(status, response_headers):
+            result['status'] = status
+            result['headers'] = dict(response_headers)
+
+        body = b''.join(app(environ, start_response))
+        return result['status'], result['headers'], body
+
+    def test_hashed_pruned_and_precompressed(self):
+        """В STATIC_ROOT лежит урезанный CSS с хешем и его .gz копия."""
+        url = Template('{% load static %}{% static "css/bootstrap.min.css" %}'
+                       ).render(Context())
+        name = url[len('/static/'):]
+        self.assertRegex(name, r'^css/bootstrap\.min\.[0-9a-f]{12}\.css$')
+        path = staticfiles_storage.path(name)
+        self.assertLess(os.path.getsize(path), 50 * 1024)
+        with open(path, 'rb') as file, open(path + '.gz', 'rb') as packed:
+            self.assertEqual(gzip.decompress(packed.read()), file.read())
+
+    def test_wsgi_serves_hashed_files_immutable(self):
+        """Файл с хешем отдаётся сжатым и с вечным кешем, 304 по ETag."""
+        app = StaticFilesApp(lambda environ, start_response: [b'django'])
+        url = staticfiles_storage.url('css/bootstrap.min.css')
+        status, headers, body = self.get(app, url,
+                                         HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(status, '200 OK')
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        status, _, body = self.get(app, url, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(body, b'')
+
+    def test_wsgi_unhashed_and_unknown_paths(self):
+        """Файл без хеша кешируется недолго, прочее уходит в Django."""
+        app = StaticFilesApp(lambda environ, start_response: [b'django'])
+        _, headers, _ = self.get(app, '/static/img/logo.png')
+        self.assertNotIn('immutable', headers['Cache-Control'])
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(app({'PATH_INFO': '/static/missing.css'}, None),
+                         [b'django'])
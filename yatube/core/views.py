@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import CONTENT_TYPE, render_metrics
 
 
 def page_not_found(request, exception):
@@ -18,3 +23,27 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics_allowed(request) -> bool:
+    """Пускает к метрикам по токену METRICS_TOKEN, а без него — только
+    прямые запросы с METRICS_ALLOWED_IPS.
+
+    Запрос, прошедший через прокси, узнаётся по X-Forwarded-For: его
+    REMOTE_ADDR — адрес прокси, а не клиента.
+    """
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.META.get(
+            'HTTP_AUTHORIZATION', '').partition(' ')
+        return (scheme.lower() == 'bearer'
+                and constant_time_compare(token, settings.METRICS_TOKEN))
+    return ('HTTP_X_FORWARDED_FOR' not in request.META
+            and request.META.get('REMOTE_ADDR')
+            in settings.METRICS_ALLOWED_IPS)
+
+
+def metrics(request):
+    """Метрики процесса в текстовом формате Prometheus."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
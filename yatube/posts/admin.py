@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Group, Post
+from .models import Follow, Group, GroupFollow, Post
+from .search import filter_by_search
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -11,6 +12,14 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт через полнотекстовый индекс, а не LIKE.
+        found = filter_by_search(queryset, search_term)
+        if found is None:
+            return super().get_search_results(request, queryset,
+                                              search_term)
+        return found, False
+
 
 class GroupAdmin(admin.ModelAdmin):
     ''' Класс GroupAdmin приводит админку по группам к нужному виду'''
@@ -20,5 +29,21 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class FollowAdmin(admin.ModelAdmin):
+    ''' Класс FollowAdmin для подписок на авторов'''
+
+    list_display = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+
+
+class GroupFollowAdmin(admin.ModelAdmin):
+    ''' Класс GroupFollowAdmin для подписок на группы'''
+
+    list_display = ('user', 'group')
+    search_fields = ('user__username', 'group__title')
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
+admin.site.register(Follow, FollowAdmin)
+admin.site.register(GroupFollow, GroupFollowAdmin)
@@ -0,0 +1,172 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, HttpRequest, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from core.replicas import replica_reads
+
+from .cache import cache_anonymous_page, conditional_page, edge_cache
+from .models import Group, Post, User
+from .paginators import POSTS_PER_PAGE, CursorPaginator
+from .purge import tag_response
+from .variants import card_image, prefetch_card_images
+from .views import (group_scopes, group_state, post_detail_scopes,
+                    post_detail_state, profile_scopes, profile_state)
+
+# Без пробелов и \u-экранирования кириллицы ответ заметно короче.
+JSON_DUMPS_PARAMS = {'separators': (',', ':'), 'ensure_ascii': False}
+
+
+def image_value(post):
+    im = card_image(post.image) if post.image else None
+    if im is None:
+        return None
+    return {'url': im.url, 'sources': im.sources, 'sizes': im.sizes}
+
+
+def group_value(post):
+    return post.group.slug if post.group_id else None
+
+
+# Поле ответа: столбцы для only() и функция, достающая значение из поста.
+FIELDS = {
+    'id': ((), lambda post: post.pk),
+    'text': (('text',), lambda post: post.text),
+    'pub_date': (('pub_date',), lambda post: post.pub_date),
+    'updated_at': (('updated_at',), lambda post: post.updated_at),
+    'author': (('author', 'author__username'),
+               lambda post: post.author.username),
+    'author_name': (('author', 'author__first_name', 'author__last_name'),
+                    lambda post: post.author.get_full_name()),
+    'group': (('group', 'group__slug'), group_value),
+    'image': (('image',), image_value),
+    'url': ((), lambda post: reverse('posts:post_detail', args=[post.pk])),
+}
+
+
+class InvalidParameter(ValueError):
+    """Неверный параметр запроса к API."""
+
+
+def api_errors(view):
+    """Отдаёт ошибки API в JSON, а не страницами сайта."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'error': 'not found'}, status=404)
+        except InvalidParameter as error:
+            return JsonResponse({'error': str(error)}, status=400)
+    return wrapper
+
+
+def parse_fields(request: HttpRequest):
+    """Список полей из ?fields=id,text; без параметра — все поля."""
+    value = request.GET.get('fields')
+    if not value:
+        return list(FIELDS)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown:
+        raise InvalidParameter(f'unknown fields: {",".join(unknown)}')
+    return fields
+
+
+def parse_limit(request: HttpRequest) -> int:
+    value = request.GET.get('limit')
+    if value is None:
+        return POSTS_PER_PAGE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise InvalidParameter('limit must be an integer') from None
+    if not 1 <= limit <= settings.POSTS_API_MAX_LIMIT:
+        raise InvalidParameter(
+            f'limit must be between 1 and {settings.POSTS_API_MAX_LIMIT}')
+    return limit
+
+
+def sparse_queryset(posts, fields):
+    """Выбирает из базы только столбцы запрошенных полей.
+
+    Дата нужна для курсоров, автор и группа — для ключей сброса CDN.
+    """
+    columns = {'pub_date', 'author', 'group'}
+    for name in fields:
+        columns.update(FIELDS[name][0])
+    related = {column.split('__')[0] for column in columns
+               if '__' in column}
+    return posts.select_related(*related).only(*columns)
+
+
+def serialize(posts, fields):
+    getters = [(name, FIELDS[name][1]) for name in fields]
+    if 'image' in fields:
+        prefetch_card_images(posts)
+    return [{name: getter(post) for name, getter in getters}
+            for post in posts]
+
+
+def feed_response(request: HttpRequest, posts, *keys) -> JsonResponse:
+    """Страница ленты в JSON с курсорами соседних страниц."""
+    fields = parse_fields(request)
+    paginator = CursorPaginator(sparse_queryset(posts, fields),
+                                parse_limit(request))
+    page_obj = paginator.cursor_page(after=request.GET.get('after'),
+                                     before=request.GET.get('before'))
+    data = {'results': serialize(page_obj, fields),
+            'next': page_obj.next_cursor,
+            'previous': page_obj.previous_cursor}
+    response = JsonResponse(data, json_dumps_params=JSON_DUMPS_PARAMS)
+    return tag_response(response, page_obj, *keys)
+
+
+@replica_reads
+@edge_cache('feed')
+@cache_anonymous_page(lambda: ['index'])
+@api_errors
+def index(request: HttpRequest) -> JsonResponse:
+    """ Функция отдаёт ленту последних постов в JSON."""
+    return feed_response(request, Post.objects.all(), 'index')
+
+
+@replica_reads
+@edge_cache('feed')
+@cache_anonymous_page(group_scopes)
+@conditional_page(group_state)
+@api_errors
+def group_posts(request: HttpRequest, slug: str) -> JsonResponse:
+    """ Функция отдаёт посты группы в JSON."""
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return feed_response(request, Post.objects.filter(group=group),
+                         f'group-{group.pk}')
+
+
+@replica_reads
+@edge_cache('feed')
+@cache_anonymous_page(profile_scopes)
+@conditional_page(profile_state)
+@api_errors
+def profile(request: HttpRequest, username: str) -> JsonResponse:
+    """ Функция отдаёт посты автора в JSON."""
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return feed_response(request, Post.objects.filter(author=author),
+                         f'author-{author.pk}')
+
+
+@replica_reads
+@edge_cache('post')
+@cache_anonymous_page(post_detail_scopes)
+@conditional_page(post_detail_state)
+@api_errors
+def post_detail(request: HttpRequest, post_id: int) -> JsonResponse:
+    """ Функция отдаёт пост в JSON."""
+    fields = parse_fields(request)
+    post = get_object_or_404(
+        sparse_queryset(Post.objects.all(), fields), pk=post_id)
+    response = JsonResponse(serialize([post], fields)[0],
+                            json_dumps_params=JSON_DUMPS_PARAMS)
+    return tag_response(response, [post])
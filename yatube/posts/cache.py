@@ -0,0 +1,178 @@
+import hashlib
+import math
+import time
+from datetime import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+PAGE_CACHE_PREFIX = 'posts.page'
+SCOPE_CACHE_PREFIX = 'posts.scope'
+
+
+def scope_key(scope: str) -> str:
+    return f'{SCOPE_CACHE_PREFIX}:{scope}'
+
+
+def scope_versions(scopes):
+    """Возвращает текущие версии областей кеша, создавая недостающие."""
+    keys = [scope_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Версия от времени, а не счётчик: если ключ вытеснен из кеша,
+            # новая версия не совпадёт со старыми страницами.
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [str(versions[key]) for key in keys]
+
+
+def page_cache_key(request, scopes) -> str:
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    versions = '.'.join(scope_versions(scopes))
+    return f'{PAGE_CACHE_PREFIX}:{versions}:{path}'
+
+
+def invalidate_scopes(*scopes):
+    """Сбрасывает все закешированные страницы указанных областей."""
+    for scope in scopes:
+        cache.set(scope_key(scope), time.time_ns(), timeout=None)
+
+
+def cache_anonymous_page(get_scopes):
+    """Кеширует ответ view для незалогиненных пользователей.
+
+    get_scopes получает аргументы view и возвращает области, при
+    сбросе которых страница устаревает, или None, если страницы нет.
+    Время жизни страницы ограничено настройкой POSTS_CACHE_TTL.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            scopes = get_scopes(*args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            key = page_cache_key(request, scopes)
+            response = cache.get(key)
+            if response is not None:
+                # Валидаторы закешированы вместе со страницей и сбрасываются
+                # с ней же, поэтому 304 отдаётся без запросов к базе.
+                return get_conditional_response(
+                    request, etag=response.get('ETag'),
+                    last_modified=parse_http_date_safe(
+                        response.get('Last-Modified', '')),
+                    response=response)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, response, settings.POSTS_CACHE_TTL)
+            return response
+        return wrapper
+    return decorator
+
+
+def stamps_last_modified(state):
+    """Last-Modified по отметкам времени из состояния страницы или None.
+
+    Округлённая вверх до секунды, самая новая отметка годится
+    в Last-Modified, только когда эта секунда уже прошла: иначе изменение
+    в ту же секунду получило бы ту же дату, и клиент с If-Modified-Since
+    получил бы 304.
+    """
+    stamps = [value.timestamp() for value in state
+              if isinstance(value, datetime)]
+    if not stamps:
+        return None
+    modified = math.ceil(max(stamps))
+    if modified <= time.time():
+        return modified
+    return None
+
+
+def conditional_page(get_state):
+    """Отвечает 304, если страница не менялась с прошлого запроса.
+
+    get_state получает аргументы view и одним запросом к базе читает
+    состояние страницы: даты изменения её постов, группы и авторов,
+    число постов, — или возвращает None, если страницы нет. ETag — хеш
+    этого состояния, Last-Modified — самая новая дата в нём. Валидаторы
+    берутся из базы, а не из кеша процесса, поэтому правки из других
+    воркеров и команд видны сразу. Как и кеш страниц, работает только
+    для незалогиненных: залогиненным страница показывает ещё и их
+    подписки.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            state = get_state(*args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            etag = quote_etag(hashlib.md5(
+                repr(tuple(state)).encode()).hexdigest())
+            last_modified = stamps_last_modified(state)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                if last_modified:
+                    response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def edge_cache(policy: str):
+    """Задаёт Cache-Control ответа по политике из POSTS_EDGE_CACHE.
+
+    Страницы анонимов может хранить CDN, а браузер всегда проверяет
+    их по ETag. Страницы залогиненных CDN не хранит.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated
+                    or response.status_code not in (200, 304)):
+                patch_cache_control(response, private=True, max_age=0)
+                return response
+            patch_cache_control(response, public=True, max_age=0,
+                                **settings.POSTS_EDGE_CACHE[policy])
+            return response
+        return wrapper
+    return decorator
+
+
+def post_scopes(post, group_slugs=(), usernames=()):
+    scopes = {'index', f'post:{post.pk}', f'profile:{post.author.username}'}
+    scopes.update(f'group:{slug}' for slug in group_slugs)
+    scopes.update(f'profile:{username}' for username in usernames)
+    return scopes
+
+
+def invalidate_pages(*scopes):
+    """Сбрасывает страницы областей сейчас и ещё раз после коммита.
+
+    Повторный сброс не даёт параллельному запросу закешировать страницу
+    со старыми данными до конца транзакции, а версия области остаётся
+    не раньше времени изменения.
+    """
+    invalidate_scopes(*scopes)
+    transaction.on_commit(lambda: invalidate_scopes(*scopes))
+
+
+def invalidate_post_pages(post, group_slugs=(), usernames=()):
+    """Сбрасывает страницы, на которых показан пост."""
+    invalidate_pages(*post_scopes(post, group_slugs, usernames))
@@ -0,0 +1,55 @@
+import io
+import math
+from itertools import accumulate
+
+from PIL import Image, ImageDraw
+
+# Слоги для синтетического словаря: слова похожи на русские и склоняются.
+SYLLABLES = ('ка', 'ро', 'ви', 'ле', 'то', 'на', 'ми', 'су', 'пе', 'до',
+             'зо', 'ря', 'ти', 'ло', 'ме', 'гу', 'ба', 'ще', 'вы', 'хо')
+ENDINGS = ('', 'а', 'ы', 'ой', 'ами', 'ах', 'ого', 'ая', 'ет', 'ют', 'ить')
+IMAGE_SIZE = (1280, 720)
+
+
+def make_vocabulary(rng, size):
+    roots = set()
+    while len(roots) < size:
+        roots.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(roots)
+
+
+def zipf_weights(size, exponent=1.0):
+    """Накопленные веса рангов 1..size по закону Ципфа для rng.choices.
+
+    Первый ранг выпадает чаще всех, как самый частый автор или слово.
+    """
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, size + 1)))
+
+
+def text_length(rng, median, sigma=0.9, limit=1000):
+    """Число слов поста: логнормальное, большинство постов короткие."""
+    return max(1, min(limit, round(rng.lognormvariate(math.log(median),
+                                                      sigma))))
+
+
+def make_text(rng, roots, weights, words):
+    """Текст из words слов с частотами по Ципфу и случайными окончаниями."""
+    text = ' '.join(map(str.__add__,
+                        rng.choices(roots, cum_weights=weights, k=words),
+                        rng.choices(ENDINGS, k=words)))
+    return text[0].upper() + text[1:] + '.'
+
+
+def make_image(rng) -> bytes:
+    """JPEG с цветными кругами: сжимается как фотография, а не заливка."""
+    image = Image.new('RGB', IMAGE_SIZE, tuple(rng.choices(range(256), k=3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(20):
+        x, y = rng.randrange(IMAGE_SIZE[0]), rng.randrange(IMAGE_SIZE[1])
+        size = rng.randint(20, 300)
+        draw.ellipse((x, y, x + size, y + size),
+                     fill=tuple(rng.choices(range(256), k=3)))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
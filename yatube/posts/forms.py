@@ -1,16 +1,20 @@
 from django import forms
 
 from .models import Post
+from .uploads import BoundedImageField
 
 
 class PostForm(forms.ModelForm):
     """Форма для создания поста."""
     class Meta:
         model = Post
-        fields = ('text', 'group')
+        fields = ('text', 'group', 'image')
+        field_classes = {'image': BoundedImageField}
         labels = {'text': 'Текст',
                   'group': 'Группа',
+                  'image': 'Картинка',
                   }
         help_texts = {'text': 'Введите текст',
                       'group': 'выберете из существующих',
+                      'image': 'JPEG, PNG, GIF или WebP',
                       }
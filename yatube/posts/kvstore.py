@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+
+# SQLite ограничивает число параметров в одном запросе.
+BATCH_SIZE = 500
+
+
+class LRUCache:
+    """Потокобезопасный LRU-словарь ограниченного размера."""
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class SQLiteKVStore(KVStoreBase):
+    """KV-хранилище sorl-thumbnail в локальном файле SQLite в режиме WAL.
+
+    Перед файлом стоит LRU-кеш процесса, поэтому повторные страницы
+    не обращаются ни к базе проекта, ни к файлу. Путь к файлу задаёт
+    настройка THUMBNAIL_SQLITE_PATH, размер кеша — THUMBNAIL_LRU_SIZE.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lru = LRUCache(settings.THUMBNAIL_LRU_SIZE)
+        self.local = threading.local()
+        self.path = None
+
+    @property
+    def connection(self):
+        path = settings.THUMBNAIL_SQLITE_PATH
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.path != path:
+            connection = sqlite3.connect(path, timeout=5,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS thumbnail_kv '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            self.local.connection = connection
+            self.local.path = path
+        if self.path != path:
+            # Файл сменился (например, в тестах): кеш от старого не годится.
+            self.lru.clear()
+            self.path = path
+        return connection
+
+    def get_many(self, image_files, identity='image'):
+        """Возвращает словарь {ключ: значение} одним запросом к файлу."""
+        keys = {add_prefix(image_file.key, identity): image_file.key
+                for image_file in image_files}
+        found = {}
+        missing = []
+        for raw_key in keys:
+            value = self.lru.get(raw_key)
+            if value is None:
+                missing.append(raw_key)
+            else:
+                found[raw_key] = value
+        for start in range(0, len(missing), BATCH_SIZE):
+            batch = missing[start:start + BATCH_SIZE]
+            rows = self.connection.execute(
+                'SELECT key, value FROM thumbnail_kv WHERE key IN (%s)'
+                % ', '.join('?' * len(batch)), batch)
+            for raw_key, value in rows:
+                self.lru.set(raw_key, value)
+                found[raw_key] = value
+        load = deserialize_image_file if identity == 'image' else deserialize
+        return {keys[raw_key]: load(value)
+                for raw_key, value in found.items()}
+
+    def clear(self):
+        super().clear()
+        self.lru.clear()
+
+    def _get_raw(self, key):
+        value = self.lru.get(key)
+        if value is not None:
+            return value
+        row = self.connection.execute(
+            'SELECT value FROM thumbnail_kv WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self.lru.set(key, row[0])
+        return row[0]
+
+    def _set_raw(self, key, value):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO thumbnail_kv (key, value) VALUES (?, ?)',
+            (key, value))
+        self.lru.set(key, value)
+
+    def _delete_raw(self, *keys):
+        self.connection.executemany(
+            'DELETE FROM thumbnail_kv WHERE key = ?',
+            [(key,) for key in keys])
+        self.lru.delete(*keys)
+
+    def _find_keys_raw(self, prefix):
+        rows = self.connection.execute(
+            "SELECT key FROM thumbnail_kv WHERE key LIKE ? ESCAPE '\\'",
+            (prefix.replace('\\', '\\\\').replace('%', '\\%')
+             .replace('_', '\\_') + '%',))
+        return [row[0] for row in rows]
@@ -0,0 +1,142 @@
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadhandler import (MemoryFileUploadHandler,
+                                             TemporaryFileUploadHandler)
+from django.core.management.base import BaseCommand
+from django.test.client import MULTIPART_CONTENT, RequestFactory
+from PIL import Image
+
+from posts.forms import PostForm
+from posts.models import Post
+from posts.uploads import BoundedUploadHandler
+
+BOUNDARY = 'BenchBoundary'
+
+
+class LegacyPostForm(forms.ModelForm):
+    """Форма с картинкой в том виде, какой её сделал бы Django."""
+    class Meta:
+        model = Post
+        fields = ('text', 'group', 'image')
+
+
+MODES = {
+    'legacy': (LegacyPostForm,
+               (MemoryFileUploadHandler, TemporaryFileUploadHandler)),
+    'streaming': (PostForm, (BoundedUploadHandler,)),
+}
+
+
+def make_body(width, height):
+    """Собирает multipart-запрос с JPEG-фотографией и EXIF."""
+    # Шум сжимается плохо, как и настоящая фотография.
+    image = Image.merge('RGB', [Image.effect_noise((width, height), 32)
+                                for _ in range(3)])
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x010F] = 'Camera'
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=95, exif=exif)
+    return b'\r\n'.join([
+        b'--' + BOUNDARY.encode(),
+        b'Content-Disposition: form-data; name="text"',
+        b'',
+        'Пост с картинкой'.encode(),
+        b'--' + BOUNDARY.encode(),
+        b'Content-Disposition: form-data; name="image"; '
+        b'filename="photo.jpg"',
+        b'Content-Type: image/jpeg',
+        b'',
+        buffer.getvalue(),
+        b'--' + BOUNDARY.encode() + b'--',
+        b'',
+    ])
+
+
+def max_rss_mb():
+    # В Linux ru_maxrss в килобайтах.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пиковую память процесса при одновременной '
+            'загрузке больших картинок через форму Django по умолчанию '
+            'и через потоковую обработку PostForm.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uploads', type=int, default=8,
+                            help='Сколько загрузок обрабатывать разом.')
+        parser.add_argument('--width', type=int, default=1600)
+        parser.add_argument('--height', type=int, default=1200)
+        parser.add_argument('--mode', choices=MODES,
+                            help='Запустить один режим в этом процессе.')
+        parser.add_argument('--body', help='Файл с телом запроса.')
+
+    def run_mode(self, mode, uploads, path):
+        form_class, handlers = MODES[mode]
+        size = os.path.getsize(path)
+        factory = RequestFactory()
+        barrier = threading.Barrier(uploads)
+        results = []
+
+        def upload():
+            # Тело читается из файла, как из сокета, а не из памяти.
+            request = factory.generic('POST', '/create/', **{
+                'CONTENT_TYPE': f'{MULTIPART_CONTENT}; boundary={BOUNDARY}',
+                'CONTENT_LENGTH': str(size),
+                'wsgi.input': open(path, 'rb'),
+            })
+            request.upload_handlers = [handler(request)
+                                       for handler in handlers]
+            barrier.wait()
+            form = form_class(request.POST, request.FILES)
+            results.append(form.is_valid())
+
+        before = max_rss_mb()
+        started = time.perf_counter()
+        threads = [threading.Thread(target=upload) for _ in range(uploads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {
+            'mode': mode,
+            'body_mb': size / 2 ** 20,
+            'peak_mb': max_rss_mb() - before,
+            'seconds': time.perf_counter() - started,
+            'valid': sum(results),
+        }
+
+    def handle(self, *args, **options):
+        uploads = options['uploads']
+        if options['mode']:
+            self.stdout.write(json.dumps(
+                self.run_mode(options['mode'], uploads, options['body'])))
+            return
+        with tempfile.NamedTemporaryFile(suffix='.http') as body:
+            body.write(make_body(options['width'], options['height']))
+            body.flush()
+            # Каждый режим в своём процессе: пик RSS не уменьшается.
+            results = [json.loads(subprocess.run(
+                [sys.executable, '-m', 'django', 'bench_image_upload',
+                 '--mode', mode, '--uploads', str(uploads),
+                 '--body', body.name],
+                cwd=settings.BASE_DIR, check=True, capture_output=True,
+                text=True).stdout) for mode in MODES]
+        for result in results:
+            mode = result['mode']
+            self.stdout.write(
+                f'{mode:<10} файл {result["body_mb"]:6.1f} МБ  '
+                f'пик +{result["peak_mb"]:7.1f} МБ  '
+                f'{result["seconds"]:6.2f} с  '
+                f'принято {result["valid"]}/{uploads}')
@@ -0,0 +1,93 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.dataset import ENDINGS, make_vocabulary, zipf_weights
+from posts.search import CREATE_SEARCH_TABLE, SEARCH_TABLE, match_expression
+from posts.stemmer import stem
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск по тексту постов через LIKE и через '
+            'полнотекстовый индекс FTS5 на синтетической таблице.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--words', type=int, default=30,
+                            help='Слов в посте.')
+        parser.add_argument('--vocabulary', type=int, default=20000)
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def fill(self, db, rng, roots, options):
+        # Частоты слов по закону Ципфа, как в естественном языке.
+        weights = zipf_weights(len(roots))
+        forms = [[(root + ending, stem(root + ending)) for ending in ENDINGS]
+                 for root in roots]
+        batch = 10000
+        for start in range(0, options['posts'], batch):
+            posts = []
+            index = []
+            for pk in range(start + 1,
+                            min(start + batch, options['posts']) + 1):
+                words = [rng.choice(forms[root]) for root in rng.choices(
+                    range(len(roots)), cum_weights=weights,
+                    k=options['words'])]
+                posts.append((pk, ' '.join(word for word, _ in words)))
+                index.append((pk, ' '.join(base for _, base in words)))
+            db.executemany('INSERT INTO posts_post VALUES (?, ?)', posts)
+            db.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, stems) VALUES (?, ?)',
+                index)
+            db.commit()
+
+    def measure(self, label, db, sql, params_list):
+        started = time.perf_counter()
+        found = 0
+        for params in params_list:
+            found += len(db.execute(sql, params).fetchall())
+        elapsed = (time.perf_counter() - started) / len(params_list)
+        self.stdout.write(f'{label:<28} {elapsed * 1000:>10.2f} мс/запрос '
+                          f'{found / len(params_list):>10.1f} строк')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        roots = make_vocabulary(rng, options['vocabulary'])
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'bench.sqlite3'))
+            db.execute('CREATE TABLE posts_post '
+                       '(id INTEGER PRIMARY KEY, text TEXT NOT NULL)')
+            db.execute(CREATE_SEARCH_TABLE)
+            started = time.perf_counter()
+            self.fill(db, rng, roots, options)
+            self.stdout.write(
+                f'Постов: {options["posts"]}, заполнение '
+                f'{time.perf_counter() - started:.1f} с')
+            # Запросы из слов средней частоты: не стоп-слова и не редкость.
+            words = [rng.choice(roots[50:2000]) + rng.choice(ENDINGS)
+                     for _ in range(options['queries'])]
+            limit = 10
+            self.measure(
+                'LIKE, первая страница', db,
+                'SELECT id FROM posts_post WHERE text LIKE ? '
+                'ORDER BY id DESC LIMIT ?',
+                [(f'%{word}%', limit) for word in words])
+            self.measure(
+                'LIKE, COUNT', db,
+                'SELECT COUNT(*) FROM posts_post WHERE text LIKE ?',
+                [(f'%{word}%',) for word in words])
+            self.measure(
+                'FTS5, первая страница', db,
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} '
+                f'MATCH ? ORDER BY bm25({SEARCH_TABLE}) LIMIT ?',
+                [(match_expression(word), limit) for word in words])
+            self.measure(
+                'FTS5, COUNT', db,
+                f'SELECT COUNT(*) FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH ?',
+                [(match_expression(word),) for word in words])
+            db.close()
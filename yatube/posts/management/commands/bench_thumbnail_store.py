@@ -0,0 +1,78 @@
+import os
+import tempfile
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as DBKVStore
+
+from posts.kvstore import SQLiteKVStore
+from posts.paginators import POSTS_PER_PAGE
+from posts.thumbnails import CARD_GEOMETRY, CARD_OPTIONS
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает накладные расходы на поиск миниатюр страницы '
+            'в KV-хранилище в базе проекта и в локальном SQLite-файле.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=20,
+                            help='Сколько страниц ленты просмотреть.')
+
+    def fill(self, store, pages):
+        images = []
+        for num in range(pages * POSTS_PER_PAGE):
+            source = ImageFile(f'posts/bench_{num}.jpg')
+            source.set_size((1920, 1080))
+            thumbnail = default.backend.thumbnail_file(
+                source.name, CARD_GEOMETRY, dict(CARD_OPTIONS))
+            thumbnail.set_size((960, 339))
+            store.set(source)
+            store.set(thumbnail, source)
+            images.append(source.name)
+        return images
+
+    def page_thumbnails(self, images, page):
+        names = images[page * POSTS_PER_PAGE:(page + 1) * POSTS_PER_PAGE]
+        return [default.backend.thumbnail_file(name, CARD_GEOMETRY,
+                                               dict(CARD_OPTIONS))
+                for name in names]
+
+    def measure(self, label, images, pages, lookup):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for page in range(pages):
+                lookup(self.page_thumbnails(images, page))
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{label:<32} {elapsed / pages * 1e6:>10.1f} мкс/стр. '
+            f'{len(queries) / pages:>6.1f} SQL/стр.')
+
+    def handle(self, *args, **options):
+        pages = options['pages']
+        with transaction.atomic():
+            db_store = DBKVStore()
+            images = self.fill(db_store, pages)
+            cache.clear()
+            self.measure('БД, холодный кеш', images, pages,
+                         lambda files: [db_store.get(f) for f in files])
+            self.measure('БД, тёплый кеш', images, pages,
+                         lambda files: [db_store.get(f) for f in files])
+            transaction.set_rollback(True)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'thumbnails.sqlite3')
+            with override_settings(THUMBNAIL_SQLITE_PATH=path):
+                store = SQLiteKVStore()
+                images = self.fill(store, pages)
+                store.lru.clear()
+                self.measure('SQLite, холодный LRU', images, pages,
+                             lambda files: [store.get(f) for f in files])
+                self.measure('SQLite, тёплый LRU', images, pages,
+                             lambda files: [store.get(f) for f in files])
+                store.lru.clear()
+                self.measure('SQLite, пакетно, холодный LRU', images,
+                             pages, store.get_many)
@@ -0,0 +1,44 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.variants import get_variants, render_variants, save_variants
+
+
+class Command(BaseCommand):
+    help = ('Создаёт варианты картинок постов разной ширины для '
+            'уже загруженных файлов, распределяя работу по ядрам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--jobs', type=int, default=os.cpu_count(),
+            help='Число процессов (по умолчанию — число ядер).')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать варианты, даже если они уже есть.')
+
+    def handle(self, *args, **options):
+        # Исходники берутся из постов, а не из каталога: там же лежат
+        # сами варианты, и из них нельзя делать варианты вариантов.
+        images = (Post.objects.exclude(image='').order_by()
+                  .values_list('image', flat=True).distinct())
+        names = [name for name in images
+                 if options['force'] or not get_variants(name)]
+        done = failed = 0
+        # Процессы только кодируют файлы, а в KV-хранилище пишет родитель.
+        with ProcessPoolExecutor(max_workers=options['jobs']) as executor:
+            futures = {executor.submit(render_variants, name): name
+                       for name in names}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    save_variants(name, future.result())
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                else:
+                    done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {done}, с ошибкой: {failed}'))
@@ -0,0 +1,80 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts.models import Group, Post, User
+from posts.paginators import POSTS_PER_PAGE, CursorPaginator
+
+# Признаки полного просмотра таблицы и сортировки во временной структуре
+# в выводе EXPLAIN разных СУБД.
+FULL_SCAN_PATTERNS = (
+    re.compile(r'\bSCAN (TABLE )?\w+$', re.MULTILINE),
+    re.compile(r'\bSeq Scan on\b'),
+    re.compile(r'\btype\W+ALL\b'),
+)
+FILESORT_PATTERNS = (
+    re.compile(r'USE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY'),
+    re.compile(r'\bSort Key\b'),
+    re.compile(r'Using filesort'),
+)
+
+
+def feed_queries():
+    """Возвращает пары (название, QuerySet) для запросов views постов."""
+    cursor = (timezone.now(), 1)
+    feeds = (
+        ('index', Post.objects.select_related('author', 'group')),
+        ('group_posts',
+         Post.objects.filter(group_id=1).select_related('author')),
+        ('profile',
+         Post.objects.filter(author_id=1).select_related('group')),
+    )
+    for name, posts in feeds:
+        paginator = CursorPaginator(posts, POSTS_PER_PAGE)
+        yield f'{name}: first page', paginator.cursor_queryset()
+        yield f'{name}: ?after=', paginator.cursor_queryset(after=cursor)
+        yield f'{name}: ?before=', paginator.cursor_queryset(before=cursor)
+    yield 'group_posts: group', Group.objects.filter(slug='slug')
+    yield 'profile: author', (
+        User.objects.select_related('stats').filter(username='username'))
+    yield 'post_detail: post', (
+        Post.objects.select_related('author__stats', 'group').filter(pk=1))
+
+
+def find_problems(plan: str):
+    problems = []
+    if any(pattern.search(plan) for pattern in FULL_SCAN_PATTERNS):
+        problems.append('полный просмотр таблицы')
+    if any(pattern.search(plan) for pattern in FILESORT_PATTERNS):
+        problems.append('сортировка без индекса')
+    return problems
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для запросов лент постов и сообщает '
+            'о полных просмотрах таблиц и сортировках без индекса.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--warn-only', action='store_true',
+            help='Не завершаться с ошибкой при найденных проблемах.')
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, queryset in feed_queries():
+            plan = queryset.explain()
+            problems = find_problems(plan)
+            if problems:
+                failed.append(name)
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: {", ".join(problems)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+        if failed and not options['warn_only']:
+            raise CommandError(
+                f'Запросы без подходящих индексов ({connection.vendor}): '
+                f'{", ".join(failed)}')
@@ -0,0 +1,57 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+
+from .import_posts import FORMATS, detect_format
+
+FIELDS = ('id', 'text', 'pub_date', 'author', 'group', 'image')
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты в JSONL или CSV, читая их из базы '
+            'курсором частями, без загрузки всей таблицы в память.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdout.')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Строк, читаемых из курсора за раз.')
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['path'], options['format'])
+        rows = Post.objects.order_by('pk').values_list(
+            'pk', 'text', 'pub_date', 'author__username', 'group__slug',
+            'image')
+        if options['path'] == '-':
+            file = sys.stdout
+        else:
+            file = open(options['path'], 'w', encoding='utf-8', newline='')
+        started = time.monotonic()
+        exported = 0
+        try:
+            if fmt == 'csv':
+                writer = csv.writer(file)
+                writer.writerow(FIELDS)
+            # iterator() использует серверный курсор там, где он есть.
+            for row in rows.iterator(chunk_size=options['chunk_size']):
+                record = dict(zip(FIELDS, row))
+                record['pub_date'] = record['pub_date'].isoformat()
+                if fmt == 'csv':
+                    writer.writerow(record.values())
+                else:
+                    file.write(json.dumps(record, ensure_ascii=False))
+                    file.write('\n')
+                exported += 1
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        elapsed = time.monotonic() - started
+        # Отчёт в stderr, чтобы не смешиваться с выгрузкой в stdout.
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено постов: {exported} за {elapsed:.1f} с '
+            f'({exported / max(elapsed, 1e-9):.0f} постов/с)'))
@@ -0,0 +1,238 @@
+import io
+import math
+import multiprocessing
+import os
+import random
+import re
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from posts.dataset import (make_image, make_text, make_vocabulary,
+                           text_length, zipf_weights)
+from posts.management.commands.import_posts import keep_dates
+from posts.models import Group, Post
+from posts.search import search_enabled
+
+User = get_user_model()
+# Доля постов, опубликованных в группе.
+GROUP_SHARE = 0.7
+# Медианная длина текста поста в словах.
+MEDIAN_WORDS = 30
+
+# Общие данные генерации в процессе-воркере, см. init_worker.
+_context = {}
+
+
+def generated_pattern(prefix, separator=''):
+    """Регулярное выражение для имён, которые создаёт команда: префикс
+    и номер. Реальные пользователи вроде generic под него не попадают."""
+    return rf'^{re.escape(prefix + separator)}[0-9]+$'
+
+
+def init_worker(context):
+    _context.update(context)
+
+
+def generate_chunk(index):
+    """Строки постов пачки index: (автор, группа, текст, картинка, дата).
+
+    Генератор случайных чисел пачки зависит только от seed и номера
+    пачки, поэтому данные не зависят от числа процессов.
+    """
+    context = _context
+    rng = random.Random(f'{context["seed"]}:{index}')
+    start = index * context['batch_size']
+    stop = min(start + context['batch_size'], context['posts'])
+    rows = []
+    for num in range(start, stop):
+        author, = rng.choices(context['authors'],
+                              cum_weights=context['author_weights'])
+        group = None
+        if context['groups'] and rng.random() < GROUP_SHARE:
+            group, = rng.choices(context['groups'],
+                                 cum_weights=context['group_weights'])
+        text = make_text(rng, context['roots'], context['word_weights'],
+                         text_length(rng, MEDIAN_WORDS))
+        image = ''
+        if context['images'] and rng.random() < context['image_share']:
+            image = rng.choice(context['images'])
+        # Посты идут по времени в порядке номеров, как в живой базе.
+        seconds_ago = context['span'] * (1 - (num + rng.random())
+                                         / context['posts'])
+        rows.append((author, group, text, image, seconds_ago))
+    return rows
+
+
+def insert_rows(rows, now):
+    posts = []
+    for author, group, text, image, seconds_ago in rows:
+        pub_date = now - timedelta(seconds=seconds_ago)
+        posts.append(Post(text=text, author_id=author, group_id=group,
+                          image=image, pub_date=pub_date,
+                          updated_at=pub_date))
+    with keep_dates(), transaction.atomic():
+        Post.objects.bulk_create(posts)
+    return len(posts)
+
+
+def generate_and_insert(index):
+    """Пачка целиком в воркере: для баз с параллельной записью."""
+    return insert_rows(generate_chunk(index), _context['now'])
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами '
+            'и постами для проверки на больших объёмах: авторы по закону '
+            'Ципфа, тексты разной длины, часть постов с картинками. '
+            'При одном seed данные одни и те же при любом --jobs.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--image-share', type=float, default=0.05,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--images', type=int, default=50,
+                            help='Сколько разных файлов картинок создать; '
+                                 'посты используют их повторно.')
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Показатель закона Ципфа для авторов '
+                                 'и групп: чем больше, тем сильнее перекос.')
+        parser.add_argument('--vocabulary', type=int, default=20000)
+        parser.add_argument('--days', type=int, default=730,
+                            help='За сколько дней до сейчас разложить '
+                                 'даты постов.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                            help='Процессов, генерирующих посты.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='gen',
+                            help='Префикс имён пользователей, слагов '
+                                 'групп и файлов картинок.')
+        parser.add_argument('--skip-index', action='store_true',
+                            help='Не перестраивать индекс поиска.')
+
+    def create_users(self, rng, roots, options):
+        prefix = options['prefix']
+        password = make_password(None)
+        for start in range(0, options['users'], options['batch_size']):
+            User.objects.bulk_create(
+                User(username=f'{prefix}{num}',
+                     first_name=rng.choice(roots).capitalize(),
+                     last_name=rng.choice(roots).capitalize(),
+                     password=password)
+                for num in range(start, min(start + options['batch_size'],
+                                            options['users'])))
+        return list(User.objects.filter(
+            username__regex=generated_pattern(prefix))
+            .order_by('pk').values_list('pk', flat=True))
+
+    def create_groups(self, rng, roots, weights, options):
+        prefix = options['prefix']
+        Group.objects.bulk_create(
+            Group(title=make_text(rng, roots, weights, 2)[:-1],
+                  slug=f'{prefix}-{num}',
+                  description=make_text(rng, roots, weights,
+                                        text_length(rng, 20)))
+            for num in range(options['groups']))
+        return list(Group.objects.filter(
+            slug__regex=generated_pattern(prefix, '-'))
+            .order_by('pk').values_list('pk', flat=True))
+
+    def create_images(self, rng, options):
+        if not options['image_share']:
+            return []
+        return [default_storage.save(f'posts/{options["prefix"]}-{num}.jpg',
+                                     ContentFile(make_image(rng)))
+                for num in range(options['images'])]
+
+    def create_posts(self, context, options):
+        """Пишет посты пачками, генерируя их в options['jobs'] процессах.
+
+        SQLite допускает одного писателя, поэтому воркеры только готовят
+        строки, а пишет этот процесс; остальные базы пишут из воркеров.
+        """
+        chunks = range(math.ceil(options['posts'] / options['batch_size']))
+        parallel_writes = connection.vendor != 'sqlite'
+        if options['jobs'] <= 1:
+            init_worker(context)
+            results = map(generate_chunk, chunks)
+            pool = None
+        else:
+            # Соединения не должны достаться дочерним процессам.
+            connections.close_all()
+            pool = multiprocessing.Pool(options['jobs'], init_worker,
+                                        (context,))
+            results = pool.imap(generate_and_insert if parallel_writes
+                                else generate_chunk, chunks)
+        written = 0
+        try:
+            for result in results:
+                if isinstance(result, int):
+                    written += result
+                else:
+                    written += insert_rows(result, context['now'])
+                self.stdout.write(f'\rПостов: {written}', ending='')
+                self.stdout.flush()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self.stdout.write('')
+        return written
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        if User.objects.filter(username__regex=generated_pattern(
+                options['prefix'])).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {options["prefix"]} уже есть, '
+                f'укажите другой --prefix.')
+        started = time.perf_counter()
+        rng = random.Random(options['seed'])
+        roots = make_vocabulary(rng, options['vocabulary'])
+        word_weights = zipf_weights(len(roots))
+        users = self.create_users(rng, roots, options)
+        groups = self.create_groups(rng, roots, word_weights, options)
+        # Самые активные авторы и группы — случайные, а не первые по pk.
+        rng.shuffle(users)
+        rng.shuffle(groups)
+        context = {
+            'seed': options['seed'],
+            'posts': options['posts'],
+            'batch_size': options['batch_size'],
+            'roots': roots,
+            'word_weights': word_weights,
+            'authors': users,
+            'author_weights': zipf_weights(len(users), options['zipf']),
+            'groups': groups,
+            'group_weights': zipf_weights(len(groups), options['zipf']),
+            'images': self.create_images(rng, options),
+            'image_share': options['image_share'],
+            'span': timedelta(days=options['days']).total_seconds(),
+            'now': timezone.now(),
+        }
+        written = self.create_posts(context, options)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Создано пользователей: {len(users)}, групп: {len(groups)}, '
+            f'постов: {written} за {elapsed:.1f} с '
+            f'({written / elapsed:.0f} постов/с)')
+        call_command('rebuild_author_stats', stdout=io.StringIO())
+        if not options['skip_index'] and search_enabled():
+            # На миллионах постов индекс строится дольше самих постов.
+            started = time.perf_counter()
+            call_command('rebuild_search_index', stdout=io.StringIO())
+            self.stdout.write(f'Индекс поиска построен за '
+                              f'{time.perf_counter() - started:.1f} с')
+        self.stdout.write(self.style.SUCCESS('Готово.'))
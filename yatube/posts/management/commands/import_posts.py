@@ -0,0 +1,273 @@
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.cache import invalidate_pages
+from posts.models import (AuthorStats, Follow, Group, GroupFollow, Post,
+                          Timeline)
+from posts.search import index_posts, search_enabled
+
+User = get_user_model()
+FORMATS = ('jsonl', 'csv')
+REMOTE_PREFIXES = ('http://', 'https://')
+# Сколько секунд ждать ответа сервера с картинкой.
+FETCH_TIMEOUT = 30
+FETCH_CHUNK_BYTES = 64 * 1024
+
+
+def detect_format(path, fmt):
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension in FORMATS:
+        return extension
+    raise CommandError('Не удалось понять формат файла, укажите --format.')
+
+
+def read_records(file, fmt):
+    """Построчно читает записи, не загружая файл целиком."""
+    if fmt == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def keep_dates():
+    """Отключает auto_now/auto_now_add, чтобы сохранить даты из файла."""
+    fields = [Post._meta.get_field(name) for name in ('pub_date',
+                                                      'updated_at')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def fetch_image(url):
+    """Скачивает картинку и сохраняет её в posts/, возвращает имя.
+
+    Как и загрузка через форму, картинка ограничена
+    POSTS_IMAGE_MAX_BYTES: бо́льшая не дочитывается, а отвергается.
+    """
+    limit = settings.POSTS_IMAGE_MAX_BYTES
+    with urlopen(url, timeout=FETCH_TIMEOUT) as response:
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > limit:
+            raise ValueError(f'картинка больше {limit} байт')
+        chunks, received = [], 0
+        while True:
+            chunk = response.read(FETCH_CHUNK_BYTES)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > limit:
+                raise ValueError(f'картинка больше {limit} байт')
+            chunks.append(chunk)
+    content = b''.join(chunks)
+    name = os.path.basename(urlparse(url).path) or 'image'
+    return default_storage.save(f'posts/{name}', ContentFile(content))
+
+
+class Command(BaseCommand):
+    help = ('Импортирует посты из JSONL или CSV потоково, вставляя их '
+            'пачками через bulk_create. Поля записи: text, pub_date, '
+            'author (username), group (slug), image (путь в MEDIA_ROOT '
+            'или URL для --fetch-images).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdin.')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Постов в одном bulk_create.')
+        parser.add_argument('--batches-per-transaction', type=int,
+                            default=10)
+        parser.add_argument('--create-authors', action='store_true',
+                            help='Создавать неизвестных авторов.')
+        parser.add_argument('--create-groups', action='store_true',
+                            help='Создавать неизвестные группы.')
+        parser.add_argument('--fetch-images', type=int, default=0,
+                            metavar='THREADS',
+                            help='Скачивать картинки по URL в N потоков.')
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['path'], options['format'])
+        if options['path'] == '-':
+            file = sys.stdin
+        else:
+            file = open(options['path'], encoding='utf-8', newline='')
+        self.create_authors = options['create_authors']
+        self.create_groups = options['create_groups']
+        # Справочники целиком в памяти: на каждый пост ни одного запроса.
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.skipped = 0
+        self.downloader = (ThreadPoolExecutor(options['fetch_images'])
+                           if options['fetch_images'] else None)
+        started = time.monotonic()
+        imported = 0
+        try:
+            records = read_records(file, fmt)
+            chunk = options['batch_size'] * options['batches_per_transaction']
+            with keep_dates():
+                for records in batches(records, chunk):
+                    imported += self.import_chunk(records, options)
+                    if options['verbosity'] > 1:
+                        self.stderr.write(f'Импортировано: {imported}')
+        finally:
+            if file is not sys.stdin:
+                file.close()
+            if self.downloader is not None:
+                self.downloader.shutdown()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {imported}, пропущено: {self.skipped}, '
+            f'за {elapsed:.1f} с ({imported / max(elapsed, 1e-9):.0f} '
+            f'постов/с)'))
+
+    def import_chunk(self, records, options):
+        """Вставляет часть файла в одной транзакции.
+
+        Счётчики, индекс и кеши обновляются в той же транзакции, поэтому
+        сбой на середине файла оставляет уже вставленные части
+        согласованными. Авторы и группы, созданные в откатившейся части,
+        убираются из справочников, чтобы не ссылаться на их pk.
+        """
+        self.created = []
+        try:
+            with transaction.atomic():
+                return self.insert_chunk(records, options)
+        except Exception:
+            for lookup, key in self.created:
+                lookup.pop(key, None)
+            raise
+
+    def insert_chunk(self, records, options):
+        self.author_counts = Counter()
+        self.group_ids = set()
+        last_pk = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+        posts = [post for post in map(self.build_post, records)
+                 if post is not None]
+        if self.downloader is not None:
+            self.fetch_images(posts)
+        for batch in batches(posts, options['batch_size']):
+            Post.objects.bulk_create(batch)
+        if search_enabled():
+            # bulk_create не шлёт сигналов: индексируем новые id сами.
+            index_posts(Post.objects.filter(pk__gt=last_pk).values_list(
+                'pk', 'text').iterator())
+        self.finish()
+        return len(posts)
+
+    def build_post(self, record):
+        author_id = self.resolve_author(record.get('author'))
+        text = record.get('text')
+        if author_id is None or not text:
+            self.skipped += 1
+            return None
+        group_id = None
+        if record.get('group'):
+            group_id = self.resolve_group(record['group'])
+            if group_id is None:
+                self.skipped += 1
+                return None
+        image = record.get('image') or ''
+        if image.startswith(REMOTE_PREFIXES) and self.downloader is None:
+            image = ''
+        post = Post(text=text, author_id=author_id, group_id=group_id,
+                    image=image)
+        pub_date = parse_datetime(record.get('pub_date') or '')
+        post.pub_date = post.updated_at = pub_date or timezone.now()
+        self.author_counts[author_id] += 1
+        if group_id is not None:
+            self.group_ids.add(group_id)
+        return post
+
+    def resolve_author(self, username):
+        if not username:
+            return None
+        if username not in self.authors and self.create_authors:
+            user = User(username=username)
+            user.set_unusable_password()
+            user.save()
+            self.authors[username] = user.pk
+            self.created.append((self.authors, username))
+        return self.authors.get(username)
+
+    def resolve_group(self, slug):
+        if slug not in self.groups and self.create_groups:
+            self.groups[slug] = Group.objects.create(
+                title=slug, slug=slug, description='').pk
+            self.created.append((self.groups, slug))
+        return self.groups.get(slug)
+
+    def fetch_images(self, posts):
+        """Скачивает картинки пачки параллельно."""
+        remote = [post for post in posts
+                  if str(post.image).startswith(REMOTE_PREFIXES)]
+        names = self.downloader.map(self.safe_fetch,
+                                    [str(post.image) for post in remote])
+        for post, name in zip(remote, names):
+            post.image = name or ''
+
+    def safe_fetch(self, url):
+        try:
+            return fetch_image(url)
+        except (OSError, ValueError) as error:
+            self.stderr.write(f'{url}: {error}')
+            return None
+
+    def finish(self):
+        """Делает для части файла то, что при обычном сохранении делают
+        сигналы."""
+        for author_id, count in self.author_counts.items():
+            AuthorStats.change_post_count(author_id, count)
+        # Посты импортируются со старыми датами и не сдвигают
+        # Max(updated_at): Last-Modified лент сдвигают отметки.
+        AuthorStats.touch(self.author_counts)
+        Group.objects.filter(pk__in=self.group_ids).update(
+            updated_at=timezone.now())
+        usernames = User.objects.filter(
+            pk__in=self.author_counts).values_list('username', flat=True)
+        slugs = Group.objects.filter(
+            pk__in=self.group_ids).values_list('slug', flat=True)
+        invalidate_pages('index', *(f'profile:{name}' for name in usernames),
+                         *(f'group:{slug}' for slug in slugs))
+        followers = set(Follow.objects.filter(
+            author_id__in=self.author_counts).values_list('user_id',
+                                                          flat=True))
+        followers.update(GroupFollow.objects.filter(
+            group_id__in=self.group_ids).values_list('user_id', flat=True))
+        Timeline.objects.filter(user_id__in=followers).delete()
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import AuthorStats, Follow, Post
+
+COUNTERS = {
+    'post_count': Post.objects,
+    'follower_count': Follow.objects,
+}
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов и подписчиков авторов '
+            'по таблицам постов и подписок.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        counts = {}
+        for field, objects in COUNTERS.items():
+            rows = (objects.order_by().values_list('author')
+                    .annotate(total=Count('pk')))
+            for author_id, total in rows:
+                counts.setdefault(author_id, {})[field] = total
+        fixed = 0
+        stats = AuthorStats.objects.select_for_update().in_bulk()
+        for author_id, row in stats.items():
+            totals = counts.pop(author_id, {})
+            changed = [field for field in COUNTERS
+                       if getattr(row, field) != totals.get(field, 0)]
+            if changed:
+                for field in changed:
+                    setattr(row, field, totals.get(field, 0))
+                row.save(update_fields=changed)
+                fixed += 1
+        AuthorStats.objects.bulk_create(
+            AuthorStats(author_id=author_id, **totals)
+            for author_id, totals in counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счётчиков: {fixed}, создано: {len(counts)}'))
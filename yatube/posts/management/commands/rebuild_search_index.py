@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts.search import rebuild_index, search_enabled
+
+
+class Command(BaseCommand):
+    help = ('Заново строит полнотекстовый индекс постов, например после '
+            'bulk_create или правки постов в обход моделей.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError(
+                f'Полнотекстовый индекс не поддерживается: '
+                f'{connection.vendor}')
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Индекс поиска перестроен.'))
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from posts.search import (CREATE_SEARCH_TABLE, SEARCH_TABLE,
+                              search_enabled, stems)
+    connection = schema_editor.connection
+    if not search_enabled(connection):
+        return
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.execute(CREATE_SEARCH_TABLE)
+    rows = Post.objects.using(connection.alias).values_list('pk', 'text')
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, stems) VALUES (%s, %s)',
+            [(pk, stems(text)) for pk, text in rows.iterator()])
+
+
+def drop_search_index(apps, schema_editor):
+    from posts.search import DROP_SEARCH_TABLE, search_enabled
+    if search_enabled(schema_editor.connection):
+        schema_editor.execute(DROP_SEARCH_TABLE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
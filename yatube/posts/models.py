@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -11,10 +13,21 @@ class Group(models.Model):
     slug = models.SlugField(unique=True,
                             max_length=190,)
     description = models.TextField()
+    # Меняется и при уходе поста из группы: по нему строятся валидаторы
+    # ленты группы, см. posts.views.group_validators.
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
 
     def __str__(self) -> str:
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем слаг из базы, чтобы при сохранении сбросить и
+        # страницы по старому адресу.
+        instance._loaded_slug = instance.__dict__.get('slug')
+        return instance
+
 
 class Post(models.Model):
     """ Класс Post описывает свойства постов."""
@@ -23,6 +36,8 @@ class Post(models.Model):
                             help_text='Введите текст поста')
     pub_date = models.DateTimeField('Дата публикации',
                                     auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения',
+                                      auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -44,7 +59,173 @@ class Post(models.Model):
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем автора и группу из базы, чтобы при сохранении
+        # заметить их смену.
+        instance._loaded_author_id = instance.__dict__.get('author_id')
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        return instance
+
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        # Счётчик постов автора обновляется сигналом в той же транзакции.
+        super().save(*args, **kwargs)
+        self._loaded_author_id = self.author_id
+        self._loaded_group_id = self.group_id
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['-pub_date', 'id'],
+                         name='post_pub_date_id_idx'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+
+
+class AuthorStats(models.Model):
+    """ Класс AuthorStats хранит денормализованную статистику автора."""
+
+    author = models.OneToOneField(User,
+                                  primary_key=True,
+                                  on_delete=models.CASCADE,
+                                  related_name='stats',
+                                  verbose_name='Автор')
+    post_count = models.PositiveIntegerField('Количество постов',
+                                             default=0)
+    follower_count = models.PositiveIntegerField('Количество подписчиков',
+                                                 default=0)
+    # Время смены имени автора или ухода его поста: валидаторы лент
+    # с постами автора меняются вместе с ним.
+    updated_at = models.DateTimeField('Дата изменения',
+                                      default=timezone.now)
+
+    def __str__(self):
+        return f'{self.author}: {self.post_count}'
+
+    @classmethod
+    def change_counter(cls, author_id, field, delta):
+        """Сдвигает счётчик field автора на delta."""
+        if delta < 0:
+            cls.objects.filter(
+                author_id=author_id, **{f'{field}__gte': -delta}
+            ).update(**{field: F(field) + delta})
+            return
+        updated = cls.objects.filter(author_id=author_id).update(
+            **{field: F(field) + delta})
+        if not updated:
+            # Строки ещё нет: считаем один раз, дальше только сдвиги.
+            stats, created = cls.objects.get_or_create(author_id=author_id)
+            if created:
+                cls.recount(author_id)
+
+    @classmethod
+    def recount(cls, author_id):
+        """Пересчитывает все счётчики автора по таблицам."""
+        cls.objects.filter(author_id=author_id).update(
+            post_count=Post.objects.filter(author_id=author_id).count(),
+            follower_count=Follow.objects.filter(
+                author_id=author_id).count())
+
+    @classmethod
+    def touch(cls, author_ids):
+        """Отмечает, что страницы с постами авторов изменились."""
+        cls.objects.filter(author_id__in=author_ids).update(
+            updated_at=timezone.now())
+
+    @classmethod
+    def change_post_count(cls, author_id, delta):
+        """Сдвигает счётчик постов автора на delta."""
+        cls.change_counter(author_id, 'post_count', delta)
+
+    @classmethod
+    def change_follower_count(cls, author_id, delta):
+        """Сдвигает счётчик подписчиков автора на delta."""
+        cls.change_counter(author_id, 'follower_count', delta)
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+
+class Follow(models.Model):
+    """ Класс Follow описывает подписку пользователя на автора."""
+
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='follower',
+                             verbose_name='Подписчик')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='following',
+                               verbose_name='Автор')
+
+    def __str__(self):
+        return f'{self.user} → {self.author}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+            models.CheckConstraint(check=~models.Q(user=F('author')),
+                                   name='no_self_follow'),
+        ]
+        verbose_name = 'Подписка на автора'
+        verbose_name_plural = 'Подписки на авторов'
+
+
+class GroupFollow(models.Model):
+    """ Класс GroupFollow описывает подписку пользователя на группу."""
+
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='group_follows',
+                             verbose_name='Подписчик')
+    group = models.ForeignKey(Group,
+                              on_delete=models.CASCADE,
+                              related_name='followers',
+                              verbose_name='Группа')
+
+    def __str__(self):
+        return f'{self.user} → {self.group}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'group'],
+                                    name='unique_group_follow'),
+        ]
+        verbose_name = 'Подписка на группу'
+        verbose_name_plural = 'Подписки на группы'
+
+
+class Timeline(models.Model):
+    """ Класс Timeline хранит готовую ленту подписок пользователя.
+
+    entries — упакованные пары (время публикации, id поста), новые
+    первыми; формат описан в posts.timelines.
+    """
+
+    user = models.OneToOneField(User,
+                                primary_key=True,
+                                on_delete=models.CASCADE,
+                                related_name='timeline',
+                                verbose_name='Пользователь')
+    entries = models.BinaryField('Записи ленты', default=b'')
+
+    class Meta:
+        verbose_name = 'Лента подписок'
+        verbose_name_plural = 'Ленты подписок'
+
+
+def get_post_count(author) -> int:
+    """Возвращает число постов автора из AuthorStats."""
+    try:
+        return author.stats.post_count
+    except AuthorStats.DoesNotExist:
+        return 0
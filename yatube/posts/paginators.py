@@ -0,0 +1,138 @@
+import binascii
+from datetime import datetime
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+POSTS_PER_PAGE = 10
+# Сколько номеров показывать вокруг текущей страницы и у краёв списка.
+PAGES_ON_EACH_SIDE = 2
+PAGES_ON_ENDS = 1
+
+
+def encode_cursor(post) -> str:
+    """Упаковывает ключ (pub_date, id) поста в непрозрачный токен."""
+    raw = f'{post.pub_date.isoformat()}|{post.pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(token: str):
+    """Распаковывает токен курсора, для испорченного токена вернёт None."""
+    try:
+        raw = force_str(urlsafe_base64_decode(token))
+        pub_date, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(pub_date), int(pk)
+    except (TypeError, ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+class NumberedPaginator(Paginator):
+    """Пагинатор по номерам с сокращённым списком страниц."""
+
+    ELLIPSIS = '…'
+
+    def get_elided_page_range(self, number=1, on_each_side=PAGES_ON_EACH_SIDE,
+                              on_ends=PAGES_ON_ENDS):
+        """Возвращает номера страниц вокруг number и у краёв, а пропуски
+        между ними заменяет на ELLIPSIS.
+
+        Длина списка не зависит от числа страниц.
+        """
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2 + 1:
+            yield from self.page_range
+            return
+        if number > on_each_side + on_ends + 2:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1,
+                             self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации.
+
+    Не знает своего номера и общего числа страниц: соседние страницы
+    доступны только через токены next_cursor и previous_cursor.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<CursorPage of %s objects>' % len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor(self.object_list[0])
+
+
+class CursorPaginator(NumberedPaginator):
+    """Пагинатор по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Страница выбирается условием по ключу последнего показанного поста,
+    поэтому стоимость запроса не зависит от глубины ленты.
+    """
+
+    # Совпадает с индексом (-pub_date, id): при равной дате раньше идёт
+    # пост с меньшим id.
+    ordering = ('-pub_date', 'pk')
+
+    def cursor_queryset(self, after=None, before=None):
+        """Возвращает запрос страницы с лишней строкой для has_next.
+
+        Для токена before строки идут в обратном порядке.
+        """
+        posts = self.object_list.order_by(*self.ordering)
+        if before is not None:
+            pub_date, pk = before
+            return posts.filter(
+                Q(pub_date__gt=pub_date) | Q(pk__lt=pk),
+                pub_date__gte=pub_date,
+            ).reverse()[:self.per_page + 1]
+        if after is not None:
+            pub_date, pk = after
+            posts = posts.filter(
+                Q(pub_date__lt=pub_date) | Q(pk__gt=pk),
+                pub_date__lte=pub_date,
+            )
+        return posts[:self.per_page + 1]
+
+    def cursor_page(self, after=None, before=None) -> CursorPage:
+        """Возвращает страницу после токена after или перед токеном before."""
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        rows = list(self.cursor_queryset(after, before))
+        if before is not None:
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(rows, self, True, has_previous)
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self, has_next,
+                          after is not None)
@@ -0,0 +1,159 @@
+import json
+import logging
+import queue
+import threading
+import time
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_dispatchers = {}
+_dispatcher_lock = threading.Lock()
+
+
+def post_keys(post) -> set:
+    """Ключи страниц, на которых показан пост."""
+    keys = {f'post-{post.pk}', f'author-{post.author_id}'}
+    if post.group_id is not None:
+        keys.add(f'group-{post.group_id}')
+    return keys
+
+
+def tag_response(response, posts, *keys):
+    """Помечает ответ ключами всех показанных постов, авторов и групп.
+
+    По этим ключам CDN сбрасывает страницы при изменении поста.
+    """
+    tags = set(keys)
+    for post in posts:
+        tags.update(post_keys(post))
+    response[settings.POSTS_SURROGATE_KEY_HEADER] = ' '.join(sorted(tags))
+    return response
+
+
+def changed_post_keys(post) -> set:
+    """Ключи, которые надо сбросить после сохранения или удаления поста.
+
+    Списки index и search сбрасываются всегда: новый пост попадает
+    на них, хотя его ключа там ещё нет.
+    """
+    keys = post_keys(post) | {'index', 'search'}
+    old_author_id = getattr(post, '_loaded_author_id', None)
+    if old_author_id is not None:
+        keys.add(f'author-{old_author_id}')
+    old_group_id = getattr(post, '_loaded_group_id', None)
+    if old_group_id is not None:
+        keys.add(f'group-{old_group_id}')
+    return keys
+
+
+class PurgeBackend:
+    """Бэкенд сброса: получает пачку ключей и передаёт их CDN.
+
+    Базовый бэкенд ничего не отправляет и годится, когда CDN нет:
+    страницы у посредников устаревают сами через s-maxage. Бэкенды
+    настоящих CDN переопределяют purge.
+    """
+
+    def purge(self, keys):
+        """Сбрасывает страницы с ключами keys."""
+
+
+class HTTPPurgeBackend(PurgeBackend):
+    """Отправляет пачку ключей одним POST с телом
+    {"surrogate_keys": [...]}, как пакетный purge у Fastly."""
+
+    def __init__(self, url=None, headers=None, timeout=10):
+        self.url = url or settings.POSTS_PURGE_URL
+        self.headers = {'Content-Type': 'application/json',
+                        **(headers or settings.POSTS_PURGE_HEADERS)}
+        self.timeout = timeout
+
+    def purge(self, keys):
+        body = json.dumps({'surrogate_keys': list(keys)}).encode()
+        request = Request(self.url, data=body, headers=self.headers,
+                          method='POST')
+        with urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class PurgeDispatcher:
+    """Собирает ключи из сигналов и отправляет их бэкенду пачками.
+
+    Фоновый поток ждёт до delay секунд после первого ключа, чтобы
+    правки подряд ушли одним запросом, но не больше batch_size ключей
+    в запросе.
+    """
+
+    def __init__(self, backend, batch_size=256, delay=0.5):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.delay = delay
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def add(self, keys):
+        self.queue.put(set(keys))
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run,
+                                               name='purge-dispatcher',
+                                               daemon=True)
+                self.thread.start()
+
+    def flush(self):
+        """Ждёт, пока все поставленные ключи не будут отправлены."""
+        self.queue.join()
+
+    def collect(self):
+        """Забирает из очереди ключи для следующих запросов."""
+        keys = set(self.queue.get())
+        taken = 1
+        deadline = time.monotonic() + self.delay
+        while len(keys) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                keys.update(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+            taken += 1
+        return sorted(keys), taken
+
+    def run(self):
+        while True:
+            keys, taken = self.collect()
+            try:
+                for start in range(0, len(keys), self.batch_size):
+                    self.backend.purge(keys[start:start + self.batch_size])
+            except Exception:
+                # Не сброшенные страницы устареют сами через s-maxage.
+                logger.exception('Не удалось сбросить ключи CDN: %s',
+                                 ' '.join(keys))
+            finally:
+                for _ in range(taken):
+                    self.queue.task_done()
+
+
+def get_dispatcher():
+    """Диспетчер процесса или None, если бэкенд сброса не настроен."""
+    path = settings.POSTS_PURGE_BACKEND
+    if not path:
+        return None
+    with _dispatcher_lock:
+        if path not in _dispatchers:
+            _dispatchers[path] = PurgeDispatcher(
+                import_string(path)(), settings.POSTS_PURGE_BATCH_SIZE,
+                settings.POSTS_PURGE_DELAY)
+        return _dispatchers[path]
+
+
+def schedule_purge(keys):
+    dispatcher = get_dispatcher()
+    if dispatcher is not None:
+        dispatcher.add(keys)
@@ -0,0 +1,153 @@
+from django.db import connection, connections, router
+
+from .models import Post
+from .stemmer import stem_text
+
+SEARCH_TABLE = 'posts_post_search'
+# Основы слов хранятся в индексе готовыми: токенизатор FTS5 лишь делит
+# их по пробелам.
+CREATE_SEARCH_TABLE = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} '
+    "USING fts5(stems, tokenize='unicode61 remove_diacritics 2')")
+DROP_SEARCH_TABLE = f'DROP TABLE IF EXISTS {SEARCH_TABLE}'
+
+
+def search_enabled(using=connection) -> bool:
+    """Полнотекстовый индекс FTS5 создаётся только в SQLite."""
+    return using.vendor == 'sqlite'
+
+
+def stems(text: str) -> str:
+    return ' '.join(stem_text(text))
+
+
+def match_expression(query: str):
+    """Превращает запрос пользователя в выражение MATCH по основам.
+
+    Все слова запроса обязательны, последнее ищется и как префикс.
+    Возвращает None, если в запросе нет слов.
+    """
+    words = stem_text(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += ' *'
+    return ' AND '.join(terms)
+
+
+def index_post(post, using=connection):
+    with using.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, stems) '
+            'VALUES (%s, %s)', [post.pk, stems(post.text)])
+
+
+def unindex_post(post_id, using=connection):
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+                       [post_id])
+
+
+def index_posts(rows, using=connection, batch_size=1000):
+    """Добавляет в индекс пары (id, текст) пачками."""
+    sql = (f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, stems) '
+           'VALUES (%s, %s)')
+    with using.cursor() as cursor:
+        batch = []
+        for pk, text in rows:
+            batch.append((pk, stems(text)))
+            if len(batch) == batch_size:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+def rebuild_index(using=connection, batch_size=1000):
+    """Заново заполняет индекс по всем постам."""
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    rows = Post.objects.using(using.alias).values_list('pk', 'text')
+    index_posts(rows.iterator(chunk_size=batch_size), using, batch_size)
+
+
+class SearchResults:
+    """Ранжированные результаты поиска для Paginator.
+
+    Ранг и фильтры считаются в SQL, а посты со связанными авторами
+    и группами загружаются только для запрошенного среза. Все запросы
+    идут в одну базу, выбранную роутером для чтения постов, иначе id
+    совпадений и сами посты могли бы прийти с разных реплик.
+    """
+
+    def __init__(self, match, group=None, author=None, using=None):
+        self.match = match
+        self.using = using or router.db_for_read(Post)
+        self.where = [f'{SEARCH_TABLE} MATCH %s']
+        self.params = [match]
+        if group is not None:
+            self.where.append('p.group_id = %s')
+            self.params.append(group.pk)
+        if author is not None:
+            self.where.append('p.author_id = %s')
+            self.params.append(author.pk)
+
+    def sql(self, columns):
+        return (f'SELECT {columns} FROM {SEARCH_TABLE} '
+                f'JOIN posts_post p ON p.id = {SEARCH_TABLE}.rowid '
+                f'WHERE {" AND ".join(self.where)}')
+
+    def count(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(self.sql('COUNT(*)'), self.params)
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        limit = -1 if index.stop is None else index.stop - start
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                self.sql('p.id') + ' ORDER BY bm25(posts_post_search), '
+                'p.pub_date DESC LIMIT %s OFFSET %s',
+                self.params + [limit, start])
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = (Post.objects.using(self.using)
+                 .select_related('author', 'group').in_bulk(ids))
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(query: str, group=None, author=None):
+    """Ищет посты по тексту, лучшие совпадения первыми.
+
+    Без полнотекстового индекса (не SQLite) ищет подстроку и сортирует
+    по дате.
+    """
+    match = match_expression(query)
+    if match is None:
+        return Post.objects.none()
+    using = router.db_for_read(Post)
+    if search_enabled(connections[using]):
+        return SearchResults(match, group, author, using)
+    posts = Post.objects.select_related('author', 'group').filter(
+        text__icontains=query)
+    if group is not None:
+        posts = posts.filter(group=group)
+    if author is not None:
+        posts = posts.filter(author=author)
+    return posts
+
+
+def filter_by_search(queryset, query: str):
+    """Оставляет в queryset постов только совпавшие с запросом."""
+    match = match_expression(query)
+    if match is None or not search_enabled():
+        return None
+    return queryset.extra(
+        where=[f'posts_post.id IN (SELECT rowid FROM {SEARCH_TABLE} '
+               f'WHERE {SEARCH_TABLE} MATCH %s)'],
+        params=[match])
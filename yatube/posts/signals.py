@@ -0,0 +1,186 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import invalidate_pages, invalidate_post_pages
+from .models import AuthorStats, Follow, Group, GroupFollow, Post, User
+from .purge import changed_post_keys, schedule_purge
+from .search import index_post, search_enabled, unindex_post
+from .thumbnails import schedule_card_thumbnail
+from .timelines import fan_out_post, follower_count_changed, reset_timeline
+from .variants import schedule_variants
+
+
+@receiver(post_save, sender=Post)
+def update_author_stats_on_save(sender, instance, created, **kwargs):
+    """Обновляет счётчик постов при создании поста и смене автора."""
+    if created:
+        AuthorStats.change_post_count(instance.author_id, 1)
+        return
+    old_author_id = getattr(instance, '_loaded_author_id', None)
+    if old_author_id is not None and old_author_id != instance.author_id:
+        AuthorStats.change_post_count(old_author_id, -1)
+        AuthorStats.change_post_count(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def update_author_stats_on_delete(sender, instance, **kwargs):
+    """Уменьшает счётчик постов автора при удалении поста."""
+    AuthorStats.change_post_count(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_page_cache(sender, instance, **kwargs):
+    """Сбрасывает кеш страниц, на которых был или стал виден пост."""
+    group_ids = {instance.group_id,
+                 getattr(instance, '_loaded_group_id', None)} - {None}
+    group_slugs = []
+    if group_ids:
+        group_slugs = Group.objects.filter(
+            pk__in=group_ids).values_list('slug', flat=True)
+    usernames = []
+    old_author_id = getattr(instance, '_loaded_author_id', None)
+    if old_author_id not in (None, instance.author_id):
+        usernames = User.objects.filter(
+            pk=old_author_id).values_list('username', flat=True)
+    invalidate_post_pages(instance, group_slugs, usernames)
+
+
+def touch_validator_stamps(group_ids, author_ids):
+    """Сдвигает отметки изменения групп и авторов, из лент которых
+    ушёл пост.
+
+    Новый или исправленный пост сам сдвигает Max(updated_at) ленты,
+    а удалённый или перенесённый — нет, и без отметки Last-Modified
+    ленты не изменился бы.
+    """
+    group_ids = set(group_ids) - {None}
+    if group_ids:
+        Group.objects.filter(pk__in=group_ids).update(
+            updated_at=timezone.now())
+    author_ids = set(author_ids) - {None}
+    if author_ids:
+        AuthorStats.touch(author_ids)
+
+
+@receiver(post_save, sender=Post)
+def touch_stamps_on_move(sender, instance, created, **kwargs):
+    if created:
+        return
+    old_group_id = getattr(instance, '_loaded_group_id', None)
+    old_author_id = getattr(instance, '_loaded_author_id', None)
+    touch_validator_stamps(
+        [old_group_id] if old_group_id != instance.group_id else [],
+        [old_author_id] if old_author_id != instance.author_id else [])
+
+
+@receiver(post_delete, sender=Post)
+def touch_stamps_on_delete(sender, instance, **kwargs):
+    touch_validator_stamps([instance.group_id], [instance.author_id])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_page_cache(sender, instance, **kwargs):
+    """Сбрасывает ленту группы и главную: на них название группы."""
+    slugs = {instance.slug, getattr(instance, '_loaded_slug', None)} - {None}
+    invalidate_pages('index', *(f'group:{slug}' for slug in slugs))
+    instance._loaded_slug = instance.slug
+
+
+def only_last_login(update_fields):
+    return update_fields is not None and set(update_fields) == {'last_login'}
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields=None, **kwargs):
+    """Запоминает прежнее имя пользователя перед сохранением."""
+    if instance.pk is None or only_last_login(update_fields):
+        return
+    instance._loaded_username = User.objects.filter(
+        pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_author_page_cache(sender, instance, update_fields=None,
+                                 **kwargs):
+    """Сбрасывает профиль, главную и ленты групп с постами автора:
+    на них имя автора.
+
+    Вход обновляет только last_login и страниц не меняет.
+    """
+    if only_last_login(update_fields):
+        return
+    usernames = {instance.username,
+                 getattr(instance, '_loaded_username', None)} - {None}
+    slugs = Group.objects.filter(posts__author_id=instance.pk).values_list(
+        'slug', flat=True).distinct()
+    invalidate_pages('index', *(f'profile:{name}' for name in usernames),
+                     *(f'group:{slug}' for slug in slugs))
+    # Имя автора показано и в лентах групп: их валидаторы смотрят на
+    # отметку в AuthorStats.
+    AuthorStats.touch([instance.pk])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_pages(sender, instance, **kwargs):
+    """После коммита просит CDN сбросить страницы с постом."""
+    keys = changed_post_keys(instance)
+    transaction.on_commit(lambda: schedule_purge(keys))
+
+
+@receiver(post_save, sender=Post)
+def schedule_post_thumbnail(sender, instance, **kwargs):
+    """Заранее создаёт миниатюру и варианты картинки в фоновом пуле."""
+    if instance.image:
+        schedule_card_thumbnail(instance.image.name)
+        schedule_variants(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def update_search_index_on_save(sender, instance, using, **kwargs):
+    """Переиндексирует текст поста в той же транзакции."""
+    if search_enabled(connections[using]):
+        index_post(instance, connections[using])
+
+
+@receiver(post_delete, sender=Post)
+def update_search_index_on_delete(sender, instance, using, **kwargs):
+    if search_enabled(connections[using]):
+        unindex_post(instance.pk, connections[using])
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    """Раскладывает новый пост по лентам подписчиков."""
+    if created:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def update_follower_count(sender, instance, **kwargs):
+    """Обновляет счётчик подписчиков автора и ленту подписчика, а при
+    переходе порога популярности — ленты всех подписчиков автора."""
+    # post_save передаёт created, post_delete — нет.
+    created = kwargs.get('created')
+    if created is False:
+        return
+    delta = 1 if created else -1
+    AuthorStats.change_follower_count(instance.author_id, delta)
+    count = AuthorStats.objects.filter(
+        author_id=instance.author_id).values_list(
+        'follower_count', flat=True).first()
+    if count is not None:
+        follower_count_changed(instance.author_id, count - delta, count)
+    reset_timeline(instance.user_id)
+
+
+@receiver(post_save, sender=GroupFollow)
+@receiver(post_delete, sender=GroupFollow)
+def reset_group_follower_timeline(sender, instance, **kwargs):
+    reset_timeline(instance.user_id)
@@ -0,0 +1,121 @@
+"""Стеммер Snowball для русского языка.
+
+Реализация алгоритма https://snowballstem.org/algorithms/russian/stemmer.html
+без внешних зависимостей.
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (
+    ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв'),
+    ('вшись', 'вши', 'в'),
+)
+REFLEXIVE = ('ся', 'сь')
+ADJECTIVE = (
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое',
+    'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую',
+    'юю', 'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ивш', 'ывш', 'ующ'),
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+)
+VERB = (
+    ('ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило',
+     'ыло', 'ено', 'ует', 'уют', 'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю'),
+    ('ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но',
+     'ет', 'ют', 'ны', 'ть', 'й', 'л', 'н'),
+)
+NOUN = (
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие',
+    'ье', 'еи', 'ии', 'ей', 'ой', 'ий', 'ям', 'ем', 'ам', 'ом', 'ах',
+    'ях', 'ию', 'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь',
+    'ю', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+WORD_RE = re.compile(r'\w+')
+
+
+def _by_length(suffixes):
+    return tuple(sorted(suffixes, key=len, reverse=True))
+
+
+PERFECTIVE_GERUND = tuple(_by_length(group) for group in PERFECTIVE_GERUND)
+PARTICIPLE = tuple(_by_length(group) for group in PARTICIPLE)
+VERB = tuple(_by_length(group) for group in VERB)
+ADJECTIVE = _by_length(ADJECTIVE)
+NOUN = _by_length(NOUN)
+
+
+def _region(word, start):
+    """Начало области после первого сочетания гласной и согласной."""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _remove(word, suffixes, start):
+    """Удаляет самое длинное окончание из suffixes, лежащее после start."""
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= start:
+            return word[:-len(suffix)], True
+    return word, False
+
+
+def _remove_grouped(word, groups, start):
+    """Как _remove, но окончания второй группы должны следовать за а/я."""
+    first, second = groups
+    candidates = [(suffix, False) for suffix in first]
+    candidates += [(suffix, True) for suffix in second]
+    candidates.sort(key=lambda item: len(item[0]), reverse=True)
+    for suffix, after_a in candidates:
+        if not word.endswith(suffix):
+            continue
+        stem = word[:-len(suffix)]
+        if len(stem) < start:
+            continue
+        if after_a and not (len(stem) > start and stem[-1] in 'ая'):
+            continue
+        return stem, True
+    return word, False
+
+
+@lru_cache(maxsize=100000)
+def stem(word: str) -> str:
+    """Возвращает основу слова в нижнем регистре."""
+    word = word.lower().replace('ё', 'е')
+    rv = next((index + 1 for index, char in enumerate(word)
+               if char in VOWELS), len(word))
+    r2 = _region(word, _region(word, 0))
+    # Шаг 1: деепричастие, иначе возвратность и прилагательное/глагол/
+    # существительное.
+    word, found = _remove_grouped(word, PERFECTIVE_GERUND, rv)
+    if not found:
+        word, _ = _remove(word, REFLEXIVE, rv)
+        word, found = _remove(word, ADJECTIVE, rv)
+        if found:
+            word, _ = _remove_grouped(word, PARTICIPLE, rv)
+        else:
+            word, found = _remove_grouped(word, VERB, rv)
+            if not found:
+                word, _ = _remove(word, NOUN, rv)
+    # Шаг 2.
+    word, _ = _remove(word, ('и',), rv)
+    # Шаг 3: словообразовательные суффиксы в R2.
+    word, _ = _remove(word, DERIVATIONAL, r2)
+    # Шаг 4.
+    word, found = _remove(word, SUPERLATIVE, rv)
+    if word.endswith('нн') and len(word) - 1 >= rv:
+        word = word[:-1]
+    elif not found:
+        word, _ = _remove(word, ('ь',), rv)
+    return word
+
+
+def stem_text(text: str):
+    """Разбивает текст на слова и возвращает их основы."""
+    return [stem(word) for word in WORD_RE.findall(text)]
@@ -0,0 +1,19 @@
+from django import template
+
+from ..variants import card_image as get_card_image
+
+register = template.Library()
+
+
+@register.simple_tag
+def card_image(image):
+    """Картинка карточки поста с вариантами для srcset.
+
+    Не блокирует отрисовку: пока миниатюры нет, отдаёт оригинал.
+    """
+    return get_card_image(image)
+
+
+@register.inclusion_tag('posts/includes/card_image.html')
+def card_picture(im):
+    return {'im': im}
@@ -0,0 +1,140 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+API_INDEX_URL = reverse('posts:api_index')
+API_GROUP_URL = reverse('posts:api_group_list', kwargs={'slug': 'test-slug'})
+API_PROFILE_URL = reverse('posts:api_profile', kwargs={'username': 'auth'})
+POSTS_AMOUNT = 12
+
+
+class FeedApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',)
+        Post.objects.bulk_create(
+            Post(text=f'Тестовая запись {num}\nвторая строка',
+                 author=cls.author, group=cls.group)
+            for num in range(POSTS_AMOUNT))
+        cls.post = Post.objects.first()
+        cls.post_url = reverse('posts:api_post_detail',
+                               kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get_json(self, adress, data=None, status=200):
+        response = self.guest_client.get(adress, data)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(response.content)
+
+    def test_feed_pages(self):
+        """Лента проходится курсорами вперёд и назад, как HTML-страницы."""
+        for adress in (API_INDEX_URL, API_GROUP_URL, API_PROFILE_URL):
+            with self.subTest(adress=adress):
+                first_page = self.get_json(adress)
+                self.assertEqual(len(first_page['results']), 10)
+                self.assertIsNone(first_page['previous'])
+                second_page = self.get_json(
+                    adress, {'after': first_page['next']})
+                self.assertEqual(len(second_page['results']), 2)
+                self.assertIsNone(second_page['next'])
+                back_page = self.get_json(
+                    adress, {'before': second_page['previous']})
+                self.assertEqual(back_page['results'],
+                                 first_page['results'])
+
+    def test_post_fields(self):
+        """Пост отдаётся со всеми полями, ссылкой и датой в ISO 8601."""
+        data = self.get_json(self.post_url)
+        self.assertEqual(data['id'], self.post.pk)
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['author'], 'auth')
+        self.assertEqual(data['author_name'], 'Лев Толстой')
+        self.assertEqual(data['group'], 'test-slug')
+        self.assertIsNone(data['image'])
+        self.assertEqual(data['url'], reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertTrue(data['pub_date'].startswith(
+            self.post.pub_date.date().isoformat()))
+
+    def test_sparse_fields(self):
+        """?fields= сужает и ответ, и выборку из базы."""
+        with CaptureQueriesContext(connection) as context:
+            page = self.get_json(API_INDEX_URL, {'fields': 'id,author'})
+        self.assertEqual(set(page['results'][0]), {'id', 'author'})
+        sql = '\n'.join(query['sql'] for query in context)
+        self.assertNotIn('"posts_post"."text"', sql)
+        self.assertNotIn('"posts_group"', sql)
+        self.assertEqual(len(context), 1)
+
+    def test_compact_json(self):
+        """Ответ без лишних пробелов и с кириллицей без экранирования."""
+        content = self.guest_client.get(
+            API_INDEX_URL, {'fields': 'author_name'}).content.decode()
+        self.assertIn('"author_name":"Лев Толстой"', content)
+        self.assertNotIn(', "', content)
+
+    def test_bad_parameters(self):
+        """Неверные поля и размер страницы — ошибка 400 в JSON."""
+        for data in ({'fields': 'id,password'}, {'limit': 'many'},
+                     {'limit': 0}, {'limit': 1000}):
+            with self.subTest(data=data):
+                self.assertIn('error', self.get_json(API_INDEX_URL, data,
+                                                     status=400))
+
+    def test_limit(self):
+        self.assertEqual(
+            len(self.get_json(API_INDEX_URL, {'limit': 3})['results']), 3)
+
+    def test_not_found(self):
+        """Несуществующие группа, автор и пост — 404 в JSON."""
+        for adress in (
+                reverse('posts:api_group_list', kwargs={'slug': 'missing'}),
+                reverse('posts:api_profile', kwargs={'username': 'missing'}),
+                reverse('posts:api_post_detail', kwargs={'post_id': 10**6})):
+            with self.subTest(adress=adress):
+                self.assertEqual(self.get_json(adress, status=404),
+                                 {'error': 'not found'})
+
+    @override_settings(POSTS_SURROGATE_KEY_HEADER='Surrogate-Key')
+    def test_cached_and_tagged(self):
+        """Ответы кешируются и помечаются ключами сброса, как страницы."""
+        response = self.guest_client.get(API_GROUP_URL, {'fields': 'id'})
+        self.assertIn(f'group-{self.group.pk}', response['Surrogate-Key'])
+        self.assertIn(f'author-{self.author.pk}', response['Surrogate-Key'])
+        self.assertIn('public', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            self.guest_client.get(API_GROUP_URL, {'fields': 'id'})
+
+    def test_feed_pages_link_api(self):
+        """Страницы ленты знают адрес API и курсор следующей страницы."""
+        pages = {
+            reverse('posts:index'): API_INDEX_URL,
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}):
+                API_GROUP_URL,
+            reverse('posts:profile', kwargs={'username': 'auth'}):
+                API_PROFILE_URL,
+        }
+        for page, api in pages.items():
+            with self.subTest(page=page):
+                response = self.guest_client.get(page)
+                self.assertContains(response, f'data-feed="{api}"')
+                self.assertContains(
+                    response, 'data-next-cursor="'
+                    f'{response.context["page_obj"].next_cursor}"')
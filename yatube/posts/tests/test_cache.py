@@ -0,0 +1,131 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+INDEX_URL = reverse('posts:index')
+GROUP_LIST_URL = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+OTHER_GROUP_URL = reverse('posts:group_list', kwargs={'slug': 'other-slug'})
+PROFILE_URL = reverse('posts:profile', kwargs={'username': 'auth'})
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',)
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание',)
+        cls.post = Post.objects.create(text='Тестовая запись',
+                                       author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def test_anonymous_page_is_cached(self):
+        """Повторный запрос анонима отдаётся из кеша без запросов к БД."""
+        first = self.guest_client.get(INDEX_URL)
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(INDEX_URL)
+        self.assertEqual(first.content, second.content)
+
+    def test_authorized_page_is_not_cached(self):
+        """Залогиненный пользователь всегда получает свежую страницу."""
+        self.authorized_client.get(INDEX_URL)
+        Post.objects.bulk_create([Post(text='Без сигнала',
+                                       author=self.author)])
+        response = self.authorized_client.get(INDEX_URL)
+        self.assertContains(response, 'Без сигнала')
+
+    def test_new_post_invalidates_pages(self):
+        """Новый пост сбрасывает главную, группу и профиль автора."""
+        for adress in (INDEX_URL, GROUP_LIST_URL, PROFILE_URL):
+            self.guest_client.get(adress)
+        Post.objects.create(text='Свежая запись',
+                            author=self.author,
+                            group=self.group)
+        for adress in (INDEX_URL, GROUP_LIST_URL, PROFILE_URL):
+            with self.subTest(adress=adress):
+                response = self.guest_client.get(adress)
+                self.assertContains(response, 'Свежая запись')
+
+    def test_edit_invalidates_only_affected_pages(self):
+        """Правка поста сбрасывает его страницу, но не чужие группы."""
+        detail_url = reverse('posts:post_detail',
+                             kwargs={'post_id': self.post.pk})
+        self.guest_client.get(detail_url)
+        self.guest_client.get(OTHER_GROUP_URL)
+        self.post.text = 'Исправленная запись'
+        self.post.save()
+        self.assertContains(self.guest_client.get(detail_url),
+                            'Исправленная запись')
+        with self.assertNumQueries(0):
+            self.guest_client.get(OTHER_GROUP_URL)
+
+    def test_group_change_invalidates_old_group(self):
+        """Перенос поста в другую группу сбрасывает обе группы."""
+        self.guest_client.get(GROUP_LIST_URL)
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = self.other_group
+        post.save()
+        response = self.guest_client.get(GROUP_LIST_URL)
+        self.assertNotContains(response, 'Тестовая запись')
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Тестовая запись',
+                                       author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def test_post_card_is_cached(self):
+        """Карточка поста берётся из кеша, пока пост не изменён."""
+        self.authorized_client.get(INDEX_URL)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        response = self.authorized_client.get(INDEX_URL)
+        self.assertContains(response, 'Тестовая запись')
+        self.assertNotContains(response, 'Тихая правка')
+
+    def test_post_edit_bumps_card_version(self):
+        """Правка через post_edit сбрасывает карточку поста."""
+        self.authorized_client.get(PROFILE_URL)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Правка через форму'})
+        response = self.authorized_client.get(PROFILE_URL)
+        self.assertContains(response, 'Правка через форму')
+
+    def test_author_and_group_change_refresh_card(self):
+        """Новое имя автора и слаг группы видны в карточке сразу."""
+        group = Group.objects.create(title='Группа', slug='old-slug',
+                                     description='Описание')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        self.authorized_client.get(INDEX_URL)
+        self.author.first_name = 'Новое имя'
+        self.author.save()
+        group.slug = 'new-slug'
+        group.save()
+        response = self.authorized_client.get(INDEX_URL)
+        self.assertContains(response, 'Новое имя')
+        self.assertContains(response, reverse(
+            'posts:group_list', kwargs={'slug': 'new-slug'}))
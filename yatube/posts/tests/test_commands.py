@@ -0,0 +1,228 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+
+from core.management.commands.bench_routes import (compare,
+                                                   discover_routes,
+                                                   summarize)
+from ..management.commands import import_posts
+from ..models import AuthorStats, Group, Post
+from ..search import search_posts
+
+User = get_user_model()
+
+
+class ExplainFeedQueriesTests(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не просматривают таблицу целиком и
+        не сортируют без индекса."""
+        out = StringIO()
+        call_command('explain_feed_queries', stdout=out)
+        self.assertNotIn('полный просмотр', out.getvalue())
+
+
+class ImportExportPostsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(title='Книги', slug='books',
+                                         description='Про книги')
+        cls.old = Post.objects.create(text='Старый пост про книги',
+                                      author=cls.author, group=cls.group)
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=datetime(2015, 3, 1, 12, 0, tzinfo=timezone.utc))
+        Post.objects.create(text='Пост без группы', author=cls.author)
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def export(self, name):
+        path = os.path.join(self.tmp, name)
+        call_command('export_posts', path, stderr=StringIO())
+        return path
+
+    def import_(self, path, *args):
+        call_command('import_posts', path, *args, stdout=StringIO())
+
+    def write(self, name, records):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка в CSV и JSONL сохраняют даты, авторов и
+        группы."""
+        for name in ('posts.jsonl', 'posts.csv'):
+            with self.subTest(format=name):
+                path = self.export(name)
+                Post.objects.all().delete()
+                self.import_(path)
+                old = Post.objects.get(text='Старый пост про книги')
+                self.assertEqual(old.pub_date, datetime(
+                    2015, 3, 1, 12, 0, tzinfo=timezone.utc))
+                self.assertEqual(old.author, self.author)
+                self.assertEqual(old.group, self.group)
+                self.assertIsNone(Post.objects.get(
+                    text='Пост без группы').group)
+
+    def test_unknown_authors_skipped_or_created(self):
+        """Посты неизвестных авторов пропускаются без --create-authors."""
+        path = self.write('new.jsonl', [
+            {'text': 'Пост новичка', 'author': 'newcomer'},
+            {'text': 'Пост в новой группе', 'author': 'writer',
+             'group': 'new-group'},
+        ])
+        self.import_(path)
+        self.assertFalse(Post.objects.filter(text__startswith='Пост н')
+                         .exists())
+        self.import_(path, '--create-authors', '--create-groups')
+        newcomer = User.objects.get(username='newcomer')
+        self.assertTrue(Post.objects.filter(author=newcomer).exists())
+        self.assertTrue(Post.objects.filter(group__slug='new-group')
+                        .exists())
+
+    def test_side_effects(self):
+        """Импорт обновляет счётчик постов автора и поисковый индекс."""
+        AuthorStats.recount(self.author.pk)
+        path = self.write('more.jsonl', [
+            {'text': 'Импортированный рассказ про города',
+             'author': 'writer'} for _ in range(3)])
+        self.import_(path, '--batch-size', '2')
+        self.assertEqual(AuthorStats.objects.get(
+            author=self.author).post_count, 5)
+        self.assertEqual(len(search_posts('город')), 3)
+
+    def test_failed_chunk_keeps_earlier_chunks_consistent(self):
+        """Сбой в части файла не оставляет без счётчиков и индекса уже
+        вставленные части, а созданные в ней авторы забываются."""
+        path = self.write('broken.jsonl', [
+            {'text': 'Первый рассказ про города', 'author': 'first'},
+            {'text': 'Второй рассказ про города', 'author': 'second'},
+        ])
+        index_posts = import_posts.index_posts
+        calls = []
+
+        def flaky_index(rows):
+            calls.append(rows)
+            if len(calls) > 1:
+                raise DatabaseError('сбой')
+            index_posts(rows)
+
+        with mock.patch.object(import_posts, 'index_posts', flaky_index):
+            with self.assertRaises(DatabaseError):
+                self.import_(path, '--create-authors', '--batch-size', '1',
+                             '--batches-per-transaction', '1')
+        first = User.objects.get(username='first')
+        self.assertEqual(AuthorStats.objects.get(author=first).post_count,
+                         1)
+        self.assertEqual(len(search_posts('город')), 1)
+        self.assertFalse(User.objects.filter(username='second').exists())
+
+    def test_rolled_back_authors_forgotten(self):
+        """Автор из откатившейся части не остаётся в справочнике."""
+        command = import_posts.Command(stdout=StringIO())
+        command.authors, command.groups = {}, {}
+        command.create_authors, command.create_groups = True, False
+        command.downloader, command.skipped = None, 0
+        with mock.patch.object(Post.objects, 'bulk_create',
+                               side_effect=DatabaseError('сбой')):
+            with self.assertRaises(DatabaseError):
+                command.import_chunk([{'text': 'Пост', 'author': 'ghost'}],
+                                     {'batch_size': 10})
+        self.assertNotIn('ghost', command.authors)
+        self.assertFalse(User.objects.filter(username='ghost').exists())
+
+    @override_settings(POSTS_IMAGE_MAX_BYTES=10)
+    def test_fetch_image_size_limit(self):
+        """Картинка больше POSTS_IMAGE_MAX_BYTES не скачивается."""
+        response = mock.MagicMock()
+        response.__enter__.return_value = response
+        response.headers = {}
+        response.read = BytesIO(b'x' * 11).read
+        with mock.patch.object(import_posts, 'urlopen',
+                               return_value=response) as urlopen:
+            with self.assertRaises(ValueError):
+                import_posts.fetch_image('http://example.com/big.jpg')
+        urlopen.assert_called_once_with('http://example.com/big.jpg',
+                                        timeout=import_posts.FETCH_TIMEOUT)
+
+
+class BenchRoutesTests(TestCase):
+    def test_every_route_discovered(self):
+        """Замер находит все маршруты posts, users и about."""
+        names = {name for name, _ in discover_routes()}
+        for name in ('posts:index', 'posts:api_post_detail',
+                     'users:password_reset_confirm', 'about:tech'):
+            with self.subTest(name=name):
+                self.assertIn(name, names)
+        self.assertIn(('posts:post_detail', ['post_id']), discover_routes())
+
+    def test_summary_and_compare(self):
+        """Итог считает перцентили, сравнение находит регрессии."""
+        options = {'users': 1, 'groups': 1, 'posts': 1, 'image_share': 0,
+                   'requests': 100, 'concurrency': 1, 'seed': 1,
+                   'sqlite_tuning': False}
+        results = [('posts:index guest', 200, num / 1000, 1)
+                   for num in range(1, 101)]
+        baseline = summarize(results, 1.0, options)
+        route = baseline['routes']['posts:index guest']
+        self.assertEqual((route['p50_ms'], route['p99_ms']), (51, 100))
+        self.assertEqual(baseline['total']['per_second'], 100)
+        self.assertEqual(compare(baseline, baseline, 'p50_ms', 0.2, 5), [])
+        slower = summarize(
+            [(key, status, latency * 2, queries + 1)
+             for key, status, latency, queries in results], 1.0, options)
+        self.assertEqual(len(compare(baseline, slower, 'p50_ms', 0.2, 5)),
+                         2)
+
+
+class GenerateDatasetTests(TestCase):
+    def generate(self, prefix):
+        call_command('generate_dataset', users=40, groups=5, posts=600,
+                     image_share=0, vocabulary=500, batch_size=250, jobs=1,
+                     seed=3, prefix=prefix, stdout=StringIO())
+        return [(text, author[len(prefix):]) for text, author in
+                Post.objects.filter(author__username__startswith=prefix)
+                .order_by('pk').values_list('text', 'author__username')]
+
+    def test_dataset(self):
+        """Посты созданы со счётчиками и индексом, авторы по Ципфу."""
+        posts = self.generate('gen')
+        self.assertEqual(len(posts), 600)
+        self.assertEqual(Group.objects.count(), 5)
+        counts = sorted(AuthorStats.objects.values_list('post_count',
+                                                        flat=True))
+        self.assertEqual(sum(counts), 600)
+        # При равномерном выборе у автора было бы около 15 постов.
+        self.assertGreater(counts[-1], 60)
+        word = posts[0][0].split()[0].strip('.').lower()
+        self.assertTrue(search_posts(word))
+
+    def test_same_seed_same_data(self):
+        self.assertEqual(self.generate('first'), self.generate('second'))
+
+    def test_existing_prefix(self):
+        User.objects.create_user(username='gen7')
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', users=1, posts=1,
+                         stdout=StringIO())
+
+    def test_real_users_with_prefix_untouched(self):
+        """Пользователь, чьё имя лишь начинается с префикса, не мешает
+        генерации и не становится синтетическим автором."""
+        generic = User.objects.create_user(username='generic')
+        self.generate('gen')
+        self.assertFalse(Post.objects.filter(author=generic).exists())
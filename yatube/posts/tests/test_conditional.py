@@ -0,0 +1,192 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import AuthorStats, Group, Post
+
+User = get_user_model()
+GROUP_LIST_URL = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+PROFILE_URL = reverse('posts:profile', kwargs={'username': 'auth'})
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',)
+        cls.post = Post.objects.create(text='Тестовая запись',
+                                       author=cls.author,
+                                       group=cls.group)
+        cls.post_url = reverse('posts:post_detail',
+                               kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def set_stamps(self, moment):
+        """Ставит всем отметкам изменения в базе время moment."""
+        Post.objects.update(updated_at=moment)
+        Group.objects.update(updated_at=moment)
+        AuthorStats.objects.update(updated_at=moment)
+
+    def age_stamps(self, seconds=5):
+        """Делает отметки изменения старше на seconds секунд."""
+        self.set_stamps(timezone.now() - timedelta(seconds=seconds))
+
+    def test_unchanged_page_not_modified(self):
+        """Повторный запрос с валидаторами получает 304 без тела."""
+        for adress in (GROUP_LIST_URL, PROFILE_URL, self.post_url):
+            with self.subTest(adress=adress):
+                self.age_stamps()
+                response = self.guest_client.get(adress)
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+                by_etag = self.guest_client.get(
+                    adress, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(by_etag.status_code, 304)
+                self.assertEqual(by_etag.content, b'')
+                by_date = self.guest_client.get(
+                    adress, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(by_date.status_code, 304)
+
+    def test_fresh_change_has_no_last_modified(self):
+        """Пока секунда изменения не прошла, Last-Modified не отдаётся:
+        изменение в ту же секунду получило бы ту же дату."""
+        self.set_stamps(timezone.now() + timedelta(seconds=1))
+        response = self.guest_client.get(PROFILE_URL)
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_not_modified_without_rendering(self):
+        """304 из кеша страниц отдаётся без запросов к базе, а без
+        кеша — одним запросом, без отрисовки шаблона."""
+        etag = self.guest_client.get(PROFILE_URL)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(PROFILE_URL,
+                                             HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        cache.clear()
+        with override_settings(POSTS_CACHE_TTL=0):
+            etag = self.guest_client.get(PROFILE_URL)['ETag']
+            post_etag = self.guest_client.get(self.post_url)['ETag']
+            with self.assertNumQueries(1):
+                response = self.guest_client.get(PROFILE_URL,
+                                                 HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            with self.assertNumQueries(2):
+                response = self.guest_client.get(
+                    self.post_url, HTTP_IF_NONE_MATCH=post_etag)
+            self.assertEqual(response.status_code, 304)
+
+    def test_edit_changes_validator(self):
+        """Правка поста через post_edit меняет ETag всех его страниц."""
+        etags = {adress: self.guest_client.get(adress)['ETag']
+                 for adress in (GROUP_LIST_URL, PROFILE_URL, self.post_url)}
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Исправленная запись', 'group': self.group.pk})
+        for adress, etag in etags.items():
+            with self.subTest(adress=adress):
+                response = self.guest_client.get(adress,
+                                                 HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Исправленная запись')
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_deleted_post_changes_validator(self):
+        """Удаление поста меняет ETag ленты группы."""
+        extra = Post.objects.create(text='Лишняя запись',
+                                    author=self.author, group=self.group)
+        etag = self.guest_client.get(GROUP_LIST_URL)['ETag']
+        extra.delete()
+        response = self.guest_client.get(GROUP_LIST_URL,
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleted_older_post_changes_last_modified(self):
+        """Удаление не самого нового поста сдвигает Last-Modified."""
+        older = Post.objects.create(text='Старая запись',
+                                    author=self.author, group=self.group)
+        Post.objects.filter(pk=older.pk).update(
+            updated_at=self.post.updated_at.replace(year=2000))
+        self.age_stamps()
+        modified = self.guest_client.get(PROFILE_URL)['Last-Modified']
+        older.delete()
+        response = self.guest_client.get(PROFILE_URL,
+                                         HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Старая запись')
+
+    @override_settings(POSTS_CACHE_TTL=0)
+    def test_change_outside_process_changes_validators(self):
+        """Валидаторы читаются из базы: правку из другого процесса или
+        команды, не сбросившую кеш этого, видно сразу."""
+        self.age_stamps()
+        etags = {adress: self.guest_client.get(adress)['ETag']
+                 for adress in (GROUP_LIST_URL, PROFILE_URL, self.post_url)}
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Правка из другого процесса', updated_at=timezone.now())
+        for adress, etag in etags.items():
+            with self.subTest(adress=adress):
+                response = self.guest_client.get(adress,
+                                                 HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Правка из другого процесса')
+
+    def test_author_rename_changes_group_validators(self):
+        """Смена имени автора сбрасывает ленты групп с его постами
+        и меняет их ETag."""
+        etag = self.guest_client.get(GROUP_LIST_URL)['ETag']
+        self.author.first_name = 'Лев'
+        self.author.save()
+        response = self.guest_client.get(GROUP_LIST_URL,
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Лев')
+
+    def test_rename_changes_validators(self):
+        """Правка группы и имени автора меняет ETag страниц с ними."""
+        etags = {adress: self.guest_client.get(adress)['ETag']
+                 for adress in (GROUP_LIST_URL, PROFILE_URL, self.post_url)}
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.author.first_name = 'Лев'
+        self.author.save()
+        for adress, etag in etags.items():
+            with self.subTest(adress=adress):
+                response = self.guest_client.get(adress,
+                                                 HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_login_keeps_validators(self):
+        """Вход автора обновляет last_login, но не сбрасывает страницы."""
+        etag = self.guest_client.get(PROFILE_URL)['ETag']
+        self.author.set_password('password')
+        self.author.save()
+        etag = self.guest_client.get(PROFILE_URL)['ETag']
+        Client().login(username='auth', password='password')
+        response = self.guest_client.get(PROFILE_URL,
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_authorized_page_has_no_validators(self):
+        """Залогиненный пользователь получает страницу без валидаторов."""
+        response = self.authorized_client.get(PROFILE_URL)
+        self.assertNotIn('ETag', response)
+
+    def test_missing_group_not_found(self):
+        """Для несуществующей группы по-прежнему 404."""
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
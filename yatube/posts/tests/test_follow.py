@@ -0,0 +1,173 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import timelines
+from ..models import AuthorStats, Follow, Group, GroupFollow, Post, Timeline
+from ..timelines import timeline_page, unpack
+
+User = get_user_model()
+FOLLOW_URL = reverse('posts:follow_index')
+
+
+class FollowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed(self, **cursor):
+        return list(timeline_page(self.reader, **cursor))
+
+    def test_follow_and_unfollow(self):
+        """Подписка и отписка меняют счётчик подписчиков автора."""
+        self.client.get(reverse('posts:profile_follow',
+                                args=[self.author.username]))
+        self.assertTrue(Follow.objects.filter(user=self.reader,
+                                              author=self.author).exists())
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).follower_count, 1)
+        self.client.get(reverse('posts:profile_unfollow',
+                                args=[self.author.username]))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).follower_count, 0)
+
+    def test_cannot_follow_self(self):
+        """На себя подписаться нельзя."""
+        self.client.get(reverse('posts:profile_follow',
+                                args=[self.reader.username]))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_feed_shows_followed_authors_and_groups(self):
+        """В ленте посты авторов и групп из подписок и только они."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        GroupFollow.objects.create(user=self.reader, group=self.group)
+        by_author = Post.objects.create(text='Автор', author=self.author)
+        in_group = Post.objects.create(text='Группа', author=self.stranger,
+                                       group=self.group)
+        Post.objects.create(text='Чужой', author=self.stranger)
+        response = self.client.get(FOLLOW_URL)
+        self.assertEqual(list(response.context['page_obj']),
+                         [in_group, by_author])
+
+    def test_new_post_fanned_out_to_built_timeline(self):
+        """Новый пост дописывается в уже собранную ленту подписчика."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed(), [])
+        post = Post.objects.create(text='Новый', author=self.author)
+        keys = unpack(Timeline.objects.get(user=self.reader).entries)
+        self.assertEqual([pk for _, pk in keys], [post.pk])
+        self.assertEqual(self.feed(), [post])
+
+    @override_settings(POSTS_TIMELINE_LENGTH=2)
+    def test_timeline_trimmed(self):
+        """Лента не растёт больше заданной длины."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.feed()
+        for num in range(4):
+            Post.objects.create(text=f'Пост {num}', author=self.author)
+        timeline = Timeline.objects.get(user=self.reader)
+        self.assertEqual(len(unpack(timeline.entries)), 2)
+
+    @override_settings(POSTS_FANOUT_MAX_FOLLOWERS=0)
+    def test_popular_author_read_on_demand(self):
+        """Посты популярного автора не раскладываются, а читаются."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.feed()
+        post = Post.objects.create(text='Популярный', author=self.author)
+        self.assertEqual(
+            unpack(Timeline.objects.get(user=self.reader).entries), [])
+        self.assertEqual(self.feed(), [post])
+
+    @override_settings(POSTS_FANOUT_MAX_FOLLOWERS=1)
+    def test_author_no_longer_popular_keeps_posts(self):
+        """Пост, опубликованный, пока автор был популярным, остаётся
+        в ленте подписчика, когда автор перестаёт быть популярным."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.stranger, author=self.author)
+        self.feed()
+        post = Post.objects.create(text='Популярный', author=self.author)
+        Follow.objects.filter(user=self.stranger).delete()
+        self.assertEqual(self.feed(), [post])
+
+    @override_settings(POSTS_FANOUT_MAX_FOLLOWERS=1)
+    def test_fan_out_uses_follower_counter(self):
+        """Раскладка решает по тому же счётчику подписчиков, что
+        и чтение ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.feed()
+        AuthorStats.objects.filter(author=self.author).update(
+            follower_count=2)
+        post = Post.objects.create(text='Популярный', author=self.author)
+        self.assertEqual(
+            unpack(Timeline.objects.get(user=self.reader).entries), [])
+        self.assertEqual(self.feed(), [post])
+
+    def test_cursor_pages(self):
+        """Лента листается курсором вперёд и назад."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [Post.objects.create(text=f'Пост {num}', author=self.author)
+                 for num in range(13)][::-1]
+        first = timeline_page(self.reader)
+        self.assertEqual(list(first), posts[:10])
+        second = timeline_page(self.reader, after=first.next_cursor)
+        self.assertEqual(list(second), posts[10:])
+        self.assertFalse(second.has_next())
+        back = timeline_page(self.reader, before=second.previous_cursor)
+        self.assertEqual(list(back), posts[:10])
+
+    def test_queries_do_not_depend_on_follows(self):
+        """Число запросов ленты не зависит от числа подписок."""
+        authors = [User.objects.create_user(username=f'writer{num}')
+                   for num in range(20)]
+        for author in authors[:2]:
+            Follow.objects.create(user=self.reader, author=author)
+            Post.objects.create(text='Пост', author=author)
+        self.feed()
+        with CaptureQueriesContext(connection) as few:
+            self.feed()
+        for author in authors[2:]:
+            Follow.objects.create(user=self.reader, author=author)
+            Post.objects.create(text='Пост', author=author)
+        self.feed()
+        with CaptureQueriesContext(connection) as many:
+            self.feed()
+        self.assertEqual(len(few), len(many))
+
+
+class FanOutTransactionTests(TransactionTestCase):
+    def test_timeline_read_and_written_in_one_transaction(self):
+        """Раскладка читает и пишет ленту в одной транзакции, даже если
+        вызвана вне транзакции: иначе в SQLite параллельная раскладка
+        затёрла бы пост."""
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=reader, author=author)
+        timeline_page(reader)
+        atomic = []
+
+        def tracked_unpack(data):
+            atomic.append(connection.in_atomic_block)
+            return unpack(data)
+
+        # bulk_create не шлёт сигналов: раскладываем пост сами.
+        Post.objects.bulk_create([Post(text='Новый', author=author)])
+        post = Post.objects.get(text='Новый')
+        with mock.patch.object(timelines, 'unpack', tracked_unpack):
+            timelines.fan_out_post(post)
+        self.assertEqual(atomic, [True])
+        keys = unpack(Timeline.objects.get(user=reader).entries)
+        self.assertEqual([pk for _, pk in keys], [post.pk])
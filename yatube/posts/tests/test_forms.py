@@ -1,11 +1,33 @@
-from django.test import Client, TestCase
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from http import HTTPStatus
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from PIL import Image
 
+from ..forms import PostForm
 from ..models import Post, Group
 
 User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_KVSTORE_PATH = os.path.join(TEMP_MEDIA_ROOT, 'thumbnails.sqlite3')
+
+
+def make_jpeg(size=(40, 20), orientation=None):
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+        exif[0x010F] = 'Camera'
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
 
 
 class PostFormTests(TestCase):
@@ -74,3 +96,114 @@ class PostFormTests(TestCase):
                              kwargs={'post_id': PostFormTests.post.pk}))
         # Проверяем, число постов осталось прежним
         self.assertEqual(Post.objects.count(), post_count)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_ASYNC=False,
+                   THUMBNAIL_SQLITE_PATH=TEMP_KVSTORE_PATH,
+                   POSTS_IMAGE_MAX_BYTES=50 * 1024,
+                   POSTS_IMAGE_MAX_DIMENSIONS=(100, 100))
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def form(self, content, name='photo.jpg'):
+        image = SimpleUploadedFile(name, content, content_type='image/jpeg')
+        return PostForm({'text': 'Пост с картинкой'}, {'image': image})
+
+    def test_create_post_with_image(self):
+        """Картинка загружается через форму создания поста."""
+        image = SimpleUploadedFile('photo.jpg', make_jpeg(),
+                                   content_type='image/jpeg')
+        self.client.post(reverse('posts:post_create'),
+                         data={'text': 'С картинкой', 'image': image})
+        post = Post.objects.get(text='С картинкой')
+        self.assertTrue(post.image.name.startswith('posts/photo'))
+
+    def test_too_large_file_rejected(self):
+        """Слишком большой файл отклоняется, не открываясь."""
+        form = self.form(make_jpeg() + b'\0' * 60 * 1024)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_large')
+
+    def test_too_large_upload_rejected_with_error(self):
+        """Большой файл из запроса не дописывается и даёт ошибку формы."""
+        image = SimpleUploadedFile('big.jpg', make_jpeg() + b'\0' * 60 * 1024,
+                                   content_type='image/jpeg')
+        response = self.client.post(reverse('posts:post_create'),
+                                    data={'text': 'Большая', 'image': image})
+        self.assertContains(response, 'Файл больше')
+        self.assertFalse(Post.objects.filter(text='Большая').exists())
+
+    def test_too_many_pixels_rejected(self):
+        """Картинка больше допустимых размеров отклоняется."""
+        form = self.form(make_jpeg(size=(200, 20)))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'too_many_pixels')
+
+    def test_exif_stripped_except_orientation(self):
+        """Из JPEG удаляется EXIF, кроме ориентации."""
+        form = self.form(make_jpeg(orientation=6))
+        self.assertTrue(form.is_valid())
+        self.addCleanup(form.cleaned_data['image'].close)
+        image = Image.open(form.cleaned_data['image'])
+        exif = image.getexif()
+        self.assertEqual(dict(exif), {0x0112: 6})
+        self.assertEqual(image.size, (40, 20))
+
+    def test_fill_bytes_before_marker(self):
+        """JPEG с заполнителями 0xFF перед маркером принимается
+        и очищается от EXIF."""
+        content = make_jpeg(orientation=6)
+        form = self.form(content[:2] + b'\xff\xff' + content[2:])
+        self.assertTrue(form.is_valid())
+        self.addCleanup(form.cleaned_data['image'].close)
+        image = Image.open(form.cleaned_data['image'])
+        self.assertEqual(dict(image.getexif()), {0x0112: 6})
+
+    def test_strip_failure_is_form_error(self):
+        """Сбой очистки метаданных — ошибка формы, а не 500."""
+        with mock.patch('posts.uploads.copy_jpeg_without_metadata',
+                        side_effect=ValueError('Повреждённый JPEG')):
+            image = SimpleUploadedFile('photo.jpg', make_jpeg(),
+                                       content_type='image/jpeg')
+            response = self.client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Сбой', 'image': image})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            response.context['form'].errors.as_data()['image'][0].code,
+            'invalid_image')
+        self.assertFalse(Post.objects.filter(text='Сбой').exists())
+
+    def test_unsupported_format_rejected(self):
+        """Картинки не из списка форматов, например BMP и TIFF,
+        отклоняются."""
+        for image_format in ('BMP', 'TIFF'):
+            with self.subTest(format=image_format):
+                buffer = io.BytesIO()
+                Image.new('RGB', (10, 10), 'red').save(buffer, image_format)
+                form = self.form(buffer.getvalue(),
+                                 name=f'photo.{image_format.lower()}')
+                self.assertFalse(form.is_valid())
+                self.assertEqual(form.errors.as_data()['image'][0].code,
+                                 'unsupported_format')
+
+    def test_not_an_image_rejected(self):
+        """Файл, который не является картинкой, отклоняется."""
+        form = self.form(b'not an image', name='photo.txt')
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'invalid_image')
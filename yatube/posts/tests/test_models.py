@@ -1,7 +1,14 @@
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 
-from ..models import Post, Group
+from ..models import AuthorStats, Post, Group
 
 User = get_user_model()
 
@@ -39,3 +46,51 @@ class PostModelTest(TestCase):
         max_length_group = group._meta.get_field('title').max_length
         length_title_group = len(group.title)
         self.assertLessEqual(length_title_group, max_length_group)
+
+
+class AuthorStatsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        self.post = Post.objects.create(text='Первый пост',
+                                        author=self.author)
+
+    def post_count(self, author):
+        return AuthorStats.objects.get(author=author).post_count
+
+    def test_post_count_follows_create_and_delete(self):
+        """Счётчик постов растёт при создании и падает при удалении."""
+        Post.objects.create(text='Второй пост', author=self.author)
+        self.assertEqual(self.post_count(self.author), 2)
+        self.post.delete()
+        self.assertEqual(self.post_count(self.author), 1)
+
+    def test_post_count_follows_author_change(self):
+        """Смена автора переносит пост в счётчик нового автора."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.author = self.other
+        post.save()
+        self.assertEqual(self.post_count(self.author), 0)
+        self.assertEqual(self.post_count(self.other), 1)
+
+    def test_rebuild_author_stats(self):
+        """Команда rebuild_author_stats исправляет расхождения."""
+        Post.objects.bulk_create([Post(text='Без сигнала',
+                                       author=self.other)])
+        AuthorStats.objects.filter(author=self.author).update(post_count=7)
+        call_command('rebuild_author_stats', stdout=StringIO())
+        self.assertEqual(self.post_count(self.author), 1)
+        self.assertEqual(self.post_count(self.other), 1)
+
+
+class PostUpdatedAtMigrationTest(TestCase):
+    def test_existing_posts_keep_pub_date(self):
+        """Миграция 0013 проставляет старым постам updated_at = pub_date."""
+        migration = import_module('posts.migrations.0013_post_updated_at')
+        user = User.objects.create_user(username='old-author')
+        post = Post.objects.create(text='Старый пост', author=user)
+        pub_date = post.pub_date - timedelta(days=30)
+        Post.objects.filter(pk=post.pk).update(pub_date=pub_date)
+        migration.fill_updated_at(apps, None)
+        post.refresh_from_db()
+        self.assertEqual(post.updated_at, pub_date)
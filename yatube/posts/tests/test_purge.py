@@ -0,0 +1,149 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..purge import HTTPPurgeBackend, PurgeDispatcher, get_dispatcher
+
+User = get_user_model()
+INDEX_URL = reverse('posts:index')
+PROFILE_URL = reverse('posts:profile', kwargs={'username': 'auth'})
+
+
+class PurgeStandIn(HTTPServer):
+    """Локальная замена API сброса CDN: запоминает присланные ключи."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), PurgeHandler)
+        self.batches = []
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/purge'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class PurgeHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.batches.append(
+            (self.headers.get('Fastly-Key'),
+             json.loads(body)['surrogate_keys']))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInBackend(HTTPPurgeBackend):
+    server = None
+
+    def __init__(self):
+        super().__init__(self.server.url, {'Fastly-Key': 'secret'})
+
+
+class EdgeHeadersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug='test-slug',
+                                         description='Тестовое описание')
+        cls.post = Post.objects.create(text='Тестовая запись',
+                                       author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_cacheable_on_edge(self):
+        """Страницы анонимов получают s-maxage и stale-while-revalidate."""
+        response = Client().get(INDEX_URL)
+        control = response['Cache-Control']
+        self.assertIn('public', control)
+        self.assertIn('s-maxage=60', control)
+        self.assertIn('stale-while-revalidate=300', control)
+
+    def test_authorized_pages_private(self):
+        """Страницы залогиненных CDN не хранит."""
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(INDEX_URL)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('s-maxage', response['Cache-Control'])
+
+    def test_surrogate_keys(self):
+        """Ответ помечен ключами показанных постов, авторов и групп."""
+        keys = Client().get(PROFILE_URL)['Surrogate-Key'].split()
+        self.assertCountEqual(keys, [
+            f'author-{self.author.pk}', f'post-{self.post.pk}',
+            f'group-{self.group.pk}'])
+
+
+class PurgeDispatcherTests(TransactionTestCase):
+    def setUp(self):
+        self.server = PurgeStandIn()
+        self.addCleanup(self.server.stop)
+        StandInBackend.server = self.server
+
+    def test_keys_batched(self):
+        """Ключи, пришедшие подряд, уходят одним запросом без повторов
+        и не больше batch_size за раз."""
+        dispatcher = PurgeDispatcher(StandInBackend(), batch_size=3,
+                                     delay=0.2)
+        dispatcher.add(['post-1', 'author-1'])
+        dispatcher.add(['post-1', 'group-1'])
+        dispatcher.add(['index'])
+        dispatcher.flush()
+        keys = [key for _, batch in self.server.batches for key in batch]
+        self.assertCountEqual(keys, ['post-1', 'author-1', 'group-1',
+                                     'index'])
+        self.assertTrue(all(len(batch) <= 3
+                            for _, batch in self.server.batches))
+        self.assertEqual(self.server.batches[0][0], 'secret')
+
+    def test_backend_error_logged(self):
+        """Ошибка CDN не останавливает диспетчер."""
+        self.server.stop()
+        dispatcher = PurgeDispatcher(StandInBackend(), delay=0)
+        with self.assertLogs('posts.purge', 'ERROR'):
+            dispatcher.add(['post-1'])
+            dispatcher.flush()
+        self.server = PurgeStandIn()
+        StandInBackend.server = self.server
+        dispatcher.backend = StandInBackend()
+        dispatcher.add(['post-2'])
+        dispatcher.flush()
+        self.assertEqual(self.server.batches[0][1], ['post-2'])
+
+    @override_settings(
+        POSTS_PURGE_BACKEND='posts.tests.test_purge.StandInBackend',
+        POSTS_PURGE_DELAY=0.1)
+    def test_post_changes_purged(self):
+        """Сохранение и удаление поста сбрасывают его ключи."""
+        author = User.objects.create_user(username='auth')
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        post = Post.objects.create(text='Запись', author=author,
+                                   group=group)
+        get_dispatcher().flush()
+        keys = self.server.batches[-1][1]
+        self.assertCountEqual(keys, [
+            'index', 'search', f'post-{post.pk}', f'author-{author.pk}',
+            f'group-{group.pk}'])
+        post_id = post.pk
+        post.delete()
+        get_dispatcher().flush()
+        self.assertIn(f'post-{post_id}', self.server.batches[-1][1])
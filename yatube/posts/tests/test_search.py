@@ -0,0 +1,110 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..search import search_posts
+from ..stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTests(SimpleTestCase):
+    def test_word_forms_share_stem(self):
+        """Разные формы слова приводятся к одной основе."""
+        cases = {
+            'книга': 'книг', 'книгами': 'книг', 'книги': 'книг',
+            'красивая': 'красив', 'красивыми': 'красив',
+            'читает': 'чита', 'читали': 'чита',
+            'программирование': 'программирован',
+            'ёлки': 'елк', 'важнейшие': 'важн',
+        }
+        for word, expected in cases.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(title='Книги', slug='books',
+                                         description='Про книги')
+        cls.about_books = Post.objects.create(
+            text='Читаю книги о красивых городах', author=cls.author,
+            group=cls.group)
+        cls.many_books = Post.objects.create(
+            text='Книга за книгой, книгами полна полка',
+            author=cls.other)
+        cls.unrelated = Post.objects.create(
+            text='Про погоду и дождь', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def found(self, query, **filters):
+        return list(search_posts(query, **filters)[:10])
+
+    def test_finds_other_word_forms(self):
+        """Поиск находит посты с другими формами слова."""
+        self.assertCountEqual(self.found('книгу'),
+                              [self.about_books, self.many_books])
+        self.assertEqual(self.found('красивый город'), [self.about_books])
+
+    def test_ranked_by_relevance(self):
+        """Пост, где слово встречается чаще, выше в результатах."""
+        self.assertEqual(self.found('книги')[0], self.many_books)
+
+    def test_filters(self):
+        """Результаты фильтруются по группе и автору."""
+        self.assertEqual(self.found('книги', group=self.group),
+                         [self.about_books])
+        self.assertEqual(self.found('книги', author=self.other),
+                         [self.many_books])
+
+    def test_one_database_for_matches_and_posts(self):
+        """Совпадения и посты читаются из базы, выбранной роутером."""
+        with mock.patch('posts.search.router.db_for_read',
+                        return_value='default') as db_for_read:
+            results = search_posts('книги')
+        db_for_read.assert_called_once_with(Post)
+        self.assertEqual(results.using, 'default')
+        self.assertEqual({post._state.db for post in results[:10]},
+                         {'default'})
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.unrelated.text = 'Теперь тоже про книги'
+        self.unrelated.save()
+        self.assertIn(self.unrelated, self.found('книги'))
+        self.unrelated.delete()
+        self.assertEqual(len(self.found('книги')), 2)
+        self.assertEqual(self.found('погода'), [])
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты и фильтры."""
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': 'книги', 'group': 'books'})
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.about_books])
+        self.assertEqual(response.context['query_prefix'],
+                         'q=%D0%BA%D0%BD%D0%B8%D0%B3%D0%B8&group=books&')
+
+    def test_empty_query(self):
+        """Пустой запрос ничего не ищет."""
+        response = self.client.get(reverse('posts:search'), {'q': ' '})
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_admin_uses_index(self):
+        """Поиск в админке находит формы слова через индекс."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'городом'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.about_books])
@@ -0,0 +1,238 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default
+
+from ..models import Post
+from ..kvstore import LRUCache, SQLiteKVStore
+from ..thumbnails import (CARD_GEOMETRY, CARD_OPTIONS, _failed,
+                          card_thumbnail, metrics, schedule_card_thumbnail)
+from ..variants import (card_image, get_variants, prefetch_card_images,
+                        render_variants)
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_KVSTORE_PATH = os.path.join(TEMP_MEDIA_ROOT, 'thumbnails.sqlite3')
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_ASYNC=False,
+                   THUMBNAIL_SQLITE_PATH=TEMP_KVSTORE_PATH)
+class CardThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name):
+        image = SimpleUploadedFile(name, SMALL_GIF, content_type='image/gif')
+        return Post.objects.create(text='Пост с картинкой',
+                                   author=self.author,
+                                   image=image)
+
+    def test_thumbnail_created_on_save(self):
+        """Сохранение поста с картинкой ставит миниатюру в очередь."""
+        generated = metrics.generated
+        post = self.create_post('saved.gif')
+        self.assertEqual(metrics.generated, generated + 1)
+        thumbnail = card_thumbnail(post.image)
+        self.assertTrue(thumbnail.url.startswith(
+            settings.MEDIA_URL + 'cache/'))
+
+    def test_missing_thumbnail_falls_back_to_original(self):
+        """Пока миниатюры нет, тег отдаёт оригинал и не ждёт генерации."""
+        with mock.patch('posts.signals.schedule_card_thumbnail'):
+            post = self.create_post('fallback.gif')
+        with mock.patch('posts.thumbnails.schedule_card_thumbnail') as queue:
+            self.assertEqual(card_thumbnail(post.image), post.image)
+        queue.assert_called_with(post.image.name)
+
+    def test_failed_thumbnail_not_rescheduled(self):
+        """Картинка, миниатюру которой создать не удалось, не ставится
+        в очередь снова до истечения POSTS_THUMBNAIL_RETRY_AFTER."""
+        self.addCleanup(_failed.pop, 'broken.gif', None)
+        with mock.patch.object(default.backend, 'get_thumbnail',
+                               side_effect=OSError('битый файл')) as get:
+            with self.assertLogs('posts.thumbnails', 'ERROR'):
+                schedule_card_thumbnail('broken.gif')
+            schedule_card_thumbnail('broken.gif')
+            self.assertEqual(get.call_count, 1)
+            with self.settings(POSTS_THUMBNAIL_RETRY_AFTER=0):
+                with self.assertLogs('posts.thumbnails', 'ERROR'):
+                    schedule_card_thumbnail('other-broken.gif')
+                self.addCleanup(_failed.pop, 'other-broken.gif', None)
+                with self.assertLogs('posts.thumbnails', 'ERROR'):
+                    schedule_card_thumbnail('other-broken.gif')
+            self.assertEqual(get.call_count, 3)
+
+    def test_post_without_image(self):
+        """У поста без картинки миниатюры нет."""
+        post = Post.objects.create(text='Без картинки', author=self.author)
+        self.assertIsNone(card_thumbnail(post.image))
+
+    def test_batch_lookup(self):
+        """Миниатюры страницы читаются из хранилища одним вызовом."""
+        posts = [self.create_post(f'batch{num}.gif') for num in range(3)]
+        thumbnails = [
+            default.backend.thumbnail_file(post.image, CARD_GEOMETRY,
+                                           dict(CARD_OPTIONS))
+            for post in posts
+        ]
+        store = SQLiteKVStore()
+        found = store.get_many(thumbnails)
+        self.assertEqual(set(found),
+                         {thumbnail.key for thumbnail in thumbnails})
+
+    def test_prefetched_cards_skip_store(self):
+        """После пакетного чтения карточки не читают хранилище по одной."""
+        posts = list(Post.objects.filter(pk__in=[
+            self.create_post(f'page{num}.gif').pk for num in range(3)]))
+        prefetch_card_images(posts)
+        with mock.patch.object(default.kvstore, '_get_raw') as get_raw:
+            images = [card_image(post.image) for post in posts]
+        get_raw.assert_not_called()
+        for image in images:
+            self.assertTrue(
+                image.url.startswith(settings.MEDIA_URL + 'cache/'))
+
+
+@override_settings(THUMBNAIL_SQLITE_PATH=TEMP_KVSTORE_PATH)
+class SQLiteKVStoreTests(SimpleTestCase):
+    def setUp(self):
+        os.makedirs(TEMP_MEDIA_ROOT, exist_ok=True)
+        self.store = SQLiteKVStore()
+        self.store.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_raw_values_survive_lru_eviction(self):
+        """Вытесненное из LRU значение читается из файла."""
+        self.store.lru = LRUCache(1)
+        self.store._set_raw('sorl-thumbnail||image||a', 'first')
+        self.store._set_raw('sorl-thumbnail||image||b', 'second')
+        self.assertNotIn('sorl-thumbnail||image||a', self.store.lru.data)
+        self.assertEqual(self.store._get_raw('sorl-thumbnail||image||a'),
+                         'first')
+
+    def test_find_and_delete_keys(self):
+        """Поиск по префиксу и удаление ключей."""
+        self.store._set_raw('sorl-thumbnail||image||a', 'first')
+        self.store._set_raw('sorl-thumbnail||thumbnails||a', '[]')
+        self.assertEqual(self.store._find_keys_raw('sorl-thumbnail||image'),
+                         ['sorl-thumbnail||image||a'])
+        self.store._delete_raw('sorl-thumbnail||image||a')
+        self.assertIsNone(self.store._get_raw('sorl-thumbnail||image||a'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_ASYNC=False,
+                   THUMBNAIL_SQLITE_PATH=TEMP_KVSTORE_PATH,
+                   POSTS_IMAGE_WIDTHS=(320, 640))
+class ImageVariantsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, name, content):
+        image = SimpleUploadedFile(name, content, content_type='image/png')
+        return Post.objects.create(text='Пост с картинкой',
+                                   author=self.author,
+                                   image=image)
+
+    def png(self, width, height):
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_variants_created_on_save(self):
+        """Загрузка создаёт WebP всех ширин, не больше оригинала."""
+        post = self.create_post('wide.png', self.png(700, 300))
+        variants = get_variants(post.image.name)
+        self.assertEqual([width for width, name in variants['image/webp']],
+                         [320, 640])
+        for width, name in variants['image/webp']:
+            with default_storage.open(name) as file:
+                image = Image.open(file)
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.width, width)
+
+    def test_small_image_keeps_its_width(self):
+        """Картинка уже самой узкой ширины не растягивается."""
+        post = self.create_post('small.png', self.png(100, 50))
+        variants = get_variants(post.image.name)
+        self.assertEqual([width for width, name in variants['image/webp']],
+                         [100])
+
+    def test_same_basename_in_different_directories(self):
+        """Одноимённые файлы из разных каталогов не делят варианты."""
+        for directory in ('a', 'b'):
+            default_storage.save(f'posts/{directory}/same.png',
+                                 ContentFile(self.png(700, 300)))
+        first = render_variants('posts/a/same.png')['image/webp']
+        second = render_variants('posts/b/same.png')['image/webp']
+        self.assertFalse({name for _, name in first}
+                         & {name for _, name in second})
+
+    def test_formats_not_checked_per_width(self):
+        """Поддержка форматов не проверяется заново для каждой ширины."""
+        default_storage.save('posts/checked.png',
+                             ContentFile(self.png(700, 300)))
+        with mock.patch('posts.variants.features') as features:
+            render_variants('posts/checked.png')
+        self.assertEqual(features.mock_calls, [])
+
+    def test_card_image_srcset(self):
+        """Карточка получает источники srcset для каждого формата."""
+        post = self.create_post('card.png', self.png(700, 300))
+        image = card_image(post.image)
+        webp = [source for source in image.sources
+                if source['type'] == 'image/webp'][0]
+        self.assertIn('-320w.webp 320w', webp['srcset'])
+        self.assertIn('-640w.webp 640w', webp['srcset'])
+
+    def test_backfill_command(self):
+        """Команда создаёт варианты для уже загруженных файлов."""
+        with mock.patch('posts.signals.schedule_variants'):
+            post = self.create_post('old.png', self.png(700, 300))
+        self.assertEqual(get_variants(post.image.name), {})
+        call_command('build_image_variants', jobs=1, stdout=io.StringIO())
+        self.assertIn('image/webp', get_variants(post.image.name))
+
+    def test_backfill_skips_variants(self):
+        """Повторный запуск не делает варианты из самих вариантов."""
+        self.create_post('again.png', self.png(700, 300))
+        out = io.StringIO()
+        call_command('build_image_variants', jobs=1, force=True, stdout=out)
+        call_command('build_image_variants', jobs=1, force=True, stdout=out)
+        self.assertEqual(out.getvalue().count('Обработано картинок: 1,'), 2)
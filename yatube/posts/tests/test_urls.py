@@ -1,6 +1,7 @@
 from django.test import TestCase, Client
 from http import HTTPStatus
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
 from .test_models import Post, Group
 
@@ -38,6 +39,7 @@ class StaticURLTests(TestCase):
         )
 
     def setUp(self) -> None:
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.create_user(username='NoName')
         # Создаем второй клиент
@@ -1,10 +1,14 @@
 from django.test import TestCase, Client
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from django import forms
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 
 from ..models import Post, Group
+from ..paginators import NumberedPaginator
 
 User = get_user_model()
 POSTS_PER_PAGE = 11
@@ -14,9 +18,31 @@ PROFILE_URL = reverse('posts:profile', kwargs={'username': 'auth'})
 POST_CREATE_URL = reverse('posts:post_create')
 POST_DETAIL_URL = reverse('posts:post_detail', kwargs={'post_id': '1'})
 POST_EDIT_URL = reverse('posts:post_edit', kwargs={'post_id': '1'})
+# Предельное число SQL-запросов на страницу для анонимного пользователя.
+# Группа и профиль делают ещё один запрос для ETag, пост — два: его
+# кеш и валидаторы зависят от областей автора и группы.
+QUERY_BUDGETS = {
+    INDEX_URL: 1,
+    GROUP_LIST_URL: 3,
+    PROFILE_URL: 3,
+    POST_DETAIL_URL: 3,
+}
 
 
-class PostPaginatorTests(TestCase):
+class QueryBudgetMixin:
+    """Проверка, что страница укладывается в заданное число запросов."""
+
+    def assertQueryBudget(self, client, adress, budget):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(adress)
+        queries = '\n'.join(query['sql'] for query in context)
+        self.assertLessEqual(
+            len(context), budget,
+            f'{adress}: {len(context)} запросов вместо {budget}:\n{queries}')
+        return response
+
+
+class PostPaginatorTests(QueryBudgetMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -39,6 +65,7 @@ class PostPaginatorTests(TestCase):
         Post.objects.bulk_create(bulk_posts)
 
     def setUp(self) -> None:
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.create_user(username='NoName')
         self.authorized_client = Client()
@@ -54,6 +81,84 @@ class PostPaginatorTests(TestCase):
                 response_two = self.authorized_client.get(template + '?page=2')
                 self.assertEqual(len(response_two.context['page_obj']), 2)
 
+    def test_cursor_paginator(self):
+        """Курсорная пагинация проходит ленту вперёд и назад."""
+        templates = [INDEX_URL, GROUP_LIST_URL, PROFILE_URL]
+        for template in templates:
+            with self.subTest(template=template):
+                first_page = self.authorized_client.get(
+                    template).context['page_obj']
+                self.assertTrue(first_page.has_next())
+                self.assertFalse(first_page.has_previous())
+                second_page = self.authorized_client.get(
+                    template, {'after': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), 2)
+                self.assertFalse(second_page.has_next())
+                self.assertTrue(second_page.has_previous())
+                back_page = self.authorized_client.get(
+                    template, {'before': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back_page), list(first_page))
+
+    def test_cursor_paginator_skips_count(self):
+        """Курсорная страница не выполняет COUNT и OFFSET."""
+        with CaptureQueriesContext(connection) as context:
+            self.guest_client.get(INDEX_URL)
+        for query in context.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+                self.assertNotIn('OFFSET', query['sql'])
+
+    def test_pages_query_budget(self):
+        """Страницы не делают отдельных запросов для авторов и групп."""
+        for adress, budget in QUERY_BUDGETS.items():
+            with self.subTest(adress=adress):
+                self.assertQueryBudget(self.guest_client, adress, budget)
+
+    def test_cursor_paginator_bad_token(self):
+        """Испорченный токен курсора отдаёт первую страницу."""
+        response = self.guest_client.get(INDEX_URL, {'after': 'broken'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class ElidedPageRangeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text=f'Тестовая запись {num}', author=author)
+            for num in range(1000))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_elided_page_range(self):
+        """Номера вокруг текущей страницы и у краёв, между ними …"""
+        paginator = NumberedPaginator(range(1000), 10)
+        cases = {
+            1: [1, 2, 3, '…', 100],
+            50: [1, '…', 48, 49, 50, 51, 52, '…', 100],
+            100: [1, '…', 98, 99, 100],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    list(paginator.get_elided_page_range(number)), expected)
+        self.assertEqual(
+            list(NumberedPaginator(range(30), 10).get_elided_page_range(2)),
+            [1, 2, 3])
+
+    def test_page_links_bounded(self):
+        """Глубокая лента выводит ограниченное число ссылок на страницы."""
+        response = Client().get(INDEX_URL, {'page': 50})
+        self.assertEqual(response.context['page_obj'].elided_page_range,
+                         [1, '…', 48, 49, 50, 51, 52, '…', 100])
+        content = response.content.decode()
+        self.assertLess(content.count('class="page-link"'), 15)
+        self.assertIn('page=100', content)
+        self.assertNotIn('page=60"', content)
+
 
 class PageTests(TestCase):
     @classmethod
@@ -77,6 +182,7 @@ class PageTests(TestCase):
                                        group=cls.group)
 
     def setUp(self) -> None:
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.create_user(username='NoName')
         self.authorized_client = Client()
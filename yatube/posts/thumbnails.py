@@ -0,0 +1,217 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+# Размер и обрезка картинки в карточке поста.
+CARD_GEOMETRY = '960x339'
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+# Границы корзин гистограммы времени генерации, в секундах.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class AsyncThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, умеющий искать готовую миниатюру
+    без её генерации."""
+
+    def thumbnail_file(self, file_, geometry_string, options):
+        """Повторяет вычисление имени миниатюры из get_thumbnail."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def peek_thumbnail(self, file_, geometry_string, prefetched=None,
+                       **options):
+        """Возвращает миниатюру из KV-хранилища или None, не создавая её.
+
+        prefetched — словарь {ключ: миниатюра} из пакетного чтения:
+        если он есть, к хранилищу не обращаемся.
+        """
+        thumbnail = self.thumbnail_file(file_, geometry_string, options)
+        if prefetched is not None:
+            return prefetched.get(thumbnail.key)
+        return default.kvstore.get(thumbnail)
+
+
+class ThumbnailMetrics:
+    """Счётчики очереди генерации миниатюр в текущем процессе."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.generated = 0
+        self.failed = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    @property
+    def queue_depth(self):
+        return self.queued - self.generated - self.failed
+
+    def observe(self, latency, failed=False):
+        with self.lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.generated += 1
+            self.latency_sum += latency
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    break
+            else:
+                index = len(LATENCY_BUCKETS)
+            self.latency_buckets[index] += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                'queue_depth': self.queue_depth,
+                'queued': self.queued,
+                'generated': self.generated,
+                'failed': self.failed,
+                'latency_sum': self.latency_sum,
+                'latency_buckets': dict(zip(
+                    LATENCY_BUCKETS + (float('inf'),),
+                    self.latency_buckets)),
+            }
+
+
+metrics = ThumbnailMetrics()
+_executor = None
+_pending = set()
+# Картинки, миниатюру которых создать не удалось: имя → monotonic-время,
+# после которого можно попробовать снова.
+_failed = {}
+_pending_lock = threading.Lock()
+
+
+def write_metrics(writer):
+    """Выводит счётчики очереди миниатюр на /metrics."""
+    snapshot = metrics.snapshot()
+    writer.family('yatube_thumbnail_queue_depth', 'gauge',
+                  'Миниатюры в очереди на генерацию.')
+    writer.sample('yatube_thumbnail_queue_depth', {},
+                  snapshot['queue_depth'])
+    writer.family('yatube_thumbnails_total', 'counter',
+                  'Сгенерированные миниатюры по результату.')
+    for result in ('generated', 'failed'):
+        writer.sample('yatube_thumbnails_total', {'result': result},
+                      snapshot[result])
+    writer.family('yatube_thumbnail_seconds', 'histogram',
+                  'Время генерации миниатюры, секунды.')
+    writer.histogram('yatube_thumbnail_seconds', {},
+                     snapshot['latency_buckets'].items(),
+                     snapshot['latency_sum'])
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails')
+    return _executor
+
+
+def generate_card_thumbnail(image_name: str):
+    """Создаёт миниатюру карточки и учитывает время в метриках."""
+    started = time.monotonic()
+    failed = False
+    try:
+        default.backend.get_thumbnail(image_name, CARD_GEOMETRY,
+                                      **CARD_OPTIONS)
+    except Exception:
+        failed = True
+        logger.exception('Не удалось создать миниатюру %s', image_name)
+    finally:
+        metrics.observe(time.monotonic() - started, failed)
+        with _pending_lock:
+            _pending.discard(image_name)
+            if failed:
+                _failed[image_name] = (time.monotonic()
+                                       + settings.POSTS_THUMBNAIL_RETRY_AFTER)
+
+
+def _generate_in_worker(image_name: str):
+    try:
+        generate_card_thumbnail(image_name)
+    finally:
+        # Соединения с БД потока пула не должны жить дольше задачи.
+        connections.close_all()
+
+
+def schedule_card_thumbnail(image_name: str):
+    """Ставит генерацию миниатюры в фоновый пул, если её ещё нет в очереди.
+
+    Картинку, миниатюру которой создать не удалось, снова в очередь не
+    ставим POSTS_THUMBNAIL_RETRY_AFTER секунд: иначе каждый показ поста
+    повторял бы работу и запись в лог. С выключенной настройкой
+    POSTS_THUMBNAIL_ASYNC миниатюра создаётся сразу.
+    """
+    with _pending_lock:
+        if image_name in _pending:
+            return
+        if _failed.get(image_name, 0) > time.monotonic():
+            return
+        _failed.pop(image_name, None)
+        _pending.add(image_name)
+    with metrics.lock:
+        metrics.queued += 1
+    if settings.POSTS_THUMBNAIL_ASYNC:
+        get_executor().submit(_generate_in_worker, image_name)
+    else:
+        generate_card_thumbnail(image_name)
+
+
+def prefetch_card_thumbnails(posts):
+    """Загружает миниатюры всех карточек страницы одним обращением
+    к KV-хранилищу, если оно умеет пакетное чтение.
+
+    Найденное запоминается в картинке поста, и card_thumbnail
+    к хранилищу уже не ходит.
+    """
+    get_many = getattr(default.kvstore, 'get_many', None)
+    posts = [post for post in posts if post.image]
+    if get_many is None or not posts:
+        return
+    prefetched = get_many([
+        default.backend.thumbnail_file(post.image, CARD_GEOMETRY,
+                                       dict(CARD_OPTIONS))
+        for post in posts])
+    for post in posts:
+        post.image.prefetched_thumbnails = prefetched
+
+
+def card_thumbnail(image):
+    """Возвращает миниатюру карточки, а пока её нет — сам оригинал.
+
+    Отсутствующая миниатюра ставится в очередь и не задерживает ответ.
+    """
+    if not image:
+        return None
+    thumbnail = default.backend.peek_thumbnail(
+        image, CARD_GEOMETRY,
+        prefetched=getattr(image, 'prefetched_thumbnails', None),
+        **CARD_OPTIONS)
+    if thumbnail is not None:
+        return thumbnail
+    schedule_card_thumbnail(image.name)
+    return image
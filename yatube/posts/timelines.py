@@ -0,0 +1,186 @@
+import struct
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import Q
+
+from core.sqlite import serialized_write
+
+from .models import AuthorStats, Follow, GroupFollow, Post, Timeline
+from .paginators import POSTS_PER_PAGE, CursorPage, decode_cursor
+
+# Запись ленты: время публикации в микросекундах и id поста.
+ENTRY = struct.Struct('>qq')
+
+
+def timestamp(pub_date: datetime) -> int:
+    return int(pub_date.timestamp() * 1_000_000)
+
+
+def from_timestamp(value: int) -> datetime:
+    return datetime.fromtimestamp(value / 1_000_000, tz=timezone.utc)
+
+
+def cursor_key(token):
+    """Переводит токен курсора в ключ записи ленты."""
+    cursor = decode_cursor(token) if token else None
+    if cursor is None:
+        return None
+    pub_date, pk = cursor
+    return timestamp(pub_date), pk
+
+
+def pack(keys) -> bytes:
+    return b''.join(ENTRY.pack(*key) for key in keys)
+
+
+def unpack(data) -> list:
+    return list(ENTRY.iter_unpack(bytes(data)))
+
+
+def is_popular(follower_count) -> bool:
+    """Посты автора с таким числом подписчиков читаются при показе
+    ленты, а не раскладываются по лентам."""
+    return follower_count > settings.POSTS_FANOUT_MAX_FOLLOWERS
+
+
+def popular_authors(user):
+    """Авторы из подписок, чьи посты читаются при показе ленты."""
+    limit = settings.POSTS_FANOUT_MAX_FOLLOWERS
+    return Follow.objects.filter(
+        user=user, author__stats__follower_count__gt=limit,
+    ).values('author_id')
+
+
+def timeline_keys(posts, limit):
+    return [(timestamp(pub_date), pk) for pub_date, pk in posts.order_by(
+        '-pub_date', '-pk').values_list('pub_date', 'pk')[:limit]]
+
+
+def build_timeline(user) -> list:
+    """Собирает ленту пользователя заново по его подпискам.
+
+    Посты популярных авторов в неё не попадают: они добавляются при
+    чтении.
+    """
+    authors = Follow.objects.filter(user=user).exclude(
+        author_id__in=popular_authors(user)).values('author_id')
+    groups = GroupFollow.objects.filter(user=user).values('group_id')
+    posts = Post.objects.filter(Q(author_id__in=authors)
+                                | Q(group_id__in=groups))
+    keys = timeline_keys(posts, settings.POSTS_TIMELINE_LENGTH)
+    # Лента собирается при показе страницы, а пишется, как и прочие
+    # записи из view, через писателя SQLite.
+    serialized_write(Timeline.objects.update_or_create)(
+        user=user, defaults={'entries': pack(keys)})
+    return keys
+
+
+def reset_timeline(user_id):
+    """Сбрасывает ленту: она соберётся заново при следующем показе."""
+    Timeline.objects.filter(user_id=user_id).delete()
+
+
+def follower_count_changed(author_id, old_count, new_count):
+    """Сбрасывает ленты подписчиков автора, ставшего популярным или
+    переставшего им быть.
+
+    Посты, опубликованные, пока автор был популярным, не разложены по
+    лентам, и без сброса пропали бы из них; соберутся ленты заново при
+    следующем показе.
+    """
+    if is_popular(old_count) == is_popular(new_count):
+        return
+    Timeline.objects.filter(user_id__in=Follow.objects.filter(
+        author_id=author_id).values('user_id')).delete()
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в готовые ленты подписчиков.
+
+    Подписчиков популярного автора пропускаем: их ленты получат пост
+    при чтении. Ленты, которых ещё нет, соберутся при первом показе
+    и пост не потеряют.
+    """
+    followers = set(GroupFollow.objects.filter(
+        group_id=post.group_id).values_list('user_id', flat=True)
+        if post.group_id else ())
+    # Решение берётся из того же счётчика, что и в popular_authors:
+    # иначе пост мог бы не попасть ни в ленту, ни в чтение при показе.
+    follower_count = AuthorStats.objects.filter(
+        author_id=post.author_id).values_list(
+        'follower_count', flat=True).first() or 0
+    if not is_popular(follower_count):
+        followers.update(Follow.objects.filter(
+            author_id=post.author_id).values_list('user_id', flat=True))
+    if not followers:
+        return
+    add_to_timelines(followers, (timestamp(post.pub_date), post.pk))
+
+
+@serialized_write
+def add_to_timelines(user_ids, key):
+    """Вставляет ключ поста в готовые ленты пользователей.
+
+    Чтение и запись лент идут в одной транзакции писателя SQLite:
+    select_for_update в SQLite ничего не блокирует, и без общей
+    транзакции параллельная раскладка другого поста между чтением
+    и записью потерялась бы. Внутри транзакции сохранения поста
+    блокировка записи уже взята, а вне её конфликт с другим процессом
+    при SQLITE_TUNING кончается повтором всей раскладки.
+    """
+    timelines = list(Timeline.objects.select_for_update().filter(
+        user_id__in=user_ids))
+    for timeline in timelines:
+        keys = unpack(timeline.entries)
+        if key in keys:
+            continue
+        keys.append(key)
+        keys.sort(reverse=True)
+        timeline.entries = pack(keys[:settings.POSTS_TIMELINE_LENGTH])
+    Timeline.objects.bulk_update(timelines, ['entries'])
+
+
+def page_keys(keys, after, before, per_page):
+    """Выбирает ключи страницы из списка, упорядоченного по убыванию."""
+    if before is not None:
+        newer = [key for key in keys if key > before]
+        return newer[-per_page:], True, len(newer) > per_page
+    if after is not None:
+        older = [key for key in keys if key < after]
+        return older[:per_page], len(older) > per_page, True
+    return keys[:per_page], len(keys) > per_page, False
+
+
+def timeline_page(user, after=None, before=None,
+                  per_page=POSTS_PER_PAGE) -> CursorPage:
+    """Возвращает страницу ленты подписок по токенам курсора.
+
+    Число запросов не зависит от числа подписок: готовая лента, посты
+    популярных авторов и сами посты страницы читаются по одному разу.
+    """
+    after = cursor_key(after)
+    before = cursor_key(before)
+    timeline = Timeline.objects.filter(user=user).first()
+    if timeline is None:
+        keys = build_timeline(user)
+    else:
+        keys = unpack(timeline.entries)
+    popular = Post.objects.filter(author_id__in=popular_authors(user))
+    if before is not None:
+        popular = popular.filter(pub_date__gte=from_timestamp(before[0]))
+        extra = [(timestamp(pub_date), pk) for pub_date, pk in
+                 popular.order_by('pub_date', 'pk').values_list(
+                     'pub_date', 'pk')[:per_page + 1]]
+    else:
+        if after is not None:
+            popular = popular.filter(
+                pub_date__lte=from_timestamp(after[0]))
+        extra = timeline_keys(popular, per_page + 1)
+    keys = sorted(set(keys) | set(extra), reverse=True)
+    keys, has_next, has_previous = page_keys(keys, after, before, per_page)
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for _, pk in keys])
+    # Удалённые посты просто пропускаем: лента не чистится при удалении.
+    return CursorPage([posts[pk] for _, pk in keys if pk in posts],
+                      None, has_next, has_previous)
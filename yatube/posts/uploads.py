@@ -0,0 +1,226 @@
+import shutil
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import (FileUploadHandler,
+                                             TemporaryFileUploadHandler)
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+# Форматы, которые принимает форма поста; подсказка поля их перечисляет.
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Параметры сохранения при перекодировании картинки без метаданных.
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'WEBP': {'quality': 90},
+}
+ORIENTATION = 0x0112
+# Сегменты JPEG, нужные для правильного цвета: JFIF, ICC-профиль, Adobe.
+KEEP_JPEG_MARKERS = (0xE0, 0xE2, 0xEE)
+# Маркеры JPEG без длины и данных: TEM и RST0–RST7.
+STANDALONE_JPEG_MARKERS = (0x01, *range(0xD0, 0xD8))
+
+
+class BoundedUploadedFile(TemporaryUploadedFile):
+    """Загруженный файл, который закрывает вместе с собой свои копии.
+
+    Django закрывает файлы запроса в конце ответа. Очищенная от EXIF
+    копия в request.FILES не попадает, а хранилище переносит её файл
+    в MEDIA_ROOT, поэтому закрыть её надо до того, как это попытается
+    сделать сборщик мусора.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.too_large = False
+        self.derived = []
+
+    def close(self):
+        for file in self.derived:
+            file.close()
+        return super().close()
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загружаемые файлы сразу во временный файл на диске.
+
+    Файл больше POSTS_IMAGE_MAX_BYTES помечается как слишком большой
+    и опустошается, остаток его данных отбрасывается. Тело запроса
+    дочитывается, чтобы разобрать остальные поля, и форма сообщает
+    об ошибке размера, не открывая файл.
+    """
+
+    def new_file(self, *args, **kwargs):
+        FileUploadHandler.new_file(self, *args, **kwargs)
+        self.file = BoundedUploadedFile(self.file_name, self.content_type,
+                                        0, self.charset,
+                                        self.content_type_extra)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.file.too_large:
+            return
+        if self.received > settings.POSTS_IMAGE_MAX_BYTES:
+            self.file.too_large = True
+            self.file.seek(0)
+            self.file.truncate()
+            return
+        self.file.write(raw_data)
+
+
+def read_marker(source) -> int:
+    """Читает код следующего маркера JPEG.
+
+    Перед кодом может стоять сколько угодно заполнителей 0xFF.
+    """
+    if source.read(1) != b'\xff':
+        raise ValueError('Повреждённый JPEG')
+    code = 0xFF
+    while code == 0xFF:
+        byte = source.read(1)
+        if not byte:
+            raise ValueError('Повреждённый JPEG')
+        code = byte[0]
+    return code
+
+
+def read_segment(source):
+    """Читает длину и данные сегмента JPEG после его маркера."""
+    length = source.read(2)
+    size = int.from_bytes(length, 'big') - 2
+    payload = source.read(size)
+    if len(length) < 2 or size < 0 or len(payload) < size:
+        raise ValueError('Повреждённый JPEG')
+    return length, payload
+
+
+def copy_jpeg_without_metadata(source, target, orientation):
+    """Копирует JPEG по сегментам, выбрасывая EXIF, XMP и комментарии.
+
+    Пиксели не декодируются. Из EXIF сохраняется только ориентация,
+    чтобы фотография не перевернулась.
+    """
+    target.write(source.read(2))
+    while True:
+        code = read_marker(source)
+        marker = bytes((0xFF, code))
+        if code in (0xDA, 0xD9):
+            # Дальше сжатые данные или конец файла: копируем как есть.
+            target.write(marker)
+            shutil.copyfileobj(source, target)
+            return
+        if code in STANDALONE_JPEG_MARKERS:
+            target.write(marker)
+            continue
+        length, payload = read_segment(source)
+        if code == 0xFE:
+            continue
+        if code in KEEP_JPEG_MARKERS or not 0xE0 <= code <= 0xEF:
+            target.write(marker + length + payload)
+        elif payload.startswith(b'Exif\x00\x00') and orientation != 1:
+            exif = Image.Exif()
+            exif[ORIENTATION] = orientation
+            data = exif.tobytes()
+            target.write(b'\xff\xe1' + (len(data) + 2).to_bytes(2, 'big')
+                         + data)
+
+
+def strip_metadata(upload, image):
+    """Возвращает копию загруженного файла без EXIF и прочих метаданных.
+
+    JPEG очищается без декодирования. Другие форматы с EXIF
+    перекодируются с поворотом по ориентации, анимации и картинки
+    без EXIF возвращаются как есть.
+    """
+    exif = image.getexif()
+    if image.format != 'JPEG' and (
+            not exif or getattr(image, 'n_frames', 1) > 1):
+        return upload
+    cleaned = TemporaryUploadedFile(upload.name, upload.content_type,
+                                    0, None)
+    if isinstance(upload, BoundedUploadedFile):
+        upload.derived.append(cleaned)
+    if image.format == 'JPEG':
+        upload.seek(0)
+        copy_jpeg_without_metadata(upload, cleaned,
+                                   exif.get(ORIENTATION, 1))
+    else:
+        image_format = image.format
+        image = ImageOps.exif_transpose(image)
+        image.save(cleaned, image_format, exif=b'',
+                   **SAVE_OPTIONS.get(image_format, {}))
+    cleaned.size = cleaned.tell()
+    cleaned.seek(0)
+    cleaned.image = image
+    return cleaned
+
+
+class BoundedImageField(forms.ImageField):
+    """Поле картинки с ограничением размера файла и числа пикселей.
+
+    Ограничения проверяются по размеру загрузки и заголовку картинки,
+    до полного декодирования. Загруженный файл очищается от EXIF.
+    """
+
+    default_error_messages = {
+        'too_large': 'Файл больше %(limit)s.',
+        'too_many_pixels': 'Картинка больше %(width)s×%(height)s пикселей.',
+        'unsupported_format': 'Поддерживаются только JPEG, PNG, GIF '
+                              'и WebP.',
+    }
+
+    def open_image(self, upload):
+        """Открывает картинку, проверив её размеры до декодирования."""
+        if hasattr(upload, 'temporary_file_path'):
+            source = upload.temporary_file_path()
+        else:
+            source = upload
+        max_width, max_height = settings.POSTS_IMAGE_MAX_DIMENSIONS
+        try:
+            # open читает только заголовок, пиксели пока не декодируются.
+            image = Image.open(source)
+            too_big = image.width > max_width or image.height > max_height
+            if not too_big:
+                image.verify()
+                image = Image.open(source)
+        except Exception as error:
+            raise ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image') from error
+        if image.format not in ALLOWED_FORMATS:
+            image.close()
+            raise ValidationError(
+                self.error_messages['unsupported_format'],
+                code='unsupported_format')
+        if too_big:
+            raise ValidationError(
+                self.error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={'width': max_width, 'height': max_height})
+        return image
+
+    def to_python(self, data):
+        upload = forms.FileField.to_python(self, data)
+        if upload is None:
+            return None
+        if (getattr(upload, 'too_large', False)
+                or upload.size > settings.POSTS_IMAGE_MAX_BYTES):
+            raise ValidationError(
+                self.error_messages['too_large'], code='too_large',
+                params={'limit': filesizeformat(
+                    settings.POSTS_IMAGE_MAX_BYTES)})
+        image = self.open_image(upload)
+        upload.image = image
+        upload.content_type = Image.MIME.get(image.format)
+        if hasattr(upload, 'seek') and callable(upload.seek):
+            upload.seek(0)
+        try:
+            return strip_metadata(upload, image)
+        except Exception as error:
+            image.close()
+            raise ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image') from error
@@ -0,0 +1,173 @@
+import io
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .thumbnails import card_thumbnail, get_executor, prefetch_card_thumbnails
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'posts/variants'
+# Пропорции карточки поста, как у миниатюры 960x339.
+CARD_RATIO = 960 / 339
+# Форматы в порядке предпочтения: браузер берёт первый поддержанный.
+FORMATS = (
+    ('avif', 'AVIF', 'image/avif', {'quality': 60}),
+    ('webp', 'WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+)
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def format_supported(extension: str, pil_format: str) -> bool:
+    """Умеет ли установленный Pillow сохранять формат.
+
+    features.check спрашиваем только о модулях, известных этой версии
+    Pillow: о незнакомых он каждый раз предупреждает. Формат из
+    стороннего плагина виден по списку форматов сохранения.
+    """
+    if extension in features.modules:
+        return features.check_module(extension)
+    Image.init()
+    return pil_format in Image.SAVE
+
+
+# Считается один раз при импорте: набор модулей Pillow не меняется.
+SUPPORTED_FORMATS = tuple(
+    (extension, pil_format, mime, options)
+    for extension, pil_format, mime, options in FORMATS
+    if format_supported(extension, pil_format))
+
+
+def variant_name(image_name: str, width: int, extension: str) -> str:
+    # Путь картинки целиком: у posts/a/x.jpg и posts/b/x.jpg свои варианты.
+    stem = os.path.splitext(image_name)[0]
+    return f'{VARIANTS_DIR}/{stem}-{width}w.{extension}'
+
+
+def crop_to_card(image):
+    """Обрезает картинку по центру до пропорций карточки."""
+    width, height = image.size
+    if width / height > CARD_RATIO:
+        new_width = round(height * CARD_RATIO)
+        left = (width - new_width) // 2
+        return image.crop((left, 0, left + new_width, height))
+    new_height = round(width / CARD_RATIO)
+    top = (height - new_height) // 2
+    return image.crop((0, top, width, top + new_height))
+
+
+def render_variants(image_name: str, storage=default_storage):
+    """Создаёт файлы всех ширин и форматов и возвращает их список.
+
+    Не трогает KV-хранилище, поэтому безопасна в отдельных процессах.
+    """
+    with storage.open(image_name) as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info
+                                  else 'RGB')
+        image = crop_to_card(image)
+    # Ширины больше оригинала не нужны; картинка уже самой узкой ширины
+    # остаётся в своём размере, а не растягивается.
+    widths = [width for width in settings.POSTS_IMAGE_WIDTHS
+              if width <= image.width] or [image.width]
+    variants = {}
+    for width in widths:
+        height = max(1, round(width / CARD_RATIO))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for extension, pil_format, mime, options in SUPPORTED_FORMATS:
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = variant_name(image_name, width, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+            variants.setdefault(mime, []).append((width, name))
+    return variants
+
+
+def save_variants(image_name: str, variants):
+    """Запоминает варианты картинки в KV-хранилище миниатюр."""
+    default.kvstore._set(ImageFile(image_name).key, variants,
+                         identity='variants')
+
+
+def get_variants(image_name: str, prefetched=None):
+    key = ImageFile(image_name).key
+    if prefetched is not None:
+        return prefetched.get(key) or {}
+    return default.kvstore._get(key, identity='variants') or {}
+
+
+def build_variants(image_name: str):
+    try:
+        save_variants(image_name, render_variants(image_name))
+    except Exception:
+        logger.exception('Не удалось создать варианты %s', image_name)
+    finally:
+        with _pending_lock:
+            _pending.discard(image_name)
+
+
+def schedule_variants(image_name: str):
+    """Ставит создание вариантов картинки в фоновый пул миниатюр."""
+    with _pending_lock:
+        if image_name in _pending:
+            return
+        _pending.add(image_name)
+    if settings.POSTS_THUMBNAIL_ASYNC:
+        get_executor().submit(build_variants, image_name)
+    else:
+        build_variants(image_name)
+
+
+class CardImage:
+    """Картинка карточки: адрес запасного <img> и источники srcset."""
+
+    sizes = SIZES
+
+    def __init__(self, fallback, variants):
+        self.url = fallback.url
+        self.sources = [
+            {'type': mime,
+             'srcset': ', '.join(f'{default_storage.url(name)} {width}w'
+                                 for width, name in widths)}
+            for mime, widths in variants.items()
+        ]
+
+    @property
+    def version(self):
+        """Меняется, когда готовы миниатюра или варианты."""
+        return f'{self.url}:{len(self.sources)}'
+
+
+def prefetch_card_images(posts):
+    """Пакетно загружает миниатюры и варианты картинок страницы."""
+    posts = [post for post in posts if post.image]
+    prefetch_card_thumbnails(posts)
+    get_many = getattr(default.kvstore, 'get_many', None)
+    if get_many is not None and posts:
+        prefetched = get_many([ImageFile(post.image.name) for post in posts],
+                              identity='variants')
+        for post in posts:
+            post.image.prefetched_variants = prefetched
+
+
+def card_image(image):
+    """Возвращает CardImage для картинки поста или None."""
+    fallback = card_thumbnail(image)
+    if fallback is None:
+        return None
+    return CardImage(fallback, get_variants(
+        image.name, getattr(image, 'prefetched_variants', None)))
@@ -1,63 +1,203 @@
 from django.shortcuts import render, get_object_or_404
 from django.http import HttpResponse, HttpRequest
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db.models import Count, Max
 from django.shortcuts import redirect
+from django.utils.http import urlencode
 
+from core.replicas import replica_reads
+from core.sqlite import serialized_write
+
+from .cache import cache_anonymous_page, conditional_page, edge_cache
 from .forms import PostForm
-from .models import Post, Group, User
+from .models import (Follow, GroupFollow, Post, Group, User,
+                     get_post_count)
+from .paginators import POSTS_PER_PAGE, CursorPaginator, NumberedPaginator
+from .purge import tag_response
+from .search import search_posts
+from .timelines import timeline_page
+from .variants import prefetch_card_images
+
+
+def numbered_page(paginator, page_number):
+    """ Функция выбирает страницу по номеру.
+
+    Вместо всех номеров страниц шаблон получает сокращённый список
+    elided_page_range: его длина не растёт с глубиной ленты."""
+    page_obj = paginator.get_page(page_number)
+    page_obj.elided_page_range = list(
+        paginator.get_elided_page_range(page_obj.number))
+    return page_obj
 
 
 def paginator(request: HttpRequest, posts):
-    paginator = Paginator(posts, 10)
+    """ Функция разбивает ленту на страницы.
+
+    По умолчанию страницы выбираются по курсору ?after=/?before= без
+    COUNT и OFFSET; старые ссылки вида ?page=N продолжают работать."""
+    paginator = CursorPaginator(posts, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return(page_obj)
+    if page_number is not None:
+        page_obj = numbered_page(paginator, page_number)
+    else:
+        page_obj = paginator.cursor_page(after=request.GET.get('after'),
+                                         before=request.GET.get('before'))
+    prefetch_card_images(page_obj)
+    return page_obj
 
 
+@replica_reads
+@edge_cache('feed')
+@cache_anonymous_page(lambda: ['index'])
 def index(request: HttpRequest) -> HttpResponse:
     """ Функция выводит на главную страницу десять последних постов."""
     template = 'posts/index.html'
-    post_list = Post.objects.all()
+    post_list = Post.objects.select_related('author', 'group')
     page_obj = paginator(request, post_list)
     context = {'page_obj': page_obj, }
-    return render(request, template, context)
+    return tag_response(render(request, template, context), page_obj,
+                        'index')
+
+
+def group_scopes(slug: str):
+    return [f'group:{slug}']
+
+
+def profile_scopes(username: str):
+    return [f'profile:{username}']
+
 
+def group_state(slug: str):
+    """Состояние ленты группы для валидаторов или None, если группы нет:
+    несуществующая страница не должна отвечать 304 на If-None-Match: *.
 
+    Имена авторов меняют ленту через отметку в AuthorStats.
+    """
+    return Group.objects.filter(slug=slug).annotate(
+        last_post=Max('posts__updated_at'), posts_count=Count('posts'),
+        last_author=Max('posts__author__stats__updated_at'),
+    ).values_list('updated_at', 'last_post', 'posts_count',
+                  'last_author').first()
+
+
+def profile_state(username: str):
+    """Состояние профиля: посты автора, его имя, счётчик и группы."""
+    return User.objects.filter(username=username).annotate(
+        last_post=Max('posts__updated_at'), posts_count=Count('posts'),
+        last_group=Max('posts__group__updated_at'),
+    ).values_list('first_name', 'last_name', 'stats__updated_at',
+                  'stats__post_count', 'last_post', 'posts_count',
+                  'last_group').first()
+
+
+def post_detail_state(post_id: int):
+    """Состояние страницы поста: сам пост, автор со счётчиком постов
+    и группа."""
+    return Post.objects.filter(pk=post_id).values_list(
+        'updated_at', 'author__username', 'author__first_name',
+        'author__last_name', 'author__stats__post_count',
+        'group__updated_at').first()
+
+
+def post_detail_scopes(post_id: int):
+    """Области страницы поста: сам пост, а также автор со счётчиком
+    постов и группа, которые на ней показаны."""
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug').first()
+    if row is None:
+        return None
+    username, slug = row
+    scopes = [f'post:{post_id}', f'profile:{username}']
+    if slug is not None:
+        scopes.append(f'group:{slug}')
+    return scopes
+
+
+@replica_reads
+@edge_cache('feed')
+@cache_anonymous_page(group_scopes)
+@conditional_page(group_state)
 def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
     """ Функция group_posts передаёт в шаблон posts/group_list.html десять
     последних объектов модели Post, принадлежащих соответствующей группе."""
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.select_related('author')
     page_obj = paginator(request, posts)
+    following = (request.user.is_authenticated
+                 and GroupFollow.objects.filter(user=request.user,
+                                                group=group).exists())
     context = {'group': group,
+               'following': following,
                'page_obj': page_obj, }
-    return render(request, template, context)
+    return tag_response(render(request, template, context), page_obj,
+                        f'group-{group.pk}')
 
 
+@replica_reads
+@edge_cache('feed')
+@cache_anonymous_page(profile_scopes)
+@conditional_page(profile_state)
 def profile(request: HttpRequest, username: str) -> HttpResponse:
     """ Функция для отображения профиля пользователя."""
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    author_post = author.posts.filter(author=author)
-    posts = Post.objects.filter(author=author)
-    post_count = posts.count()
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    author_post = author.posts.select_related('group')
+    post_count = get_post_count(author)
     page_obj = paginator(request, author_post)
+    following = (request.user.is_authenticated
+                 and Follow.objects.filter(user=request.user,
+                                           author=author).exists())
     context = {'post_count': post_count,
                'author': author,
+               'following': following,
                'page_obj': page_obj, }
-    return render(request, template, context)
+    return tag_response(render(request, template, context), page_obj,
+                        f'author-{author.pk}')
 
 
+@replica_reads
+@edge_cache('post')
+@cache_anonymous_page(post_detail_scopes)
+@conditional_page(post_detail_state)
 def post_detail(request: HttpRequest, post_id: int) -> HttpResponse:
     """ Функция выводит детальную информацию о посте."""
     template = 'posts/post_detail.html'
-    post_page = Post.objects.get(pk=post_id)
-    post_count = Post.objects.filter(author=post_page.author).count()
+    post_page = Post.objects.select_related(
+        'author__stats', 'group').get(pk=post_id)
+    post_count = get_post_count(post_page.author)
     context = {'post_page': post_page,
                'post_count': post_count, }
-    return render(request, template, context)
+    return tag_response(render(request, template, context), [post_page])
+
+
+@replica_reads
+@edge_cache('search')
+@cache_anonymous_page(lambda: ['index'])
+def search(request: HttpRequest) -> HttpResponse:
+    """ Функция ищет посты по тексту, лучшие совпадения первыми."""
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    filters = {'q': query}
+    group = author = None
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+        filters['group'] = group.slug
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+        filters['author'] = author.username
+    posts = search_posts(query, group, author)
+    page_obj = numbered_page(NumberedPaginator(posts, POSTS_PER_PAGE),
+                             request.GET.get('page'))
+    prefetch_card_images(page_obj)
+    context = {'page_obj': page_obj,
+               'query': query,
+               'group': group,
+               'author': author,
+               'query_prefix': urlencode(filters) + '&', }
+    return tag_response(render(request, template, context), page_obj,
+                        'search')
 
 
 @login_required
@@ -74,7 +214,7 @@ def post_create(request: HttpRequest) -> HttpResponse:
         if form.is_valid():
             form.cleaned_data['text']
             form.cleaned_data['group']
-            form.save()
+            serialized_write(form.save)()
             return redirect('posts:profile', request.user)
         return render(request, template, {'form': form})
     return render(request, template, context)
@@ -91,10 +231,62 @@ def post_edit(request: HttpRequest, post_id: int) -> HttpResponse:
                     files=request.FILES or None,
                     instance=post)
     if form.is_valid():
-        form.save()
+        serialized_write(form.save)()
         return redirect('posts:post_detail', post_id=post_id)
     context = {'form': form,
                'is_edit': is_edit,
                'post_id': post_id,
                'post': post, }
     return render(request, 'posts/post_create.html', context)
+
+
+@login_required
+def follow_index(request: HttpRequest) -> HttpResponse:
+    """ Функция выводит ленту постов авторов и групп из подписок."""
+    template = 'posts/follow.html'
+    page_obj = timeline_page(request.user,
+                             after=request.GET.get('after'),
+                             before=request.GET.get('before'))
+    prefetch_card_images(page_obj)
+    context = {'page_obj': page_obj, }
+    return render(request, template, context)
+
+
+@login_required
+def profile_follow(request: HttpRequest, username: str) -> HttpResponse:
+    """ Функция подписывает пользователя на автора."""
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        serialized_write(Follow.objects.get_or_create)(user=request.user,
+                                                       author=author)
+    return redirect('posts:profile', username=username)
+
+
+@login_required
+def profile_unfollow(request: HttpRequest, username: str) -> HttpResponse:
+    """ Функция отписывает пользователя от автора."""
+    author = get_object_or_404(User, username=username)
+    follow = Follow.objects.filter(user=request.user, author=author).first()
+    if follow is not None:
+        serialized_write(follow.delete)()
+    return redirect('posts:profile', username=username)
+
+
+@login_required
+def group_follow(request: HttpRequest, slug: str) -> HttpResponse:
+    """ Функция подписывает пользователя на группу."""
+    group = get_object_or_404(Group, slug=slug)
+    serialized_write(GroupFollow.objects.get_or_create)(user=request.user,
+                                                        group=group)
+    return redirect('posts:group_list', slug=slug)
+
+
+@login_required
+def group_unfollow(request: HttpRequest, slug: str) -> HttpResponse:
+    """ Функция отписывает пользователя от группы."""
+    group = get_object_or_404(Group, slug=slug)
+    follow = GroupFollow.objects.filter(user=request.user,
+                                        group=group).first()
+    if follow is not None:
+        serialized_write(follow.delete)()
+    return redirect('posts:group_list', slug=slug)
@@ -0,0 +1,150 @@
+// Бесконечная лента: следующие посты подгружаются из JSON API, когда
+// посетитель докрутил до навигации, без перезагрузки страницы.
+// Без IntersectionObserver и fetch остаются обычные ссылки навигации.
+(function () {
+  'use strict';
+
+  // Формат даты как у фильтра date:'d E Y' в карточке поста.
+  var MONTHS = ['января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
+                'июля', 'августа', 'сентября', 'октября', 'ноября',
+                'декабря'];
+
+  function formatDate(value) {
+    // Сервер показывает даты в TIME_ZONE = 'UTC'.
+    var date = new Date(value);
+    var day = String(date.getUTCDate()).padStart(2, '0');
+    return day + ' ' + MONTHS[date.getUTCMonth()] + ' ' +
+      date.getUTCFullYear();
+  }
+
+  function element(tag, attributes, children) {
+    var node = document.createElement(tag);
+    Object.keys(attributes || {}).forEach(function (name) {
+      node.setAttribute(name, attributes[name]);
+    });
+    (children || []).forEach(function (child) {
+      node.append(child);
+    });
+    return node;
+  }
+
+  function textWithBreaks(text) {
+    var paragraph = element('p');
+    text.split('\n').forEach(function (line, index) {
+      if (index) {
+        paragraph.append(element('br'));
+      }
+      paragraph.append(line);
+    });
+    return paragraph;
+  }
+
+  function picture(image) {
+    var sources = image.sources.map(function (source) {
+      return element('source', {type: source.type, srcset: source.srcset,
+                                sizes: image.sizes});
+    });
+    sources.push(element('img', {'class': 'card-img my-2', src: image.url}));
+    return element('picture', {}, sources);
+  }
+
+  function card(post, feed) {
+    var items = [];
+    if (feed.showAuthor) {
+      items.push(element('li', {}, [
+        'Автор: ' + post.author_name + ' ',
+        element('a', {href: feed.profileUrl.replace(
+          '__author__', encodeURIComponent(post.author))},
+        ['все посты пользователя'])
+      ]));
+    }
+    items.push(element('li', {}, [
+      'Дата публикации: ' + formatDate(post.pub_date)]));
+    var children = [element('ul', {}, items)];
+    if (post.image) {
+      children.push(picture(post.image));
+    }
+    children.push(textWithBreaks(post.text));
+    children.push(element('p', {}, [
+      element('a', {href: post.url}, ['подробная информация'])]));
+    if (feed.showGroup && post.group) {
+      children.push(element('a', {href: feed.groupUrl.replace(
+        '__group__', post.group)}, ['все записи группы']));
+    }
+    return element('article', {}, children);
+  }
+
+  function start(container) {
+    var next = document.querySelector('[data-next-cursor]');
+    if (!next || !window.fetch || !('IntersectionObserver' in window)) {
+      return;
+    }
+    var feed = {
+      api: container.dataset.feed,
+      showAuthor: 'showAuthor' in container.dataset,
+      showGroup: 'showGroup' in container.dataset,
+      profileUrl: container.dataset.profileUrl,
+      groupUrl: container.dataset.groupUrl
+    };
+    var fields = ['id', 'text', 'pub_date', 'image', 'url'];
+    if (feed.showAuthor) {
+      fields.push('author', 'author_name');
+    }
+    if (feed.showGroup) {
+      fields.push('group');
+    }
+    var cursor = next.dataset.nextCursor;
+    var loading = false;
+    var observer = new IntersectionObserver(function (entries) {
+      if (loading || !entries.some(function (entry) {
+        return entry.isIntersecting;
+      })) {
+        return;
+      }
+      loading = true;
+      var url = feed.api + '?fields=' + fields.join(',') + '&after=' +
+        encodeURIComponent(cursor);
+      fetch(url, {headers: {Accept: 'application/json'}})
+        .then(function (response) {
+          if (!response.ok) {
+            throw new Error(response.status);
+          }
+          return response.json();
+        })
+        .then(function (page) {
+          page.results.forEach(function (post) {
+            if (container.querySelector('article')) {
+              container.append(element('hr'));
+            }
+            container.append(card(post, feed));
+          });
+          cursor = page.next;
+          if (cursor) {
+            next.href = '?after=' + encodeURIComponent(cursor);
+            // Если навигация всё ещё на экране, новое наблюдение сразу
+            // запросит следующую страницу.
+            observer.unobserve(next);
+            observer.observe(next);
+          } else {
+            observer.disconnect();
+            next.closest('li').remove();
+          }
+        })
+        .catch(function () {
+          // Осталась обычная ссылка на следующую страницу.
+          observer.disconnect();
+        })
+        .finally(function () {
+          loading = false;
+        });
+    }, {rootMargin: '600px 0px'});
+    observer.observe(next);
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    var container = document.querySelector('[data-feed]');
+    if (container) {
+      start(container);
+    }
+  });
+}());
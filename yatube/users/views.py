@@ -1,6 +1,9 @@
+from django.http import HttpResponseRedirect
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
 
+from core.sqlite import serialized_write
+
 from .forms import CreationForm
 
 
@@ -9,3 +12,7 @@ class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy('posts:index')
     template_name = 'users/signup.html'
+
+    def form_valid(self, form):
+        self.object = serialized_write(form.save)()
+        return HttpResponseRedirect(self.get_success_url())
@@ -49,7 +49,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.compression.CompressionMiddleware',
+    'core.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -58,14 +61,59 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Метрики запросов по view для Prometheus на /metrics.
+METRICS_ENABLED = os.environ.get('YATUBE_METRICS', '1') == '1'
+# Токен для чтения /metrics: Prometheus передаёт его в заголовке
+# Authorization: Bearer <токен>. За обратным прокси нужен именно он.
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+# Без токена /metrics читается только с этих адресов и только напрямую:
+# за прокси все запросы приходят с его адреса.
+METRICS_ALLOWED_IPS = os.environ.get(
+    'YATUBE_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+# Функции, дописывающие в /metrics свои метрики.
+METRICS_COLLECTORS = ['posts.thumbnails.write_metrics']
+# Запросы дольше стольких секунд пишутся в лог core.metrics.slow вместе
+# с первыми METRICS_SLOW_REQUEST_MAX_QUERIES SQL-запросами.
+METRICS_SLOW_REQUEST = float(os.environ.get('YATUBE_SLOW_REQUEST', 0.5))
+METRICS_SLOW_REQUEST_MAX_QUERIES = 100
+
+# Ответы короче этого числа байт не сжимаются: выигрыш меньше накладных
+# расходов. brotli используется, если установлен пакет brotli.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Убирать отступы и пустые строки из HTML-шаблонов при их компиляции.
+TEMPLATES_COLLAPSE_WHITESPACE = (
+    os.environ.get('YATUBE_COLLAPSE_WHITESPACE', '1') == '1')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+# Скомпилировать шаблоны проекта при запуске воркера (см. wsgi.py).
+TEMPLATES_PREWARM = True
+# Замерять время отрисовки шаблонов, include и тегов; отчёт строит
+# команда template_profile.
+TEMPLATE_PROFILING = os.environ.get('YATUBE_TEMPLATE_PROFILING') == '1'
+TEMPLATE_PROFILE_DIR = os.path.join(BASE_DIR, 'template_profiles')
+if TEMPLATES_COLLAPSE_WHITESPACE:
+    # Сжимаются только HTML-страницы проекта из templates/: шаблоны
+    # приложений Django, например текстовые письма, остаются как есть.
+    TEMPLATE_LOADERS = [
+        ('core.loaders.WhitespaceLoader',
+         ['django.template.loaders.filesystem.Loader']),
+        'django.template.loaders.app_directories.Loader',
+    ]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -86,9 +134,75 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.environ.get('YATUBE_DB_PATH',
+                               os.path.join(BASE_DIR, 'db.sqlite3')),
+        # Соединение живёт между запросами, а не открывается заново.
+        'CONN_MAX_AGE': 60,
     }
 }
+# Реплики только для чтения: страницы, отмеченные replica_reads, читают
+# с них. Локально репликой служит копия SQLite-файла, которую обновляет
+# команда sync_sqlite_replica.
+for replica_number, replica_path in enumerate(
+        filter(None, os.environ.get('YATUBE_REPLICA_DBS', '').split(',')),
+        start=1):
+    DATABASES[f'replica{replica_number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': replica_path,
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.replicas.PrimaryReplicaRouter']
+# Режим SQLite для небольших боевых установок: WAL, mmap и запись
+# через единственный поток-писатель с повторами (core.sqlite).
+SQLITE_TUNING = os.environ.get('YATUBE_SQLITE_TUNING') == '1'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в килобайтах.
+    'cache_size': -64000,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+SQLITE_WRITE_RETRIES = 5
+SQLITE_WRITE_BACKOFF = 0.05
+# Сколько секунд после записи браузер читает только с основной базы.
+REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'yatube',
+    }
+}
+# Сколько секунд страница ленты хранится в кеше для анонимных посетителей.
+# LocMemCache у каждого процесса свой: правку из другого воркера или
+# команды страница покажет не позже, чем через столько секунд. ETag
+# и Last-Modified от этого не зависят: они строятся по базе.
+POSTS_CACHE_TTL = 60
+# Сколько секунд CDN хранит страницы анонимов и сколько ещё может отдавать
+# устаревшую копию, пока обновляет её в фоне.
+POSTS_EDGE_CACHE = {
+    'feed': {'s_maxage': 60, 'stale_while_revalidate': 300},
+    'post': {'s_maxage': 600, 'stale_while_revalidate': 3600},
+    'search': {'s_maxage': 30, 'stale_while_revalidate': 60},
+}
+POSTS_SURROGATE_KEY_HEADER = 'Surrogate-Key'
+# Бэкенд сброса страниц CDN по ключам; без него ключи никуда не уходят.
+POSTS_PURGE_BACKEND = os.environ.get('YATUBE_PURGE_BACKEND')
+POSTS_PURGE_URL = os.environ.get('YATUBE_PURGE_URL', '')
+POSTS_PURGE_HEADERS = ({'Fastly-Key': os.environ['YATUBE_PURGE_TOKEN']}
+                       if 'YATUBE_PURGE_TOKEN' in os.environ else {})
+POSTS_PURGE_BATCH_SIZE = 256
+POSTS_PURGE_DELAY = 0.5
+# Сколько постов JSON API может отдать за один запрос (?limit=).
+POSTS_API_MAX_LIMIT = 50
 
 
 # Password validation
@@ -128,6 +242,18 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
+# collectstatic собирает сюда файлы с хешем в имени, урезанный Bootstrap
+# и сжатые .gz/.br копии; отдаёт их core.staticfiles.StaticFilesApp.
+STATIC_ROOT = os.environ.get('YATUBE_STATIC_ROOT',
+                             os.path.join(BASE_DIR, 'staticfiles'))
+STATICFILES_STORAGE = 'core.staticfiles.PrecompressedManifestStorage'
+# Из этих файлов убираются правила с классами, которых нет в шаблонах.
+STATIC_PRUNE_CSS = ('css/bootstrap.min.css',)
+# Классы, которые нельзя найти в исходниках, например собранные в коде.
+STATIC_PRUNE_SAFELIST = ()
+STATIC_BROTLI_QUALITY = 11
+# Сколько секунд кешируются файлы без хеша в имени.
+STATIC_MAX_AGE = 60
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -137,4 +263,30 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.environ.get('YATUBE_MEDIA_ROOT',
+                            os.path.join(BASE_DIR, 'media'))
+
+# Загрузки сразу пишутся во временные файлы, а не в память.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedUploadHandler']
+POSTS_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POSTS_IMAGE_MAX_DIMENSIONS = (4096, 4096)
+
+# Длина готовой ленты подписок и число подписчиков, начиная с которого
+# посты автора не раскладываются по лентам, а читаются при показе.
+POSTS_TIMELINE_LENGTH = 800
+POSTS_FANOUT_MAX_FOLLOWERS = 1000
+
+# Миниатюры карточек создаются в фоновом пуле потоков, а не в запросе.
+THUMBNAIL_BACKEND = 'posts.thumbnails.AsyncThumbnailBackend'
+# Метаданные миниатюр хранятся в локальном SQLite-файле с LRU-кешем
+# процесса, а не в базе проекта.
+THUMBNAIL_KVSTORE = 'posts.kvstore.SQLiteKVStore'
+THUMBNAIL_SQLITE_PATH = os.environ.get(
+    'YATUBE_THUMBNAIL_DB', os.path.join(BASE_DIR, 'thumbnails.sqlite3'))
+THUMBNAIL_LRU_SIZE = 10000
+# Ширины вариантов картинки поста для srcset.
+POSTS_IMAGE_WIDTHS = (320, 640, 960, 1280)
+POSTS_THUMBNAIL_ASYNC = True
+POSTS_THUMBNAIL_WORKERS = 2
+# Через сколько секунд снова пробовать создать миниатюру после ошибки.
+POSTS_THUMBNAIL_RETRY_AFTER = 600
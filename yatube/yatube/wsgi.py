@@ -13,4 +13,13 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
-application = get_wsgi_application()
+from django.conf import settings  # noqa: E402
+
+from core.loaders import prewarm_templates  # noqa: E402
+from core.staticfiles import StaticFilesApp  # noqa: E402
+
+# Собранная статика отдаётся до Django, с вечным кешем для файлов с хешем.
+application = StaticFilesApp(get_wsgi_application())
+
+if settings.TEMPLATES_PREWARM:
+    prewarm_templates()